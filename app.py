@@ -1,105 +1,288 @@
 import os
-import requests
 import json
 import math
-import pandas as pd
-import pickle
-from flask import Flask, render_template, request, jsonify
+import numpy as np
+from flask import (Blueprint, Flask, Response, current_app, has_app_context, render_template, request, jsonify,
+                   stream_with_context)
 from datetime import datetime, timedelta
-import googlemaps
 from dotenv import load_dotenv
 import random
-import openmeteo_requests
-import requests_cache
-from retry_requests import retry
+import threading
+import time
+import atexit
+import zlib
+from weather_store import CorridorData, StationStore, FORMAT_VERSION
+from raster import RasterStore
+from upstream import UpstreamPool, pool_session
+import geodesy
+from caching import HotKeys, RouteResultCache, WeatherTileCache
+from corridors import DEMO_CORRIDORS, CorridorRegistry
+from refresh import RefreshScheduler
+import wire
+import metrics
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = Flask(__name__)
+# Upstream concurrency: shared worker pool size and per-service connection pool size
+UPSTREAM_MAX_WORKERS = int(os.getenv('UPSTREAM_MAX_WORKERS', 16))
+UPSTREAM_POOL_MAXSIZE = int(os.getenv('UPSTREAM_POOL_MAXSIZE', 16))
 
-# API Keys from environment variables
-GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY') 
-
-if not GOOGLE_MAPS_API_KEY:
-    raise ValueError("GOOGLE_MAPS_API_KEY environment variable is required")
-
-# Initialize Google Maps client
-gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+# Upstream endpoints; overridable to point the app at local stand-ins (see loadtest.py)
+GOOGLE_MAPS_BASE_URL = os.getenv('GOOGLE_MAPS_BASE_URL', 'https://maps.googleapis.com')
+OPENMETEO_FORECAST_URL = os.getenv('OPENMETEO_FORECAST_URL', 'https://api.open-meteo.com/v1/forecast')
+OPENMETEO_ARCHIVE_URL = os.getenv('OPENMETEO_ARCHIVE_URL', 'https://archive-api.open-meteo.com/v1/archive')
 
 # Historical weather data cache directory
 WEATHER_CACHE_DIR = "weather_cache"
-os.makedirs(WEATHER_CACHE_DIR, exist_ok=True)
+
+# SQLite file caching Open-Meteo HTTP responses for an hour
+OPENMETEO_CACHE_FILE = os.getenv('OPENMETEO_CACHE_FILE', '.cache.sqlite')
+
+# Gridded ice-risk rasters built by raster.py; routes covered by a current one are scored from it
+RASTER_DIR = os.getenv('RASTER_DIR', os.path.join(WEATHER_CACHE_DIR, 'rasters'))
+
+# Optional extra corridors (JSON, same shape as DEMO_CORRIDORS)
+CORRIDOR_REGISTRY_FILE = os.getenv('CORRIDOR_REGISTRY_FILE')
+
+# Maximum number of coordinates sent in one multi-location Open-Meteo request
+OPENMETEO_BATCH_SIZE = 100
+
+# Open-Meteo forecast request used for current conditions along routes
+CURRENT_WEATHER_PARAMS = {
+    "current": [
+        "temperature_2m",
+        "relative_humidity_2m", 
+        "precipitation",
+        "snowfall",
+        "rain",
+        "wind_speed_10m",
+        "wind_gusts_10m"
+    ],
+    "daily": ["temperature_2m_max", "temperature_2m_min"],
+    "wind_speed_unit": "ms",
+    "timezone": "auto",
+    "forecast_days": 1
+}
+
+# Open-Meteo hourly forecast used to score long routes at each sample's ETA
+HOURLY_FORECAST_PARAMS = {
+    "hourly": [
+        "temperature_2m",
+        "relative_humidity_2m",
+        "precipitation",
+        "snowfall",
+        "rain",
+        "wind_speed_10m",
+        "apparent_temperature"
+    ],
+    "wind_speed_unit": "ms",
+    "timezone": "GMT"
+}
+
+# Routes reaching their last sample at least this long after now are scored from the
+# hourly forecast at each sample's ETA; shorter trips use current conditions
+FORECAST_MIN_TRIP_SECONDS = int(os.getenv('FORECAST_MIN_TRIP_SECONDS', 3600))
+
+# Longest hourly forecast Open-Meteo serves
+FORECAST_MAX_HOURS = 16 * 24
+
+# Standard routes, routes avoiding tolls (often longer, safer) and
+# routes avoiding highways (more local roads)
+BASE_ROUTE_AVOID_OPTIONS = [None, ["tolls"], ["highways"]]
+
+# Current-weather tile cache: grid cell size in degrees, time bucket, freshness and size bound
+WEATHER_TILE_RESOLUTION = float(os.getenv('WEATHER_TILE_RESOLUTION', 0.1))
+WEATHER_TILE_BUCKET_SECONDS = int(os.getenv('WEATHER_TILE_BUCKET_SECONDS', 3600))
+WEATHER_TILE_TTL_SECONDS = int(os.getenv('WEATHER_TILE_TTL_SECONDS', 600))
+WEATHER_TILE_MAX_ENTRIES = int(os.getenv('WEATHER_TILE_MAX_ENTRIES', 50000))
+
+# Scored route sets are reused for repeat queries within this many seconds
+ROUTE_CACHE_TTL_SECONDS = int(os.getenv('ROUTE_CACHE_TTL_SECONDS', 600))
+
+# Background refresh of hot corridors and weather cells: run interval, upstream
+# requests allowed per run, how far ahead of expiry to refresh, and hot cells tracked
+REFRESH_ENABLED = os.getenv('REFRESH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+REFRESH_INTERVAL_SECONDS = int(os.getenv('REFRESH_INTERVAL_SECONDS', 300))
+REFRESH_BUDGET_PER_RUN = int(os.getenv('REFRESH_BUDGET_PER_RUN', 10))
+REFRESH_LEAD_SECONDS = int(os.getenv('REFRESH_LEAD_SECONDS', 360))
+REFRESH_MAX_CELLS = int(os.getenv('REFRESH_MAX_CELLS', 500))
+
+# Historical day shown for each corridor station: HISTORICAL_WEATHER_DATE (YYYY-MM-DD)
+# where the station has it, otherwise a day drawn from HISTORICAL_WEATHER_SEED
+HISTORICAL_WEATHER_SEED = int(os.getenv('HISTORICAL_WEATHER_SEED', 0))
+HISTORICAL_WEATHER_DATE = os.getenv('HISTORICAL_WEATHER_DATE') or None
+
+# Descriptions of historical station-days, indexed by the codes in a corridor's day table
+WEATHER_DESCRIPTIONS = (
+    "heavy snow",
+    "light snow",
+    "freezing rain/ice storm",
+    "snow and ice",
+    "cold rain",
+    "extreme cold",
+    "winter conditions"
+)
+
+
+def load_config(overrides=None):
+    """Settings an engine is built from: environment defaults plus overrides.
+    
+    Every app created by create_app keeps its own copy on ``flask_app.config``
+    and its engine reads them from there. GOOGLE_MAPS_CLIENT injects a
+    ready-made Directions client, so tests and tools need neither a
+    key nor the googlemaps package.
+    """
+    settings = {
+        'GOOGLE_MAPS_API_KEY': os.getenv('GOOGLE_MAPS_API_KEY'),
+        'GOOGLE_MAPS_BASE_URL': GOOGLE_MAPS_BASE_URL,
+        'GOOGLE_MAPS_CLIENT': None,
+        'UPSTREAM_MAX_WORKERS': UPSTREAM_MAX_WORKERS,
+        'UPSTREAM_POOL_MAXSIZE': UPSTREAM_POOL_MAXSIZE,
+        'OPENMETEO_FORECAST_URL': OPENMETEO_FORECAST_URL,
+        'OPENMETEO_ARCHIVE_URL': OPENMETEO_ARCHIVE_URL,
+        'OPENMETEO_CACHE_FILE': OPENMETEO_CACHE_FILE,
+        'RASTER_DIR': RASTER_DIR,
+        'CORRIDOR_REGISTRY_FILE': CORRIDOR_REGISTRY_FILE,
+        'FORECAST_MIN_TRIP_SECONDS': FORECAST_MIN_TRIP_SECONDS,
+        'WEATHER_TILE_RESOLUTION': WEATHER_TILE_RESOLUTION,
+        'WEATHER_TILE_BUCKET_SECONDS': WEATHER_TILE_BUCKET_SECONDS,
+        'WEATHER_TILE_TTL_SECONDS': WEATHER_TILE_TTL_SECONDS,
+        'WEATHER_TILE_MAX_ENTRIES': WEATHER_TILE_MAX_ENTRIES,
+        'ROUTE_CACHE_TTL_SECONDS': ROUTE_CACHE_TTL_SECONDS,
+        'REFRESH_ENABLED': REFRESH_ENABLED,
+        'REFRESH_INTERVAL_SECONDS': REFRESH_INTERVAL_SECONDS,
+        'REFRESH_BUDGET_PER_RUN': REFRESH_BUDGET_PER_RUN,
+        'REFRESH_LEAD_SECONDS': REFRESH_LEAD_SECONDS,
+        'REFRESH_MAX_CELLS': REFRESH_MAX_CELLS,
+        'HISTORICAL_WEATHER_SEED': HISTORICAL_WEATHER_SEED,
+        'HISTORICAL_WEATHER_DATE': HISTORICAL_WEATHER_DATE
+    }
+    settings.update(overrides or {})
+    return settings
+
+
+def build_gmaps_client(settings):
+    """The injected Google Maps client, or a new one with a pooled keep-alive session"""
+    if settings.get('GOOGLE_MAPS_CLIENT') is not None:
+        return settings['GOOGLE_MAPS_CLIENT']
+    if not settings.get('GOOGLE_MAPS_API_KEY'):
+        raise ValueError("GOOGLE_MAPS_API_KEY environment variable is required")
+    # Imported on first use: googlemaps and requests are only needed once routes are served
+    import googlemaps
+    import requests
+    return googlemaps.Client(
+        key=settings['GOOGLE_MAPS_API_KEY'],
+        requests_session=pool_session(requests.Session(), settings['UPSTREAM_POOL_MAXSIZE']),
+        base_url=settings['GOOGLE_MAPS_BASE_URL']
+    )
+
+def openmeteo_chunks(points):
+    """Split points into lists of at most OPENMETEO_BATCH_SIZE locations"""
+    return [points[start:start + OPENMETEO_BATCH_SIZE] for start in range(0, len(points), OPENMETEO_BATCH_SIZE)]
+
+def openmeteo_chunk_params(params, chunk):
+    """Request parameters for one multi-location chunk"""
+    chunk_params = dict(params)
+    chunk_params["latitude"] = [point['lat'] for point in chunk]
+    chunk_params["longitude"] = [point['lng'] for point in chunk]
+    return chunk_params
+
+def fetch_openmeteo_batch(openmeteo, url, params, points, upstream_pool=None):
+    """Fetch one Open-Meteo response per point using chunked multi-location requests.
+    
+    Open-Meteo accepts comma-separated latitude/longitude lists and answers with one
+    response per location in request order, so responses are mapped back by index.
+    Chunks are fetched concurrently when an upstream pool is given.
+    """
+    chunks = openmeteo_chunks(points)
+    
+    upstream = 'openmeteo_archive' if 'archive' in url else 'openmeteo_forecast'
+    
+    def fetch_chunk(chunk):
+        try:
+            with metrics.UPSTREAM_SECONDS.labels(upstream).time():
+                chunk_responses = openmeteo.weather_api(url, params=openmeteo_chunk_params(params, chunk))
+        except Exception:
+            metrics.UPSTREAM_ERRORS.labels(upstream).inc()
+            raise
+        if len(chunk_responses) != len(chunk):
+            raise ValueError(f"OpenMeteo returned {len(chunk_responses)} responses for {len(chunk)} locations")
+        return chunk_responses
+    
+    if upstream_pool is not None:
+        chunk_results = upstream_pool.map('openmeteo', fetch_chunk, chunks)
+    else:
+        chunk_results = [fetch_chunk(chunk) for chunk in chunks]
+    
+    return [response for chunk_responses in chunk_results for response in chunk_responses]
 
 class HistoricalWeatherService:
     """Real historical weather data using OpenMeteo API"""
     
-    def __init__(self):
+    def __init__(self, upstream_pool=None, ice_detector=None, settings=None):
+        settings = load_config() if settings is None else settings
+        
+        # Heavy client stack, imported when the first engine is built rather than at app import
+        import openmeteo_requests
+        import requests_cache
+        from retry_requests import retry
+        
         # Setup the Open-Meteo API client with cache and retry on error
-        cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-        retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+        os.makedirs(WEATHER_CACHE_DIR, exist_ok=True)
+        self.cache_session = requests_cache.CachedSession(settings['OPENMETEO_CACHE_FILE'], expire_after=3600)
+        retry_session = retry(self.cache_session, retries=5, backoff_factor=0.2)
+        pool_session(retry_session, settings['UPSTREAM_POOL_MAXSIZE'])
         self.openmeteo = openmeteo_requests.Client(session=retry_session)
+        self.forecast_url = settings['OPENMETEO_FORECAST_URL']
+        self.archive_url = settings['OPENMETEO_ARCHIVE_URL']
+        self.upstream_pool = upstream_pool
         
-        # Define demo routes with their geographical areas
-        self.demo_routes = {
-            'minneapolis_duluth': {
-                'origin': 'Minneapolis, MN',
-                'destination': 'Duluth, MN',
-                'bbox': {'north': 47.0, 'south': 44.5, 'east': -92.0, 'west': -94.0},
-                'winter_period': {'start': '2024-01-15', 'end': '2024-01-25'},
-                'description': 'I-35 Ice Storm Corridor - January 2024'
-            },
-            'buffalo_syracuse': {
-                'origin': 'Buffalo, NY',
-                'destination': 'Syracuse, NY',
-                'bbox': {'north': 43.5, 'south': 42.5, 'east': -75.5, 'west': -79.0},
-                'winter_period': {'start': '2024-02-10', 'end': '2024-02-20'},
-                'description': 'Lake Effect Snow Belt - February 2024'
-            },
-            'detroit_grandrapids': {
-                'origin': 'Detroit, MI',
-                'destination': 'Grand Rapids, MI',
-                'bbox': {'north': 43.0, 'south': 42.0, 'east': -84.5, 'west': -86.0},
-                'winter_period': {'start': '2023-12-15', 'end': '2023-12-25'},
-                'description': 'Michigan Freezing Rain Event - December 2023'
-            },
-            'denver_vail': {
-                'origin': 'Denver, CO',
-                'destination': 'Vail, CO',
-                'bbox': {'north': 40.0, 'south': 39.5, 'east': -105.5, 'west': -107.0},
-                'winter_period': {'start': '2024-01-20', 'end': '2024-01-30'},
-                'description': 'Mountain Pass Blizzard - January 2024'
-            }
-        }
-    
-    def get_route_key(self, origin, destination):
-        """Determine which demo route this matches"""
-        route_str = f"{origin.lower()} {destination.lower()}"
+        # Scores every station-day once, when its corridor is loaded
+        self.ice_detector = ice_detector or IceDetector()
+        
+        # Resident columnar copy of the cached corridor data
+        self.station_store = StationStore(WEATHER_CACHE_DIR, on_load=self.day_table)
+        
+        # Route points farther than this from every station use fallback weather
+        self.max_station_distance = 150000  # meters
         
-        if 'minneapolis' in route_str and 'duluth' in route_str:
-            return 'minneapolis_duluth'
-        elif 'buffalo' in route_str and 'syracuse' in route_str:
-            return 'buffalo_syracuse'
-        elif 'detroit' in route_str and 'grand' in route_str:
-            return 'detroit_grandrapids'
-        elif 'denver' in route_str and 'vail' in route_str:
-            return 'denver_vail'
+        # Day shown for each station and the draw for stations and points without it
+        self.weather_seed = settings['HISTORICAL_WEATHER_SEED']
+        self.weather_date = settings['HISTORICAL_WEATHER_DATE']
         
-        return None
+        # Request counts per corridor, read by the background refresher
+        self.hot_corridors = HotKeys()
+        
+        # Corridors with historical data, matched by geometry through a grid index
+        self.corridor_registry = CorridorRegistry.from_file(settings['CORRIDOR_REGISTRY_FILE'], DEMO_CORRIDORS)
+        self.demo_routes = self.corridor_registry.corridors
+    
+    def close(self):
+        """Release the cached HTTP session (closes the SQLite cache handle)"""
+        try:
+            self.cache_session.close()
+        except Exception as e:
+            print(f"Warning: Could not close weather cache session: {e}")
+    
+    def match_route_geometry(self, route_points):
+        """Determine which corridor a route geometry (dicts or an (n, 2) array) runs along"""
+        if len(route_points) == 0:
+            return None
+        if not isinstance(route_points, np.ndarray):
+            route_points = np.column_stack(geodesy.points_to_arrays(route_points))
+        return self.corridor_registry.match_geometry(route_points)
     
     def load_or_fetch_historical_data(self, route_key):
-        """Load cached data or fetch from OpenMeteo"""
-        cache_file = os.path.join(WEATHER_CACHE_DIR, f"{route_key}_historical.pkl")
-        
-        if os.path.exists(cache_file):
-            print(f"Loading cached weather data for {route_key}")
-            with open(cache_file, 'rb') as f:
-                return pickle.load(f)
+        """Load cached corridor data or fetch it from OpenMeteo"""
+        corridor = self.station_store.get(route_key)
+        if corridor is not None:
+            return corridor
         
         print(f"Fetching historical weather data for {route_key} from OpenMeteo")
-        return self._fetch_and_cache_historical_data(route_key, cache_file)
+        return self._fetch_and_cache_historical_data(route_key)
     
-    def _fetch_and_cache_historical_data(self, route_key, cache_file):
+    def _fetch_and_cache_historical_data(self, route_key):
         """Fetch historical data from OpenMeteo using actual city coordinates"""
         route_info = self.demo_routes[route_key]
         period = route_info['winter_period']
@@ -112,27 +295,29 @@ class HistoricalWeatherService:
         all_weather_data = []
         successful_fetches = 0
         
-        for i, (city_name, lat, lng) in enumerate(route_coordinates):
-            try:
-                print(f"Fetching weather for {city_name} ({lat:.3f}, {lng:.3f})")
-                weather_df = self._fetch_point_historical_weather(lat, lng, period['start'], period['end'])
-                
-                # Check if data is valid (not all NaN)
-                if not weather_df['temperature_mean'].isna().all():
-                    weather_station = {
-                        'location': {'lat': lat, 'lng': lng, 'city': city_name},
-                        'data': weather_df,
-                        'station_id': f"{route_key}_{i}_{city_name.replace(' ', '_')}"
-                    }
-                    all_weather_data.append(weather_station)
-                    successful_fetches += 1
-                    print(f"✅ Successfully fetched data for {city_name}")
-                else:
-                    print(f"⚠️ No valid data for {city_name} - all NaN values")
-                    
-            except Exception as e:
-                print(f"❌ Error fetching weather for {city_name}: {e}")
-                continue
+        # One multi-location request for every city on the corridor
+        try:
+            weather_dfs = self._fetch_points_historical_weather(
+                [{'lat': lat, 'lng': lng} for _, lat, lng in route_coordinates],
+                period['start'], period['end']
+            )
+        except Exception as e:
+            print(f"❌ Error fetching weather for {route_key}: {e}")
+            weather_dfs = [None] * len(route_coordinates)
+        
+        for i, ((city_name, lat, lng), weather_df) in enumerate(zip(route_coordinates, weather_dfs)):
+            # Check if data is valid (not all NaN)
+            if weather_df is not None and not weather_df['temperature_mean'].isna().all():
+                weather_station = {
+                    'location': {'lat': lat, 'lng': lng, 'city': city_name},
+                    'data': weather_df,
+                    'station_id': f"{route_key}_{i}_{city_name.replace(' ', '_')}"
+                }
+                all_weather_data.append(weather_station)
+                successful_fetches += 1
+                print(f"✅ Successfully fetched data for {city_name}")
+            else:
+                print(f"⚠️ No valid data for {city_name} - all NaN values")
         
         # If we have fewer than 3 successful stations, add fallback data
         if successful_fetches < 3:
@@ -140,56 +325,22 @@ class HistoricalWeatherService:
             fallback_stations = self._create_fallback_weather_stations(route_key, period)
             all_weather_data.extend(fallback_stations)
         
+        corridor = CorridorData.from_stations(route_key, all_weather_data)
+        
         # Cache the data
         try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(all_weather_data, f)
-            print(f"✅ Cached weather data for {route_key} ({len(all_weather_data)} stations)")
+            self.station_store.save(corridor)
+            print(f"✅ Cached weather data for {route_key} ({corridor.n_stations} stations)")
         except Exception as e:
-            print(f"Warning: Could not cache data to {cache_file}: {e}")
+            print(f"Warning: Could not cache data for {route_key}: {e}")
+            return corridor
         
-        return all_weather_data
+        return self.station_store.get(route_key)
     
     def _get_route_city_coordinates(self, route_key):
         """Get real city coordinates along each demo route"""
-        
-        route_cities = {
-            'minneapolis_duluth': [
-                ('Minneapolis', 44.9778, -93.2650),
-                ('Anoka', 45.1975, -93.3877),
-                ('Cambridge', 45.5719, -93.2244),
-                ('Mora', 45.8775, -93.2900),
-                ('Hinckley', 46.0116, -92.9444),
-                ('Duluth', 46.7867, -92.1005)
-            ],
-            'buffalo_syracuse': [
-                ('Buffalo', 42.8864, -78.8784),
-                ('Batavia', 42.9981, -78.1875),
-                ('Rochester', 43.1566, -77.6088),
-                ('Geneva', 42.8698, -76.9777),
-                ('Auburn', 42.9317, -76.5660),
-                ('Syracuse', 43.0481, -76.1474)
-            ],
-            'detroit_grandrapids': [
-                ('Detroit', 42.3314, -83.0458),
-                ('Pontiac', 42.6389, -83.2910),
-                ('Flint', 43.0125, -83.6875),
-                ('Lansing', 42.3320, -84.5361),
-                ('Kalamazoo', 42.2917, -85.5872),
-                ('Grand Rapids', 42.9634, -85.6681)
-            ],
-            'denver_vail': [
-                ('Denver', 39.7392, -104.9903),
-                ('Golden', 39.7555, -105.2211),
-                ('Georgetown', 39.7061, -105.6972),
-                ('Keystone', 39.6047, -105.9342),
-                ('Frisco', 39.5744, -106.0953),
-                ('Vail', 39.6403, -106.3742)
-            ]
-        }
-        
-        return route_cities.get(route_key, [])
-
+        route_info = self.demo_routes.get(route_key)
+        return list(route_info['cities']) if route_info else []
     
     def _create_fallback_weather_stations(self, route_key, period):
         """Create realistic fallback weather data for a route"""
@@ -208,6 +359,7 @@ class HistoricalWeatherService:
             (end_lat, end_lng, 'end')
         ]
         
+        import pandas as pd
         for i, (lat, lng, position) in enumerate(coordinates):
             dates = pd.date_range(start=period['start'], end=period['end'], freq='D')
             
@@ -322,12 +474,10 @@ class HistoricalWeatherService:
         }
 
 
-    def _fetch_point_historical_weather(self, lat, lng, start_date, end_date):
-        """Fetch historical weather with better error handling and validation"""
-        url = "https://archive-api.open-meteo.com/v1/archive"
+    def _fetch_points_historical_weather(self, points, start_date, end_date):
+        """Fetch historical daily weather for many points in chunked multi-location requests"""
+        url = self.archive_url
         params = {
-            "latitude": lat,
-            "longitude": lng,
             "start_date": start_date,
             "end_date": end_date,
             "daily": [
@@ -345,9 +495,11 @@ class HistoricalWeatherService:
             "timezone": "auto"
         }
         
-        try:
-            responses = self.openmeteo.weather_api(url, params=params)
-            response = responses[0]
+        responses = fetch_openmeteo_batch(self.openmeteo, url, params, points, self.upstream_pool)
+        
+        import pandas as pd
+        weather_dfs = []
+        for point, response in zip(points, responses):
             daily = response.Daily()
             
             # Create date range
@@ -373,21 +525,14 @@ class HistoricalWeatherService:
                 "wind_speed_mean": daily.Variables(9).ValuesAsNumpy()
             })
             
-            # Check if we got valid data
-            if weather_df['temperature_mean'].isna().all():
-                print(f"⚠️ OpenMeteo returned all NaN for coordinates {lat}, {lng}")
-                raise ValueError(f"No weather data available for coordinates {lat}, {lng}")
-            
             # Fill any individual NaN values with interpolation
-            # weather_df = weather_df.interpolate(method='linear').fillna(method='bfill').fillna(method='ffill')
-            weather_df = weather_df.interpolate(method='linear').bfill().ffill()
-            
-            print(f"✅ Successfully fetched weather data for {lat}, {lng}: {len(weather_df)} days")
-            return weather_df
+            if not weather_df['temperature_mean'].isna().all():
+                weather_df = weather_df.interpolate(method='linear').bfill().ffill()
+                print(f"✅ Successfully fetched weather data for {point['lat']}, {point['lng']}: {len(weather_df)} days")
             
-        except Exception as e:
-            print(f"❌ Error fetching historical weather for {lat}, {lng}: {e}")
-            raise e  # Re-raise to be handled by calling function
+            weather_dfs.append(weather_df)
+        
+        return weather_dfs
 
 
     def preload_all_demo_data(self):
@@ -403,88 +548,43 @@ class HistoricalWeatherService:
         
         print("🎯 Historical weather data preloading complete!")
     
-    def get_weather_for_route_points(self, route_points, origin, destination):
-        """Get historical weather data for route points"""
-        route_key = self.get_route_key(origin, destination)
-        
-        if route_key:
-            # Use real historical data
-            return self._get_historical_weather_for_points(route_key, route_points)
-        else:
-            # Use current weather simulation for non-demo routes
-            return self._get_current_weather_simulation_for_points(route_points)
-    
-    def _get_historical_weather_for_points(self, route_key, route_points):
-        """Get historical weather interpolated for route points"""
-        historical_data = self.load_or_fetch_historical_data(route_key)
+    def _get_historical_weather_for_points(self, route_key, route_points, seed=None, date=None):
+        """Get historical weather for route points from the corridor's precomputed station-days.
+        
+        Every station contributes one day, chosen by select_days, so the same
+        route always gets the same weather.
+        """
+        self.hot_corridors.touch([route_key])
+        corridor = self.load_or_fetch_historical_data(route_key)
         weather_points = []
         
-        print(f"Processing {len(route_points)} route points with {len(historical_data)} weather stations")
+        n_stations = corridor.n_stations if corridor is not None else 0
+        print(f"Processing {len(route_points)} route points with {n_stations} weather stations")
+        
+        # Find the closest weather station for every point in one spatial index query
+        station_indices = self._find_closest_stations(route_points, corridor)
+        if station_indices is not None:
+            table = self.day_table(corridor)
+            days = self.select_days(corridor, seed, date)
         
         for i, point in enumerate(route_points):
-            # Find the closest weather station data
-            closest_weather_df = self._find_closest_weather_data(
-                point['lat'], point['lng'], historical_data
-            )
+            station_idx = station_indices[i] if station_indices is not None else None
             
-            if closest_weather_df is not None and len(closest_weather_df) > 0:
-                # Select a random day from the historical period for variation
-                random_day_idx = random.randint(0, len(closest_weather_df) - 1)
-                day_data = closest_weather_df.iloc[random_day_idx]
-                
-                # Handle NaN values with fallbacks
-                temp_mean = day_data.get('temperature_mean', 10)
-                if pd.isna(temp_mean):
-                    temp_mean = 10
-                    
-                humidity_avg = (day_data.get('humidity_max', 85) + day_data.get('humidity_min', 70)) / 2
-                if pd.isna(humidity_avg):
-                    humidity_avg = 75
-                    
-                precipitation = day_data.get('precipitation_sum', 2.0)
-                if pd.isna(precipitation):
-                    precipitation = 2.0
-                    
-                wind_speed = day_data.get('wind_speed_mean', 20)
-                if pd.isna(wind_speed):
-                    wind_speed = 20
-                    
-                snowfall = day_data.get('snowfall_sum', 1.0)
-                if pd.isna(snowfall):
-                    snowfall = 1.0
-                    
-                rain = day_data.get('rain_sum', 0.5)
-                if pd.isna(rain):
-                    rain = 0.5
-                    
-                temp_min = day_data.get('temperature_min', temp_mean - 3)
-                if pd.isna(temp_min):
-                    temp_min = temp_mean - 3
-                
-                # Convert to our weather format
-                weather_info = {
-                    'temp': float(temp_mean),
-                    'humidity': float(humidity_avg),
-                    'precipitation': float(precipitation),
-                    'wind_speed': float(wind_speed),
-                    'snowfall': float(snowfall),
-                    'rain': float(rain),
-                    'description': self._get_weather_description(day_data),
-                    'feels_like': float(temp_min),
-                    'visibility': max(1, 15 - precipitation)
-                }
-                
+            if station_idx is not None and corridor.day_counts[station_idx] > 0:
+                day = days[station_idx]
                 weather_points.append({
                     'location': point,
-                    'weather': weather_info,
+                    'weather': self._station_day_weather(table, station_idx, day),
+                    'base_risk': float(table['base_risk'][station_idx, day]),
                     'segment_index': i,
                     'data_source': 'historical'
                 })
             else:
                 # Fallback to simulated winter conditions
+                metrics.WEATHER_FALLBACKS.labels('no_station').inc()
                 weather_points.append({
                     'location': point,
-                    'weather': self._get_fallback_winter_weather(),
+                    'weather': self._get_fallback_winter_weather(point, seed, date),
                     'segment_index': i,
                     'data_source': 'fallback'
                 })
@@ -492,188 +592,131 @@ class HistoricalWeatherService:
         print(f"Generated weather data for {len(weather_points)} route points")
         return weather_points
     
-    def _find_closest_weather_data(self, lat, lng, historical_data):
-        """Find the closest weather station data to a point"""
-        min_distance = float('inf')
-        closest_data = None
-        
-        for weather_station in historical_data:
-            if 'location' in weather_station and 'data' in weather_station:
-                station_lat = weather_station['location']['lat']
-                station_lng = weather_station['location']['lng']
-                
-                distance = self._calculate_distance(lat, lng, station_lat, station_lng)
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_data = weather_station['data']  # Return the DataFrame
-        
-        return closest_data
-    
-    def _get_weather_description(self, day_data):
-        """Generate weather description from data"""
-        temp = day_data['temperature_mean']
-        snow = day_data['snowfall_sum']
-        rain = day_data['rain_sum']
-        precip = day_data['precipitation_sum']
-        
-        # Handle NaN values
-        if pd.isna(temp):
-            temp = 15  # Default to 15C if missing
-        if pd.isna(snow):
-            snow = 0
-        if pd.isna(rain):
-            rain = 0
-        if pd.isna(precip):
-            precip = 0
-        
-        if snow > 5:
-            return "heavy snow"
-        elif snow > 1:
-            return "light snow"
-        elif temp < 0 and precip > 2:
-            return "freezing rain/ice storm"
-        elif temp < 2 and precip > 0.5:
-            return "snow and ice"
-        elif temp < 5 and rain > 1:
-            return "cold rain"
-        elif temp < 0:
-            return "extreme cold"
-        else:
-            return "winter conditions"
+    def select_days(self, corridor, seed=None, date=None):
+        """Day index for every station of a corridor.
+        
+        ``date`` (YYYY-MM-DD) is used for every station that has it; other
+        stations get a day drawn from ``seed`` and the station id, which is
+        stable across requests and processes. Both default to the
+        HISTORICAL_WEATHER_DATE and HISTORICAL_WEATHER_SEED settings.
+        """
+        seed = self.weather_seed if seed is None else seed
+        date = self.weather_date if date is None else date
+        
+        draws = np.array([zlib.crc32(f"{seed}:{station_id}".encode()) for station_id in corridor.station_ids],
+                         dtype=np.int64)
+        days = draws % np.maximum(corridor.day_counts, 1)
+        if date is not None:
+            matches = np.flatnonzero(corridor.dates.astype('datetime64[D]') == np.datetime64(date, 'D'))
+            if len(matches):
+                days = np.where(matches[0] < corridor.day_counts, matches[0], days)
+        return days
     
-    def _get_current_weather_simulation_for_points(self, route_points):
-        """Get current weather for non-demo routes using OpenMeteo"""
-        weather_points = []
-        
-        for i, point in enumerate(route_points):
-            try:
-                # Try to get real current weather from OpenMeteo
-                weather_info = self._get_openmeteo_current_weather(point['lat'], point['lng'])
-            except Exception as e:
-                print(f"Failed to get current weather for point {i}: {e}")
-                # Fallback to simulation
-                weather_info = self._get_fallback_current_weather(point['lat'], point['lng'])
-            
-            weather_points.append({
-                'location': point,
-                'weather': weather_info,
-                'segment_index': i,
-                'data_source': 'openmeteo_current'
-            })
-        
-        return weather_points
+    def day_table(self, corridor):
+        """Cleaned weather, description code and base ice risk for every station-day.
+        
+        Built once when a corridor is loaded and kept on it; arrays have the
+        corridor's (n_stations, n_days) shape.
+        """
+        if corridor.day_table is None:
+            corridor.day_table = self._build_day_table(corridor)
+        return corridor.day_table
     
-    def _get_openmeteo_current_weather(self, lat, lng):
-        """Get current weather from OpenMeteo API for a specific point"""
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": lat,
-            "longitude": lng,
-            "current": [
-                "temperature_2m",           # index 0
-                "relative_humidity_2m",     # index 1
-                "precipitation",            # index 2
-                "snowfall",                 # index 3
-                "rain",                     # index 4
-                "wind_speed_10m"            # index 5
-            ],
-            "timezone": "auto",
-            "forecast_days": 1
-        }
-        
-        responses = self.historical_service.openmeteo.weather_api(url, params=params)
-        response = responses[0]
-        current = response.Current()
-        
-        # Extract current values
-        temp = current.Variables(0).Value()
-        humidity = current.Variables(1).Value()
-        precipitation = current.Variables(2).Value()
-        snowfall = current.Variables(3).Value()
-        rain = current.Variables(4).Value()
-        wind_speed = current.Variables(5).Value() * 3.6  # Convert m/s to km/h
-        
-        # Calculate total precipitation
-        total_precip = precipitation + snowfall
-        
-        # Generate description
-        if snowfall > 1:
-            description = "snow conditions"
-        elif temp < 5 and total_precip > 0:
-            description = "cold and wet"
-        elif rain > 0.5:
-            description = "rainy conditions"
-        elif temp < 0:
-            description = "freezing conditions"
-        else:
-            description = "current conditions"
+    def _build_day_table(self, corridor):
+        values = {name: np.asarray(array, dtype=np.float64) for name, array in corridor.variables.items()}
+        
+        # Missing values get the same fallbacks a single station-day always had
+        temp = np.where(np.isnan(values['temperature_mean']), 10, values['temperature_mean'])
+        humidity = (values['humidity_max'] + values['humidity_min']) / 2
+        humidity = np.where(np.isnan(humidity), 75, humidity)
+        precipitation = np.where(np.isnan(values['precipitation_sum']), 2.0, values['precipitation_sum'])
+        wind_speed = np.where(np.isnan(values['wind_speed_mean']), 20, values['wind_speed_mean'])
+        snowfall = np.where(np.isnan(values['snowfall_sum']), 1.0, values['snowfall_sum'])
+        rain = np.where(np.isnan(values['rain_sum']), 0.5, values['rain_sum'])
+        feels_like = np.where(np.isnan(values['temperature_min']), temp - 3, values['temperature_min'])
         
         return {
-            'temp': round(temp, 1),
-            'humidity': round(humidity, 1),
-            'precipitation': round(total_precip, 2),
-            'wind_speed': round(wind_speed, 1),
-            'snowfall': round(snowfall, 2),
-            'rain': round(rain, 2),
-            'description': description,
-            'feels_like': round(temp - (wind_speed * 0.1), 1),
-            'visibility': max(1, 15 - total_precip)
+            'temp': temp,
+            'humidity': humidity,
+            'precipitation': precipitation,
+            'wind_speed': wind_speed,
+            'snowfall': snowfall,
+            'rain': rain,
+            'description': self._weather_description_codes(values),
+            'feels_like': feels_like,
+            'visibility': np.maximum(1, 15 - precipitation),
+            'base_risk': self.ice_detector.base_risk_batch(temp, humidity, precipitation, snowfall, wind_speed)
         }
     
-    def _get_fallback_current_weather(self, lat, lng):
-        """Fallback current weather when API fails"""
-        # Season-appropriate fallback (summer 2025)
-        base_temp = 22 + random.uniform(-5, 8)
+    def _station_day_weather(self, table, station_idx, day):
+        """Weather dict of one station-day from a day table"""
+        weather_info = {}
+        for name, column in table.items():
+            if name == 'description':
+                weather_info[name] = WEATHER_DESCRIPTIONS[column[station_idx, day]]
+            elif name != 'base_risk':
+                weather_info[name] = float(column[station_idx, day])
+        return weather_info
+    
+    def _find_closest_stations(self, route_points, corridor):
+        """Find the index of the closest weather station in a corridor for each route point.
         
-        # Latitude adjustment
-        if lat > 45:
-            base_temp -= 8
-        elif lat > 40:
-            base_temp -= 3
+        Points with no station within max_station_distance get None.
+        """
+        if corridor is None or corridor.spatial_index is None or not route_points:
+            return None
         
-        precipitation = random.uniform(0, 1) if random.random() < 0.2 else 0
-        humidity = random.uniform(40, 75)
-        wind_speed = random.uniform(5, 15)
+        lats, lngs = geodesy.points_to_arrays(route_points)
+        indices, distances = corridor.spatial_index.query(lats, lngs)
         
-        return {
-            'temp': round(base_temp, 1),
-            'humidity': round(humidity, 1),
-            'precipitation': round(precipitation, 2),
-            'wind_speed': round(wind_speed, 1),
-            'snowfall': 0,
-            'rain': round(precipitation, 2),
-            'description': "moderate conditions",
-            'feels_like': round(base_temp - (wind_speed * 0.1), 1),
-            'visibility': 12
-        }
-    
-    def _calculate_distance(self, lat1, lng1, lat2, lng2):
-        """Calculate distance in meters using Haversine formula"""
-        R = 6371000  # Earth radius in meters
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
+        too_far = int(np.count_nonzero(distances > self.max_station_distance))
+        if too_far:
+            print(f"⚠️ {too_far} route points are over {self.max_station_distance / 1000:.0f} km from any station")
         
-        a = (math.sin(delta_lat/2)**2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
+        return [
+            int(idx) if distance <= self.max_station_distance else None
+            for idx, distance in zip(indices, distances)
+        ]
     
-    def _get_fallback_winter_weather(self):
-        """Generate realistic fallback winter weather"""
+    def _weather_description_codes(self, values):
+        """Index into WEATHER_DESCRIPTIONS for every station-day of raw daily variables"""
+        temp = np.where(np.isnan(values['temperature_mean']), 15, values['temperature_mean'])  # Default to 15C if missing
+        snow = np.nan_to_num(values['snowfall_sum'])
+        rain = np.nan_to_num(values['rain_sum'])
+        precip = np.nan_to_num(values['precipitation_sum'])
+        
+        return np.select(
+            [
+                snow > 5,
+                snow > 1,
+                (temp < 0) & (precip > 2),
+                (temp < 2) & (precip > 0.5),
+                (temp < 5) & (rain > 1),
+                temp < 0
+            ],
+            [0, 1, 2, 3, 4, 5],
+            6
+        ).astype(np.uint8)
+    
+    def _get_fallback_winter_weather(self, point, seed=None, date=None):
+        """Generate realistic fallback winter weather.
+        
+        Drawn from the seed, date and rounded location like select_days, so a
+        point with no station gets the same weather on every request.
+        """
+        seed = self.weather_seed if seed is None else seed
+        date = self.weather_date if date is None else date
+        rng = random.Random(zlib.crc32(f"{seed}:{date}:{point['lat']:.3f},{point['lng']:.3f}".encode()))
         return {
-            'temp': random.uniform(-10, -2),
-            'humidity': random.uniform(70, 90),
-            'precipitation': random.uniform(1, 4),
-            'wind_speed': random.uniform(15, 30),
-            'snowfall': random.uniform(0.5, 3),
-            'rain': random.uniform(0, 1),
+            'temp': rng.uniform(-10, -2),
+            'humidity': rng.uniform(70, 90),
+            'precipitation': rng.uniform(1, 4),
+            'wind_speed': rng.uniform(15, 30),
+            'snowfall': rng.uniform(0.5, 3),
+            'rain': rng.uniform(0, 1),
             'description': 'winter storm conditions',
-            'feels_like': random.uniform(-15, -5),
-            'visibility': random.uniform(2, 8)
+            'feels_like': rng.uniform(-15, -5),
+            'visibility': rng.uniform(2, 8)
         }
 
 class IceDetector:
@@ -683,6 +726,19 @@ class IceDetector:
             'medium': 0.6,
             'high': 0.8
         }
+        
+        # Simplified bridge zones
+        bridge_zones = np.array([
+            (44.98, -93.25),  # Mississippi in Minneapolis
+            (46.78, -92.10),  # Duluth harbor area
+            (42.88, -78.87),  # Buffalo water areas
+            (43.15, -77.61),  # Rochester area
+            (43.05, -76.15),  # Syracuse area
+            (42.33, -83.05),  # Detroit river area
+            (42.96, -85.67),  # Grand Rapids river area
+        ])
+        self.bridge_lats = bridge_zones[:, 0]
+        self.bridge_lngs = bridge_zones[:, 1]
     
     def calculate_ice_risk(self, weather_data, lat, lng, route_context=None, route_type='highway'):
         """Calculate ice risk based on real weather conditions with summer handling"""
@@ -762,6 +818,79 @@ class IceDetector:
         return min(max(total_risk, 0), 1.0)
 
     
+    def calculate_ice_risk_batch(self, temp, humidity, precipitation, snowfall, wind_speed,
+                                 lat, lng, route_type='highway', route_context=None, base_risk=None):
+        """Vectorized calculate_ice_risk over arrays of points.
+        
+        Takes one array per weather variable plus lat/lng, and either one route type or
+        one per point. Returns (risk array, risk level array) with exactly the values the
+        scalar function gives point by point. ``base_risk`` skips recomputing the
+        weather-only part when it is already known (see base_risk_batch).
+        """
+        temp = np.asarray(temp, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        if base_risk is None:
+            base_risk = self.base_risk_batch(temp, humidity, precipitation, snowfall, wind_speed)
+        else:
+            base_risk = np.asarray(base_risk, dtype=np.float64)
+        
+        # Route type modifier, computed once per distinct type
+        route_types = np.broadcast_to(np.asarray(route_type, dtype=object), temp.shape)
+        type_modifiers = {rt: self._get_route_type_modifier(rt, route_context) for rt in set(route_types.ravel())}
+        route_modifier = np.array([type_modifiers[rt] for rt in route_types.ravel()], dtype=np.float64).reshape(temp.shape)
+        
+        # Route and location modifiers (reduced in warm weather)
+        scaled_route_modifier = np.where(temp > 5, route_modifier * 0.2, route_modifier)
+        location_modifier = self._get_location_modifier_batch(lat, lng)
+        location_modifier = np.where(temp > 5, location_modifier * 0.1, location_modifier)
+        
+        total_risk = base_risk + scaled_route_modifier + location_modifier
+        total_risk = np.where(temp > 10, np.minimum(total_risk, 0.05), np.where(temp > 5, np.minimum(total_risk, 0.15), total_risk))
+        total_risk = np.minimum(np.maximum(total_risk, 0), 1.0)
+        
+        # SUMMER WEATHER CHECK: only a capped share of the route modifier applies
+        warm_risk = np.maximum(0, np.minimum(0.05, route_modifier * 0.1))
+        risk = np.where(temp > 15, warm_risk, total_risk)
+        
+        return risk, self.get_risk_level_batch(risk)
+    
+    def base_risk_batch(self, temp, humidity, precipitation, snowfall, wind_speed):
+        """Weather-only part of calculate_ice_risk_batch, before route and location modifiers"""
+        temp = np.asarray(temp, dtype=np.float64)
+        humidity = np.asarray(humidity, dtype=np.float64)
+        precipitation = np.asarray(precipitation, dtype=np.float64)
+        snowfall = np.asarray(snowfall, dtype=np.float64)
+        wind_speed = np.asarray(wind_speed, dtype=np.float64)
+        
+        mild = ~(temp > 15) & (temp > 10)
+        chilly = temp < 5
+        
+        # WINTER/COLD WEATHER: terms are added in the same order as the scalar version
+        base_risk = np.zeros_like(temp)
+        base_risk += np.select(
+            [(-3 <= temp) & (temp <= 1), ((-8 <= temp) & (temp < -3)) | ((1 < temp) & (temp <= 4)), temp < -15, temp < 5],
+            [0.6, 0.4, 0.3, 0.1], 0.0
+        )
+        base_risk += np.where(chilly, np.select([humidity > 85, humidity > 70], [0.25, 0.15], 0.0), 0.0)
+        base_risk += np.where(chilly, np.select([snowfall > 2, snowfall > 0.5], [0.3, 0.2], 0.0), 0.0)
+        base_risk += np.where(chilly, np.select(
+            [(precipitation > 1) & (temp < 2), (precipitation > 0.2) & (temp < 0)], [0.4, 0.3], 0.0
+        ), 0.0)
+        base_risk += np.where(chilly, np.select([wind_speed > 25, wind_speed > 15], [0.2, 0.1], 0.0), 0.0)
+        return np.where(mild, 0.02, base_risk)
+    
+    def _get_location_modifier_batch(self, lat, lng):
+        """Vectorized _get_location_modifier"""
+        distances = geodesy.pairwise_haversine(lat.ravel(), lng.ravel(), self.bridge_lats, self.bridge_lngs)
+        near_bridge = np.any(distances < 5000, axis=1).reshape(lat.shape)
+        
+        modifier = np.zeros_like(lat)
+        modifier += np.where(near_bridge, 0.2, 0.0)
+        modifier += np.select([lat > 45, lat > 42], [0.08, 0.04], 0.0)
+        modifier += np.maximum(0, (lat - 40) * 0.01)
+        return modifier
+    
     def _get_route_type_modifier(self, route_type, route_context):
         """Different route types have different inherent risks - temperature aware"""
         modifier = 0
@@ -809,35 +938,8 @@ class IceDetector:
     
     def _is_near_bridge_area(self, lat, lng):
         """Simplified bridge detection"""
-        bridge_zones = [
-            (44.98, -93.25),  # Mississippi in Minneapolis
-            (46.78, -92.10),  # Duluth harbor area
-            (42.88, -78.87),  # Buffalo water areas
-            (43.15, -77.61),  # Rochester area
-            (43.05, -76.15),  # Syracuse area
-            (42.33, -83.05),  # Detroit river area
-            (42.96, -85.67),  # Grand Rapids river area
-        ]
-        
-        for bridge_lat, bridge_lng in bridge_zones:
-            distance = self._calculate_distance(lat, lng, bridge_lat, bridge_lng)
-            if distance < 5000:  # Within 5km
-                return True
-        return False
-    
-    def _calculate_distance(self, lat1, lng1, lat2, lng2):
-        """Calculate distance in meters"""
-        R = 6371000
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
-        
-        a = (math.sin(delta_lat/2)**2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
+        distances = geodesy.haversine(lat, lng, self.bridge_lats, self.bridge_lngs)
+        return bool(np.any(distances < 5000))  # Within 5km
     
     def get_risk_level(self, ice_risk):
         """Convert numeric risk to category"""
@@ -849,100 +951,232 @@ class IceDetector:
             return 'low'
         else:
             return 'minimal'
+    
+    def get_risk_level_batch(self, ice_risks):
+        """Vectorized get_risk_level"""
+        ice_risks = np.asarray(ice_risks, dtype=np.float64)
+        return np.select(
+            [ice_risks >= self.ice_risk_threshold['high'],
+             ice_risks >= self.ice_risk_threshold['medium'],
+             ice_risks >= self.ice_risk_threshold['low']],
+            ['high', 'medium', 'low'], 'minimal'
+        )
 
 class WeatherService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, historical_service=None, ice_detector=None, tile_cache=None, raster_store=None,
+                 settings=None):
+        settings = load_config() if settings is None else settings
         self.api_key = api_key
-        self.historical_service = HistoricalWeatherService()
+        self.historical_service = historical_service or HistoricalWeatherService(UpstreamPool(), settings=settings)
+        self.ice_detector = ice_detector or IceDetector()
+        self.tile_cache = tile_cache or WeatherTileCache(
+            resolution=settings['WEATHER_TILE_RESOLUTION'],
+            time_bucket_seconds=settings['WEATHER_TILE_BUCKET_SECONDS'],
+            ttl_seconds=settings['WEATHER_TILE_TTL_SECONDS'],
+            max_entries=settings['WEATHER_TILE_MAX_ENTRIES']
+        )
+        self.raster_store = raster_store
+        self.forecast_min_trip_seconds = settings['FORECAST_MIN_TRIP_SECONDS']
     
     def get_weather_along_route(self, route_points, route_name=None, use_realtime=False):
         """Get weather data for points along the route"""
-        # Determine if this is a demo route
-        route_key = self.historical_service.get_route_key(route_name or "", route_name or "")
+        weather_points = self.get_route_weather(route_points, route_name)
+        return self.score_weather_points(weather_points, route_name)
+    
+    def get_route_weather(self, route_points, route_name=None, timeline=None):
+        """Sample a route geometry and fetch its weather once, without risk scoring.
+        
+        ``timeline`` is a route's (meters, epoch seconds) pairs from
+        RouteOptimizer.route_timeline; with it, current-weather samples are
+        stamped with their ETA and long trips are scored at those ETAs.
+        """
+        return self.match_route_weather(route_points, route_name, timeline)[1]
+    
+    def match_route_weather(self, route_points, route_name=None, timeline=None):
+        """(route_key, weather points) for a route geometry; route_key is None off every corridor"""
+        # Determine if the geometry runs along a corridor with historical data
+        route_key = self.historical_service.match_route_geometry(route_points)
         
         if route_key:
             print(f"Using historical weather data for demo route: {route_key}")
-            return self._get_historical_weather_route(route_points, route_name, route_key)
+            return route_key, self._get_historical_weather_route(route_points, route_name, route_key)
         else:
             print(f"Using current weather data for route: {route_name}")
-            return self._get_current_weather_route(route_points, route_name)
+            return None, self._get_current_weather_route(route_points, route_name, timeline)
     
-    def _get_historical_weather_route(self, route_points, route_name, route_key):
-        """Get historical weather for demo routes"""
-        weather_data = []
-        sample_points = self.sample_route_points(route_points, 25000)  # 25km intervals
+    def score_weather_points(self, weather_points, route_name=None, route_type=None):
+        """Calculate ice risk for sampled weather points.
         
-        # Get historical weather data
-        historical_weather_points = self.historical_service.get_weather_for_route_points(
-            sample_points, route_name.split(' to ')[0] if ' to ' in route_name else route_name,
-            route_name.split(' to ')[1] if ' to ' in route_name else route_name
-        )
+        The same weather points can be scored for several route variations; route_type
+        overrides the per-segment road type so only the route modifier changes.
+        """
+        if not weather_points:
+            return []
         
-        for weather_point in historical_weather_points:
-            ice_detector = IceDetector()
-            
-            # Determine route type for risk calculation
-            route_type = self._determine_route_type(
+        # Determine route type for risk calculation
+        route_types = [
+            route_type or self._determine_route_type(
                 weather_point['segment_index'], 
-                len(historical_weather_points), 
+                len(weather_points), 
                 route_name
             )
-            
-            ice_risk = ice_detector.calculate_ice_risk(
-                weather_point['weather'], 
-                weather_point['location']['lat'], 
-                weather_point['location']['lng'], 
-                route_name, 
-                route_type
-            )
-            
-            weather_data.append({
+            for weather_point in weather_points
+        ]
+        
+        try:
+            with metrics.SCORING_STAGE.time():
+                weathers = [weather_point['weather'] for weather_point in weather_points]
+                # Historical and raster points carry a precomputed base risk
+                base_risks = [weather_point.get('base_risk') for weather_point in weather_points]
+                ice_risks, _ = self.ice_detector.calculate_ice_risk_batch(
+                    [w.get('temp', 0) for w in weathers],
+                    [w.get('humidity', 0) for w in weathers],
+                    [w.get('precipitation', 0) for w in weathers],
+                    [w.get('snowfall', 0) for w in weathers],
+                    [w.get('wind_speed', 0) for w in weathers],
+                    [weather_point['location']['lat'] for weather_point in weather_points],
+                    [weather_point['location']['lng'] for weather_point in weather_points],
+                    route_types,
+                    route_name,
+                    base_risk=None if None in base_risks else base_risks
+                )
+        except Exception as e:
+            print(f"Ice risk scoring error: {e}")
+            metrics.WEATHER_FALLBACKS.labels('scoring_error').inc(len(weather_points))
+            return [
+                {
+                    'location': weather_point['location'],
+                    'weather': self._get_fallback_weather(),
+                    'ice_risk': 0.3,
+                    'segment_index': weather_point['segment_index'],
+                    'route_type': 'highway',
+                    'data_source': 'fallback'
+                }
+                for weather_point in weather_points
+            ]
+        
+        scored_points = []
+        for weather_point, ice_risk, point_route_type in zip(weather_points, ice_risks.tolist(), route_types):
+            scored_point = {
                 'location': weather_point['location'],
                 'weather': weather_point['weather'],
                 'ice_risk': ice_risk,
                 'segment_index': weather_point['segment_index'],
-                'route_type': route_type,
+                'route_type': point_route_type,
                 'data_source': weather_point['data_source']
-            })
+            }
+            if 'eta' in weather_point:
+                scored_point['eta'] = weather_point['eta']
+            scored_points.append(scored_point)
+        return scored_points
+    
+    @metrics.HISTORICAL_FETCH.time()
+    def _get_historical_weather_route(self, route_points, route_name, route_key):
+        """Get historical weather for demo routes"""
+        sample_points = self.sample_route_points(route_points, 25000)  # 25km intervals
         
-        return weather_data
+        # Get historical weather data
+        return self.historical_service._get_historical_weather_for_points(route_key, sample_points)
     
-    def _get_current_weather_route(self, route_points, route_name):
-        """Get current weather for non-demo routes"""
-        weather_data = []
-        sample_points = self.sample_route_points(route_points, 50000)  # 50km intervals
+    def _get_current_weather_route(self, route_points, route_name, timeline=None):
+        """Get current weather for non-demo routes, or the forecast at each sample's ETA for long trips"""
+        sample_points, fractions = self.sample_route_positions(route_points, 50000)  # 50km intervals
+        etas = self.sample_etas(fractions, timeline)
         
-        for i, point in enumerate(sample_points):
+        # A current raster covering the whole route and trip answers without any upstream call
+        raster_points = self._raster_weather_points(sample_points, etas)
+        if raster_points is not None:
+            return raster_points
+        
+        if self.wants_forecast(etas):
             try:
-                weather = self.get_current_weather(point['lat'], point['lng'])
-                ice_detector = IceDetector()
-                
-                # Determine route type for risk calculation
-                route_type = self._determine_route_type(i, len(sample_points), route_name)
-                ice_risk = ice_detector.calculate_ice_risk(
-                    weather, point['lat'], point['lng'], route_name, route_type
-                )
-                
-                weather_data.append({
-                    'location': point,
-                    'weather': weather,
-                    'ice_risk': ice_risk,
-                    'segment_index': i,
-                    'route_type': route_type,
-                    'data_source': 'current'
-                })
+                weathers = self.get_forecast_weather_batch(sample_points, etas)
+                return self._current_weather_points(sample_points, weathers, etas, data_source='forecast')
             except Exception as e:
-                print(f"Current weather error: {e}")
-                weather_data.append({
-                    'location': point,
-                    'weather': self._get_fallback_weather(),
-                    'ice_risk': 0.3,
-                    'segment_index': i,
-                    'route_type': 'highway',
-                    'data_source': 'fallback'
-                })
+                print(f"OpenMeteo hourly forecast error for {len(sample_points)} points: {e} - Using current weather")
+        
+        # One batched round-trip for every sampled point on the route
+        weathers = self.get_current_weather_batch(sample_points)
+        return self._current_weather_points(sample_points, weathers, etas)
+    
+    def sample_etas(self, fractions, timeline):
+        """Epoch-second ETA of every sample from its share of the route length; None without a timeline"""
+        if timeline is None:
+            return None
+        meters, seconds = timeline
+        if meters[-1] <= 0:
+            return np.full(len(fractions), seconds[0])
+        return np.interp(np.asarray(fractions) * meters[-1], meters, seconds)
+    
+    def wants_forecast(self, etas):
+        """True when the trip runs long enough that later samples need later weather"""
+        return etas is not None and len(etas) > 0 and etas.max() - time.time() >= self.forecast_min_trip_seconds
+    
+    def _raster_weather_points(self, sample_points, etas=None):
+        """Unscored weather points sampled from a current raster; None if no raster covers every point.
+        
+        With ETAs the raster also has to stay valid until the last sample is reached.
+        """
+        if self.raster_store is None or not sample_points:
+            return None
+        
+        started = time.perf_counter()
+        lats, lngs = geodesy.points_to_arrays(sample_points)
+        try:
+            raster = self.raster_store.find(lats, lngs, 'current')
+            if raster is None or (etas is not None and not raster.valid_at(etas.max())):
+                return None
+            samples = raster.sample(lats, lngs)
+        except Exception as e:
+            print(f"Ice-risk raster error: {e} - Using current weather")
+            return None
+        if any(np.isnan(values).any() for values in samples.values()):
+            return None
+        
+        columns = {name: values.tolist() for name, values in samples.items()}
+        weather_points = []
+        for i, point in enumerate(sample_points):
+            weather = {
+                'temp': round(columns['temp'][i], 1),
+                'humidity': round(columns['humidity'][i], 1),
+                'precipitation': round(columns['precipitation'][i], 2),
+                'wind_speed': round(columns['wind_speed'][i], 1),
+                'feels_like': round(columns['feels_like'][i], 1),
+                'visibility': round(columns['visibility'][i], 1),
+                'snowfall': round(columns['snowfall'][i], 2),
+                'rain': round(columns['rain'][i], 2)
+            }
+            weather['description'] = self._generate_current_weather_description(
+                weather['temp'], weather['precipitation'], weather['snowfall'], weather['rain'], weather['wind_speed']
+            )
+            weather_points.append({
+                'location': point,
+                'weather': weather,
+                'base_risk': columns['base_risk'][i],
+                'segment_index': i,
+                'data_source': 'raster'
+            })
+            if etas is not None:
+                weather_points[-1]['eta'] = int(etas[i])
         
-        return weather_data
+        metrics.RASTER_FETCH.observe(time.perf_counter() - started)
+        return weather_points
+    
+    def _current_weather_points(self, sample_points, weathers, etas=None, data_source='current'):
+        """Unscored weather points for sampled route points and their weather, stamped with ETAs if known"""
+        weather_points = [
+            {
+                'location': point,
+                'weather': weather,
+                'segment_index': i,
+                'data_source': data_source
+            }
+            for i, (point, weather) in enumerate(zip(sample_points, weathers))
+        ]
+        if etas is not None:
+            for weather_point, eta in zip(weather_points, etas.tolist()):
+                weather_point['eta'] = int(eta)
+        return weather_points
     
     def _determine_route_type(self, segment_index, total_segments, route_name):
         """Determine route type to create variation for different driver levels"""
@@ -973,69 +1207,106 @@ class WeatherService:
     
     def get_current_weather(self, lat, lng):
         """Get current weather from OpenMeteo API instead of OpenWeatherMap"""
+        return self.get_current_weather_batch([{'lat': lat, 'lng': lng}])[0]
+    
+    def get_current_weather_batch(self, points):
+        """Get current weather for many points, served from the tile cache where possible"""
+        if not points:
+            return []
+        
+        started = time.perf_counter()
         try:
-            url = "https://api.open-meteo.com/v1/forecast"
-            params = {
-                "latitude": lat,
-                "longitude": lng,
-                "current": [
-                    "temperature_2m",
-                    "relative_humidity_2m", 
-                    "precipitation",
-                    "snowfall",
-                    "rain",
-                    "wind_speed_10m",
-                    "wind_gusts_10m"
-                ],
-                "daily": ["temperature_2m_max", "temperature_2m_min"],
-                "timezone": "auto",
-                "forecast_days": 1
-            }
-            
-            responses = self.historical_service.openmeteo.weather_api(url, params=params)
-            response = responses[0]
-            
-            # Get current weather
-            current = response.Current()
-            daily = response.Daily()
-            
-            # Extract current values
-            current_temp = current.Variables(0).Value()
-            humidity = current.Variables(1).Value()
-            precipitation = current.Variables(2).Value()
-            snowfall = current.Variables(3).Value()
-            rain = current.Variables(4).Value()
-            wind_speed = current.Variables(5).Value() * 3.6  # Convert m/s to km/h
-            wind_gusts = current.Variables(6).Value() * 3.6
-            
-            # Get daily min/max for feels_like calculation
-            temp_max = daily.Variables(0).ValuesAsNumpy()[0]
-            temp_min = daily.Variables(1).ValuesAsNumpy()[0]
-            feels_like = temp_min if current_temp < (temp_max + temp_min) / 2 else current_temp
-            
-            # Generate description based on conditions
-            description = self._generate_current_weather_description(
-                current_temp, precipitation, snowfall, rain, wind_speed
-            )
-            
-            # Calculate visibility based on precipitation and weather conditions
-            visibility = max(1, 15 - precipitation - snowfall)
-            
-            return {
-                'temp': round(current_temp, 1),
-                'humidity': round(humidity, 1),
-                'precipitation': round(precipitation + snowfall, 2),
-                'wind_speed': round(wind_speed, 1),
-                'description': description,
-                'feels_like': round(feels_like - (wind_speed * 0.1), 1),
-                'visibility': round(visibility, 1),
-                'snowfall': round(snowfall, 2),
-                'rain': round(rain, 2)
-            }
+            weathers = self.tile_cache.get_many(points, self._fetch_current_weather_batch)
+            metrics.CURRENT_FETCH.observe(time.perf_counter() - started)
+            return weathers
             
         except Exception as e:
-            print(f"OpenMeteo current weather error for {lat}, {lng}: {e} - Falling back to simulated weather")
-            return self._get_current_weather_simulation(lat, lng)
+            print(f"OpenMeteo current weather error for {len(points)} points: {e} - Falling back to simulated weather")
+            metrics.WEATHER_FALLBACKS.labels('current_weather_error').inc(len(points))
+            weathers = [self._get_current_weather_simulation(point['lat'], point['lng']) for point in points]
+            metrics.FALLBACK_FETCH.observe(time.perf_counter() - started)
+            return weathers
+    
+    def _fetch_current_weather_batch(self, points):
+        """Fetch current weather for many points with chunked multi-location OpenMeteo requests"""
+        responses = fetch_openmeteo_batch(
+            self.historical_service.openmeteo, self.historical_service.forecast_url, CURRENT_WEATHER_PARAMS, points,
+            self.historical_service.upstream_pool
+        )
+        return [self._parse_current_weather_response(response) for response in responses]
+    
+    def get_forecast_weather_batch(self, points, etas):
+        """Forecast weather for every point at its ETA, from one batched hourly request for the route"""
+        started = time.perf_counter()
+        responses = fetch_openmeteo_batch(
+            self.historical_service.openmeteo, self.historical_service.forecast_url, self.forecast_params(etas), points,
+            self.historical_service.upstream_pool
+        )
+        weathers = [self._parse_forecast_response(response, eta) for response, eta in zip(responses, etas.tolist())]
+        metrics.FORECAST_FETCH.observe(time.perf_counter() - started)
+        return weathers
+    
+    def forecast_params(self, etas, now=None):
+        """Hourly forecast request covering every hour from now until the last ETA"""
+        now = time.time() if now is None else now
+        hours = int(math.ceil((etas.max() - (now - now % 3600)) / 3600)) + 1
+        return dict(HOURLY_FORECAST_PARAMS, forecast_hours=min(max(hours, 1), FORECAST_MAX_HOURS))
+    
+    def _parse_forecast_response(self, response, eta):
+        """Weather of one OpenMeteo hourly forecast response, interpolated between the hours around eta"""
+        hourly = response.Hourly()
+        values = [hourly.Variables(i).ValuesAsNumpy() for i in range(len(HOURLY_FORECAST_PARAMS['hourly']))]
+        times = hourly.Time() + hourly.Interval() * np.arange(len(values[0]))
+        temp, humidity, precipitation, snowfall, rain, wind_speed, apparent = (
+            float(np.interp(eta, times, column)) for column in values
+        )
+        return self._weather_info(temp, humidity, precipitation, snowfall, rain, wind_speed * 3.6, apparent)
+    
+    def _parse_current_weather_response(self, response):
+        """Convert one OpenMeteo forecast response to our weather format"""
+        # Get current weather
+        current = response.Current()
+        daily = response.Daily()
+        
+        # Extract current values
+        current_temp = current.Variables(0).Value()
+        humidity = current.Variables(1).Value()
+        precipitation = current.Variables(2).Value()
+        snowfall = current.Variables(3).Value()
+        rain = current.Variables(4).Value()
+        wind_speed = current.Variables(5).Value() * 3.6  # Convert m/s to km/h
+        wind_gusts = current.Variables(6).Value() * 3.6
+        
+        # Get daily min/max for feels_like calculation
+        temp_max = float(daily.Variables(0).ValuesAsNumpy()[0])
+        temp_min = float(daily.Variables(1).ValuesAsNumpy()[0])
+        feels_like = temp_min if current_temp < (temp_max + temp_min) / 2 else current_temp
+        
+        return self._weather_info(
+            current_temp, humidity, precipitation, snowfall, rain, wind_speed, feels_like - (wind_speed * 0.1)
+        )
+    
+    def _weather_info(self, temp, humidity, precipitation, snowfall, rain, wind_speed, feels_like):
+        """Our weather format from OpenMeteo conditions at one place and time"""
+        # Generate description based on conditions
+        description = self._generate_current_weather_description(
+            temp, precipitation, snowfall, rain, wind_speed
+        )
+        
+        # Calculate visibility based on precipitation and weather conditions
+        visibility = max(1, 15 - precipitation - snowfall)
+        
+        return {
+            'temp': round(temp, 1),
+            'humidity': round(humidity, 1),
+            'precipitation': round(precipitation + snowfall, 2),
+            'wind_speed': round(wind_speed, 1),
+            'description': description,
+            'feels_like': round(feels_like, 1),
+            'visibility': round(visibility, 1),
+            'snowfall': round(snowfall, 2),
+            'rain': round(rain, 2)
+        }
         
     def _generate_current_weather_description(self, temp, precipitation, snowfall, rain, wind_speed):
         """Generate weather description from current OpenMeteo data"""
@@ -1117,181 +1388,214 @@ class WeatherService:
             'rain': 0
         }
     
-    def _is_general_location_query(self, route_name):
-        """Check if this is a general location that should use real-time weather"""
-        if not route_name:
-            return True
-        
-        # Check if route contains our demo locations
-        demo_locations = ['minneapolis', 'duluth', 'buffalo', 'syracuse', 
-                         'detroit', 'grand rapids', 'denver', 'vail']
-        
-        route_lower = route_name.lower()
-        return not any(loc in route_lower for loc in demo_locations)
-    
     def sample_route_points(self, route_points, interval_meters):
-        """Sample points along route at specified intervals"""
-        if not route_points:
-            return []
-        
-        sampled_points = [route_points[0]]
-        total_distance = 0
-        last_sampled_distance = 0
+        """Sample points along route at specified intervals.
         
-        for i in range(1, len(route_points)):
-            segment_distance = self._calculate_distance(
-                route_points[i-1]['lat'], route_points[i-1]['lng'],
-                route_points[i]['lat'], route_points[i]['lng']
-            )
-            total_distance += segment_distance
-            
-            if total_distance - last_sampled_distance >= interval_meters:
-                sampled_points.append(route_points[i])
-                last_sampled_distance = total_distance
-        
-        if route_points[-1] not in sampled_points:
-            sampled_points.append(route_points[-1])
-        
-        return sampled_points
+        route_points is a list of {'lat', 'lng'} dicts or an (n, 2) [lat, lng] array.
+        """
+        return self.sample_route_positions(route_points, interval_meters)[0]
     
-    def _calculate_distance(self, lat1, lng1, lat2, lng2):
-        """Calculate distance in meters"""
-        R = 6371000
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
+    @metrics.SAMPLING_STAGE.time()
+    def sample_route_positions(self, route_points, interval_meters):
+        """sample_route_points plus the share of the route's length before each sampled point"""
+        if len(route_points) == 0:
+            return [], np.empty(0)
+        
+        if isinstance(route_points, np.ndarray):
+            lats, lngs = route_points[:, 0], route_points[:, 1]
+            point_at = lambda i: {'lat': float(lats[i]), 'lng': float(lngs[i])}
+        else:
+            lats, lngs = geodesy.points_to_arrays(route_points)
+            point_at = lambda i: route_points[i]
         
-        a = (math.sin(delta_lat/2)**2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+        cumulative = geodesy.cumulative_distance(lats, lngs)
+        indices = geodesy.sample_indices(cumulative, interval_meters).tolist()
+        sampled_points = [point_at(i) for i in indices]
         
-        return R * c
+        last_point = point_at(len(lats) - 1)
+        if last_point not in sampled_points:
+            sampled_points.append(last_point)
+            indices.append(len(lats) - 1)
+        
+        total = cumulative[-1]
+        fractions = cumulative[indices] / total if total > 0 else np.zeros(len(indices))
+        return sampled_points, fractions
 
 class RouteOptimizer:
-    def __init__(self, gmaps_client):
+    def __init__(self, gmaps_client, weather_service=None, upstream_pool=None):
         self.gmaps = gmaps_client
+        self.weather_service = weather_service or WeatherService(os.getenv('GOOGLE_MAPS_API_KEY'))
+        self.ice_detector = self.weather_service.ice_detector
+        self.upstream_pool = upstream_pool or self.weather_service.historical_service.upstream_pool or UpstreamPool()
+        
+        # Douglas-Peucker tolerance for route geometry, in meters
+        self.simplify_tolerance = 50
+        # Tighter tolerance for the path the browser draws, in meters
+        self.path_tolerance = 10
     
     def get_routes(self, origin, destination, avoid_icy=False):
         """Get route options with enhanced variety for different driver levels"""
         try:
-            # Get multiple route alternatives with different avoid parameters
-            base_routes = self._get_base_routes(origin, destination)
-            
-            # Generate additional route variations for different driver experience levels
-            all_routes = []
-            weather_service = WeatherService(GOOGLE_MAPS_API_KEY)
-            
-            # Determine route context
-            route_context = f"{origin} to {destination}"
-            
-            for i, route in enumerate(base_routes):
-                # Create variations for different driving preferences
-                route_variations = self._create_route_variations(route, i)
-                
-                for variation_type, route_data in route_variations.items():
-                    route_points = self.extract_route_points(route_data)
-                    route_name = f"{route_data.get('summary', f'Route {i+1}')} ({variation_type})"
-                    
-                    # Get weather data (historical for demo routes, current for others)
-                    weather_data = weather_service.get_weather_along_route(
-                        route_points, route_context
-                    )
-                    
-                    # Calculate risk metrics
-                    ice_risks = [w['ice_risk'] for w in weather_data]
-                    avg_ice_risk = sum(ice_risks) / len(ice_risks) if ice_risks else 0
-                    max_ice_risk = max(ice_risks) if ice_risks else 0
-                    
-                    # Risk variance and high-risk segments
-                    risk_variance = sum((r - avg_ice_risk) ** 2 for r in ice_risks) / len(ice_risks) if ice_risks else 0
-                    high_risk_segments = sum(1 for r in ice_risks if r > 0.7)
-                    
-                    route_info = {
-                        'route_index': len(all_routes),
-                        'summary': route_name,
-                        'distance': route_data['legs'][0]['distance']['text'],
-                        'duration': route_data['legs'][0]['duration']['text'],
-                        'avg_ice_risk': avg_ice_risk,
-                        'max_ice_risk': max_ice_risk,
-                        'risk_variance': risk_variance,
-                        'high_risk_segments': high_risk_segments,
-                        'risk_level': IceDetector().get_risk_level(avg_ice_risk),
-                        'weather_points': weather_data,
-                        'polyline': route_data['overview_polyline']['points'],
-                        'start_location': {
-                            'lat': route_data['legs'][0]['start_location']['lat'],
-                            'lng': route_data['legs'][0]['start_location']['lng']
-                        },
-                        'end_location': {
-                            'lat': route_data['legs'][0]['end_location']['lat'],
-                            'lng': route_data['legs'][0]['end_location']['lng']
-                        },
-                        'bounds': {
-                            'northeast': route_data['bounds']['northeast'],
-                            'southwest': route_data['bounds']['southwest']
-                        },
-                        'route_type': variation_type,
-                        'driver_suitability': self._get_driver_suitability(avg_ice_risk, variation_type),
-                        'weather_source': weather_data[0]['data_source'] if weather_data else 'unknown'
-                    }
-                    
-                    all_routes.append(route_info)
-            
-            # Sort routes appropriately
-            if avoid_icy:
-                all_routes.sort(key=lambda x: (x['avg_ice_risk'], x['max_ice_risk'], x['high_risk_segments']))
-            else:
-                all_routes.sort(key=lambda x: self._parse_duration(x['duration']))
-            
-            return all_routes[:5]  # Return top 5 routes
+            all_routes = sorted(self.iter_scored_routes(origin, destination), key=lambda r: r['route_index'])
+            return self.rank_routes(all_routes, avoid_icy)
             
         except Exception as e:
             print(f"Route calculation error: {e}")
             return []
     
-    def _get_base_routes(self, origin, destination):
-        """Get base routes with different parameters"""
-        routes = []
+    def iter_scored_routes(self, origin, destination):
+        """Yield every scored route variation as soon as its base route's weather is in"""
+        # Directions and weather both work from the same departure time
+        departure_time = datetime.now()
+        
+        # Get multiple route alternatives with different avoid parameters
+        base_routes = self._get_base_routes(origin, destination, departure_time)
+        
+        # Determine route context
+        route_context = f"{origin} to {destination}"
+        
+        # Numbered up front: base routes finish in any order and have two or three variations
+        first_indexes = self.variation_offsets(base_routes)
+        
+        # Sample and fetch weather once per unique geometry, concurrently across base routes
+        route_weather = self.upstream_pool.iter_completed(
+            None,
+            lambda route: self.weather_service.match_route_weather(
+                self.extract_route_geometry(route, self.simplify_tolerance), route_context,
+                self.route_timeline(route, departure_time)
+            ),
+            base_routes
+        )
         
-        try:
-            # Standard routes
-            directions_result = self.gmaps.directions(
-                origin, destination,
-                mode="driving",
-                alternatives=True,
-                departure_time=datetime.now()
+        for i, (route_key, weather_points) in route_weather:
+            yield from self.score_base_route(
+                i, base_routes[i], weather_points, route_context, first_indexes[i], route_key
             )
-            routes.extend(directions_result)
-            
-            # Routes avoiding tolls (often longer, safer)
-            try:
-                toll_free = self.gmaps.directions(
-                    origin, destination,
-                    mode="driving",
-                    alternatives=True,
-                    avoid=["tolls"],
-                    departure_time=datetime.now()
-                )
-                routes.extend(toll_free)
-            except:
-                pass
-            
-            # Routes avoiding highways (more local roads)
+    
+    def variation_offsets(self, base_routes):
+        """route_index of the first variation of every base route.
+        
+        Variations are numbered consecutively in base-route order, the order
+        scoring every base route one after another would give them.
+        """
+        offsets = []
+        total = 0
+        for i, route in enumerate(base_routes):
+            offsets.append(total)
+            total += len(self._create_route_variations(route, i))
+        return offsets
+    
+    def score_base_route(self, i, route, weather_points, route_context, first_index, route_key=None):
+        """Scored variations of base route i from its shared weather points, numbered from first_index.
+        
+        route_key is the corridor the weather points were drawn from, if any.
+        """
+        # Create variations for different driving preferences
+        route_variations = self._create_route_variations(route, i)
+        
+        # Drawn by the browser directly, so it never has to ask Directions for the route again
+        path_polyline = self.encode_route_path(route)
+        
+        scored = []
+        for j, (variation_type, route_data) in enumerate(route_variations.items()):
+            route_info = self._score_route_variation(
+                i, variation_type, route_data, weather_points, route_context
+            )
+            route_info['route_index'] = first_index + j
+            route_info['path_polyline'] = path_polyline
+            route_info['route_key'] = route_key
+            scored.append(route_info)
+        return scored
+    
+    def rank_routes(self, all_routes, avoid_icy=False):
+        """Sort scored routes by risk or duration and keep the top 5"""
+        if avoid_icy:
+            ranked = sorted(all_routes, key=lambda x: (x['avg_ice_risk'], x['max_ice_risk'], x['high_risk_segments']))
+        else:
+            ranked = sorted(all_routes, key=lambda x: self._parse_duration(x['duration']))
+        
+        return ranked[:5]  # Return top 5 routes
+    
+    def _score_route_variation(self, i, variation_type, route_data, weather_points, route_context):
+        """Score a route variation from its geometry's shared weather points"""
+        route_name = f"{route_data.get('summary', f'Route {i+1}')} ({variation_type})"
+        
+        # Only the road-type modifier differs between variations of the same geometry
+        weather_data = self.weather_service.score_weather_points(
+            weather_points, route_context, route_type=variation_type
+        )
+        
+        # Calculate risk metrics
+        ice_risks = [w['ice_risk'] for w in weather_data]
+        avg_ice_risk = sum(ice_risks) / len(ice_risks) if ice_risks else 0
+        max_ice_risk = max(ice_risks) if ice_risks else 0
+        
+        # Risk variance and high-risk segments
+        risk_variance = sum((r - avg_ice_risk) ** 2 for r in ice_risks) / len(ice_risks) if ice_risks else 0
+        high_risk_segments = sum(1 for r in ice_risks if r > 0.7)
+        
+        return {
+            'summary': route_name,
+            'distance': route_data['legs'][0]['distance']['text'],
+            'duration': route_data['legs'][0]['duration']['text'],
+            'avg_ice_risk': avg_ice_risk,
+            'max_ice_risk': max_ice_risk,
+            'risk_variance': risk_variance,
+            'high_risk_segments': high_risk_segments,
+            'risk_level': self.ice_detector.get_risk_level(avg_ice_risk),
+            'weather_points': weather_data,
+            'polyline': route_data['overview_polyline']['points'],
+            'start_location': {
+                'lat': route_data['legs'][0]['start_location']['lat'],
+                'lng': route_data['legs'][0]['start_location']['lng']
+            },
+            'end_location': {
+                'lat': route_data['legs'][0]['end_location']['lat'],
+                'lng': route_data['legs'][0]['end_location']['lng']
+            },
+            'bounds': {
+                'northeast': route_data['bounds']['northeast'],
+                'southwest': route_data['bounds']['southwest']
+            },
+            'route_type': variation_type,
+            'driver_suitability': self._get_driver_suitability(avg_ice_risk, variation_type),
+            'weather_source': weather_data[0]['data_source'] if weather_data else 'unknown'
+        }
+    
+    def _get_base_routes(self, origin, destination, departure_time=None):
+        """Get base routes with different parameters"""
+        departure_time = departure_time or datetime.now()
+        
+        def fetch_directions(avoid):
             try:
-                no_highways = self.gmaps.directions(
-                    origin, destination,
-                    mode="driving",
-                    alternatives=True,
-                    avoid=["highways"],
-                    departure_time=datetime.now()
-                )
-                routes.extend(no_highways)
-            except:
-                pass
-                
-        except Exception as e:
-            print(f"Error getting base routes: {e}")
+                with metrics.UPSTREAM_SECONDS.labels('google_directions').time():
+                    return self.gmaps.directions(
+                        origin, destination,
+                        mode="driving",
+                        alternatives=True,
+                        avoid=avoid,
+                        departure_time=departure_time
+                    )
+            except Exception:
+                metrics.UPSTREAM_ERRORS.labels('google_directions').inc()
+                raise
+        
+        # The avoid options are requested concurrently
+        with metrics.DIRECTIONS_STAGE.time():
+            results = self.upstream_pool.map(
+                'google_directions', fetch_directions, BASE_ROUTE_AVOID_OPTIONS, return_exceptions=True
+            )
+        return self.unique_base_routes(results)
+    
+    def unique_base_routes(self, results):
+        """Merge Directions results (one per avoid option, or the exception it raised) into unique base routes"""
+        routes = []
+        for avoid, result in zip(BASE_ROUTE_AVOID_OPTIONS, results):
+            if isinstance(result, Exception):
+                if avoid is None:
+                    print(f"Error getting base routes: {result}")
+                continue
+            routes.extend(result)
         
         # Remove duplicates and limit
         unique_routes = []
@@ -1356,99 +1660,317 @@ class RouteOptimizer:
         
         return total_minutes or 60  # Default to 60 minutes
     
-    def extract_route_points(self, route):
-        """Extract coordinate points from route with better sampling"""
-        points = []
+    @metrics.GEOMETRY_STAGE.time()
+    def extract_route_geometry(self, route, simplify_tolerance=None):
+        """Build the route's road geometry as an (n, 2) array of [lat, lng].
+        
+        Each step's encoded polyline is decoded (falling back to its start/end
+        locations), repeated step-boundary vertices are removed, the path is
+        optionally Douglas-Peucker simplified, and long segments are densified so
+        interval sampling still finds vertices on straight stretches.
+        """
+        coords = self._step_geometry(route)
+        if simplify_tolerance:
+            coords = geodesy.simplify(coords, simplify_tolerance)
+        
+        # Add intermediate points for segments longer than 10km
+        return geodesy.densify(coords, 10000)
+    
+    def _step_geometry(self, route):
+        """Full-detail [lat, lng] path from the encoded polylines of every step"""
+        parts = []
         
         for leg in route['legs']:
             for step in leg['steps']:
-                points.append({
-                    'lat': step['start_location']['lat'],
-                    'lng': step['start_location']['lng']
-                })
+                encoded = step.get('polyline', {}).get('points')
+                step_coords = geodesy.decode_polyline(encoded) if encoded else None
                 
-                # Add intermediate points for longer segments
-                start = step['start_location']
-                end = step['end_location']
-                distance = self._calculate_distance(start['lat'], start['lng'], end['lat'], end['lng'])
-                
-                # Add intermediate points for segments longer than 10km
-                if distance > 10000:
-                    num_intermediate = min(5, int(distance / 10000))
-                    for j in range(1, num_intermediate):
-                        ratio = j / num_intermediate
-                        intermediate_lat = start['lat'] + (end['lat'] - start['lat']) * ratio
-                        intermediate_lng = start['lng'] + (end['lng'] - start['lng']) * ratio
-                        points.append({
-                            'lat': intermediate_lat,
-                            'lng': intermediate_lng
-                        })
-                
-                points.append({
-                    'lat': step['end_location']['lat'],
-                    'lng': step['end_location']['lng']
-                })
+                if step_coords is None or len(step_coords) == 0:
+                    step_coords = np.array([
+                        [step['start_location']['lat'], step['start_location']['lng']],
+                        [step['end_location']['lat'], step['end_location']['lng']]
+                    ])
+                parts.append(step_coords)
         
-        return points
-    
-    def _calculate_distance(self, lat1, lng1, lat2, lng2):
-        """Calculate distance in meters"""
-        R = 6371000
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
+        if not parts:
+            return np.empty((0, 2))
         
-        a = (math.sin(delta_lat/2)**2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
+        return geodesy.dedupe_consecutive(np.concatenate(parts))
+    
+    def route_timeline(self, route, departure_time):
+        """(along-route meters, epoch seconds) at the start and at the end of every step.
+        
+        Built from the step distances and durations Directions reports, so an
+        ETA for any share of the route can be interpolated from it.
+        """
+        meters = [0.0]
+        seconds = [departure_time.timestamp()]
+        for leg in route['legs']:
+            for step in leg['steps']:
+                meters.append(meters[-1] + step.get('distance', {}).get('value', 0))
+                seconds.append(seconds[-1] + step.get('duration', {}).get('value', 0))
+        return np.array(meters), np.array(seconds)
+    
+    def encode_route_path(self, route):
+        """Encoded polyline of the route's road geometry, simplified to path_tolerance"""
+        coords = self._step_geometry(route)
+        if len(coords) == 0:
+            return route.get('overview_polyline', {}).get('points', '')
+        return geodesy.encode_polyline(geodesy.simplify(coords, self.path_tolerance))
+    
+    def extract_route_points(self, route, simplify_tolerance=None):
+        """Extract coordinate points from route with better sampling"""
+        coords = self.extract_route_geometry(route, simplify_tolerance)
+        return [{'lat': lat, 'lng': lng} for lat, lng in coords.tolist()]
+
+class IcyRouteEngine:
+    """Long-lived owner of the upstream clients, weather services and scoring state.
+    
+    One engine is created per Flask app, on its first request, and shared by
+    every request to that app, so the Open-Meteo session, its SQLite cache
+    handle and the loaded station data are set up once instead of on every
+    /api/routes call. ``settings`` is the app's config (see load_config).
+    """
+    
+    def __init__(self, gmaps_client, settings):
+        self.gmaps = gmaps_client
+        self.settings = settings
+        self.api_key = settings['GOOGLE_MAPS_API_KEY']
+        self.started_at = None
+        # The pool outlives reloads so in-flight requests keep working
+        self.upstream_pool = UpstreamPool(max_workers=settings['UPSTREAM_MAX_WORKERS'])
+        self._build()
+        # Reads the current services on every run, so it also outlives reloads
+        self.refresh_scheduler = RefreshScheduler(
+            self,
+            interval_seconds=settings['REFRESH_INTERVAL_SECONDS'],
+            budget_per_run=settings['REFRESH_BUDGET_PER_RUN'],
+            lead_seconds=settings['REFRESH_LEAD_SECONDS'],
+            max_cells=settings['REFRESH_MAX_CELLS'],
+            batch_size=OPENMETEO_BATCH_SIZE
+        )
+    
+    def _build(self):
+        """Construct the services owned by this engine"""
+        settings = self.settings
+        self.ice_detector = IceDetector()
+        self.historical_service = HistoricalWeatherService(self.upstream_pool, self.ice_detector, settings=settings)
+        self.weather_service = WeatherService(
+            self.api_key,
+            historical_service=self.historical_service,
+            ice_detector=self.ice_detector,
+            raster_store=RasterStore(settings['RASTER_DIR']),
+            settings=settings
+        )
+        self.route_optimizer = RouteOptimizer(self.gmaps, self.weather_service, self.upstream_pool)
+        self.route_cache = RouteResultCache(ttl_seconds=settings['ROUTE_CACHE_TTL_SECONDS'])
+        self.started_at = datetime.now()
+    
+    def weather_epoch(self):
+        """Stamp that changes whenever the weather behind a route query may have changed.
+        
+        Which corridor a route runs along is only known once its geometry is
+        scored, so the stamp covers every source a query could be scored from:
+        the current-weather time bucket and each corridor's data on disk.
+        """
+        historical_service = self.historical_service
+        corridors = historical_service.station_store.version(historical_service.demo_routes)
+        bucket_seconds = self.weather_service.tile_cache.time_bucket_seconds
+        return f"current:{int(datetime.now().timestamp() // bucket_seconds)}:corridors:{corridors}"
+    
+    def get_routes(self, origin, destination, avoid_icy=False):
+        """Scored route set for a query, served from the route cache when possible.
+        
+        Returns (routes, cache_hit). The set is shared between driver experience
+        levels, which are filtered by the caller.
+        """
+        key = self.route_cache.key(origin, destination, avoid_icy, self.weather_epoch())
+        return self.route_cache.get_or_compute(
+            key, lambda: self.route_optimizer.get_routes(origin, destination, avoid_icy)
+        )
+    
+    def stream_routes(self, origin, destination, avoid_icy=False):
+        """Yield ('route', route) for each scored route as it is ready, then ('ranked', routes).
+        
+        A cached set is replayed immediately; a freshly computed set is cached
+        once every route has been scored. Identical queries arriving while one
+        is being scored wait for it and replay its result.
+        """
+        key = self.route_cache.key(origin, destination, avoid_icy, self.weather_epoch())
+        return self.route_cache.stream_or_compute(
+            key, lambda: self._score_routes(origin, destination, avoid_icy), replay_routes
+        )
+    
+    def _score_routes(self, origin, destination, avoid_icy):
+        scored = []
+        for route in self.route_optimizer.iter_scored_routes(origin, destination):
+            scored.append(route)
+            yield 'route', route
+        yield 'ranked', self.route_optimizer.rank_routes(sorted(scored, key=lambda r: r['route_index']), avoid_icy)
+    
+    def reload(self):
+        """Drop all sessions and cached state and rebuild the services"""
+        print("🔄 Reloading IcyRoute engine")
+        previous_service = self.historical_service
+        self._build()
+        # Close the old session only after new requests can pick up the new services
+        previous_service.close()
+    
+    def shutdown(self):
+        """Release upstream sessions held by the engine"""
+        print("🛑 Shutting down IcyRoute engine")
+        self.refresh_scheduler.stop()
+        self.historical_service.close()
+        self.upstream_pool.shutdown()
 
-# Initialize historical weather service at startup
-historical_weather_service = HistoricalWeatherService()
+_engine_lock = threading.Lock()
 
-# Flask Routes
-@app.route('/')
+def get_engine(flask_app=None):
+    """Return an app's engine, creating it on first use; defaults to the app handling the request"""
+    flask_app = flask_app or current_app._get_current_object()
+    engine = flask_app.extensions.get('icyroute')
+    if engine is None:
+        with _engine_lock:
+            engine = flask_app.extensions.get('icyroute')
+            if engine is None:
+                engine = IcyRouteEngine(build_gmaps_client(flask_app.config), flask_app.config)
+                atexit.register(engine.shutdown)
+                if flask_app.config['REFRESH_ENABLED']:
+                    engine.refresh_scheduler.start()
+                flask_app.extensions['icyroute'] = engine
+    return engine
+
+def engine_caches():
+    """Caches of the scraped app's engine; nothing is reported before its first request"""
+    engine = current_app.extensions.get('icyroute') if has_app_context() else None
+    if engine is None:
+        return {}
+    return {
+        'weather_tiles': engine.weather_service.tile_cache,
+        'route_results': engine.route_cache
+    }
+
+metrics.register_caches(engine_caches)
+
+# Flask Routes, registered on every app create_app builds
+routes = Blueprint('icyroute', __name__)
+
+@routes.route('/')
 def index():
-    return render_template('index.html', google_maps_api_key=GOOGLE_MAPS_API_KEY)
+    return render_template('index.html', google_maps_api_key=current_app.config['GOOGLE_MAPS_API_KEY'])
 
-@app.route('/api/routes', methods=['POST'])
+@routes.route('/api/routes', methods=['POST'])
 def get_routes():
     data = request.json
     origin = data.get('origin')
     destination = data.get('destination')
     driver_experience = data.get('driver_experience', 'intermediate')
     avoid_icy = data.get('avoid_icy', False)
+    compact = wire.wants_compact(data, request.args)
     
     if not origin or not destination:
         return jsonify({'error': 'Origin and destination required'}), 400
     
     try:
-        optimizer = RouteOptimizer(gmaps)
-        all_routes = optimizer.get_routes(origin, destination, avoid_icy)
-        
-        # Enhanced filtering based on driver experience
-        filtered_routes = filter_routes_by_experience(all_routes, driver_experience)
-        
-        # Determine weather data source
-        route_key = historical_weather_service.get_route_key(origin, destination)
-        is_demo_route = route_key is not None
-        weather_source = 'OpenMeteo Historical Data (Winter 2023-2024)' if is_demo_route else 'Current Weather Simulation'
-        
-        return jsonify({
-            'routes': filtered_routes,
-            'driver_experience': driver_experience,
-            'timestamp': datetime.now().isoformat(),
-            'is_historical_simulation': is_demo_route,
-            'weather_source': weather_source,
-            'route_key': route_key
-        })
+        engine = get_engine()
+        all_routes, _ = engine.get_routes(origin, destination, avoid_icy)
+        body = build_routes_response(driver_experience, all_routes)
+        return negotiated_json_response(body, compact)
         
     except Exception as e:
         print(f"Error in get_routes: {e}")
         return jsonify({'error': f'Route calculation failed: {str(e)}'}), 500
 
+@routes.route('/api/routes/stream', methods=['POST'])
+def stream_routes():
+    """Streaming variant of /api/routes as newline-delimited JSON.
+    
+    Emits {"type": "route"} for every route as soon as it is scored, then one
+    {"type": "result"} event with the same body /api/routes returns, or an
+    {"type": "error"} event if the calculation fails.
+    """
+    data = request.json
+    origin = data.get('origin')
+    destination = data.get('destination')
+    driver_experience = data.get('driver_experience', 'intermediate')
+    avoid_icy = data.get('avoid_icy', False)
+    compact = wire.wants_compact(data, request.args)
+    encoding = wire.choose_encoding(request.headers.get('Accept-Encoding'))
+    
+    if not origin or not destination:
+        return jsonify({'error': 'Origin and destination required'}), 400
+    
+    def generate():
+        try:
+            engine = get_engine()
+            for kind, payload in engine.stream_routes(origin, destination, avoid_icy):
+                if kind == 'route':
+                    with metrics.SERIALIZATION_STAGE.time():
+                        event = {'type': 'route', 'route': wire.encode_route(payload) if compact else payload}
+                        line = wire.dumps(event, compact)
+                else:
+                    body = build_routes_response(driver_experience, payload)
+                    with metrics.SERIALIZATION_STAGE.time():
+                        event = dict(wire.encode_routes_body(body) if compact else body, type='result')
+                        line = wire.dumps(event, compact)
+                yield line + '\n'
+        except Exception as e:
+            print(f"Error in stream_routes: {e}")
+            yield json.dumps({'type': 'error', 'error': f'Route calculation failed: {str(e)}'}) + '\n'
+    
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'Vary': 'Accept-Encoding'}
+    chunks = generate()
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        chunks = wire.compress_stream(chunks, encoding)
+    return Response(stream_with_context(chunks), mimetype='application/x-ndjson', headers=headers)
+
+def negotiated_json_response(payload, compact=False):
+    """Route response body, compact-encoded if asked and compressed with the best encoding the client accepts"""
+    with metrics.SERIALIZATION_STAGE.time():
+        if compact:
+            payload = wire.encode_routes_body(payload)
+        body, encoding = wire.compress(
+            wire.dumps(payload, compact).encode(),
+            wire.choose_encoding(request.headers.get('Accept-Encoding'))
+        )
+    response = Response(body, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def replay_routes(ranked):
+    """stream_routes events for an already ranked route set"""
+    for route in ranked:
+        yield 'route', route
+    yield 'ranked', ranked
+
+def build_routes_response(driver_experience, all_routes):
+    """Response body for a scored route set, filtered for the driver's experience"""
+    # Enhanced filtering based on driver experience
+    filtered_routes = filter_routes_by_experience(all_routes, driver_experience)
+    
+    # Determine weather data source from the corridors the routes were scored against
+    route_keys = list(dict.fromkeys(route['route_key'] for route in filtered_routes if route.get('route_key')))
+    is_demo_route = bool(route_keys)
+    if not is_demo_route:
+        weather_source = 'Current Weather Simulation'
+    elif all(route.get('route_key') for route in filtered_routes):
+        weather_source = 'OpenMeteo Historical Data (Winter 2023-2024)'
+    else:
+        weather_source = 'OpenMeteo Historical Data (Winter 2023-2024) and Current Weather Simulation'
+    
+    return {
+        'routes': filtered_routes,
+        'driver_experience': driver_experience,
+        'timestamp': datetime.now().isoformat(),
+        'is_historical_simulation': is_demo_route,
+        'weather_source': weather_source,
+        'route_key': route_keys[0] if route_keys else None,
+        'route_keys': route_keys
+    }
+
 def filter_routes_by_experience(routes, experience):
     """Enhanced filtering to ensure routes for all experience levels"""
     if not routes:
@@ -1476,11 +1998,11 @@ def filter_routes_by_experience(routes, experience):
         # Expert drivers get all routes including high-risk options
         return routes_by_safety[:5]
 
-@app.route('/demo')
+@routes.route('/demo')
 def demo():
     """Enhanced demo with historical winter scenarios"""
     demo_routes = []
-    for route_key, route_info in historical_weather_service.demo_routes.items():
+    for route_key, route_info in get_engine().historical_service.demo_routes.items():
         demo_routes.append({
             'origin': route_info['origin'],
             'destination': route_info['destination'],
@@ -1491,36 +2013,38 @@ def demo():
     
     return render_template('demo.html', demo_routes=demo_routes)
 
-@app.route('/api/weather-demo/<path:route_name>')
+@routes.route('/api/weather-demo/<path:route_name>')
 def weather_demo(route_name):
     """API endpoint to show weather details for demo routes"""
-    route_key = None
-    for key, info in historical_weather_service.demo_routes.items():
-        if route_name.lower() in key.lower():
-            route_key = key
-            break
-    
-    if route_key:
-        route_info = historical_weather_service.demo_routes[route_key]
-        return jsonify({
-            'route_key': route_key,
-            'description': route_info['description'],
-            'winter_period': route_info['winter_period'],
-            'bbox': route_info['bbox'],
-            'data_source': 'OpenMeteo Historical Archive'
-        })
+    info = weather_demo_info(get_engine().historical_service, route_name)
+    if info:
+        return jsonify(info)
     else:
         return jsonify({'error': 'Route not found'}), 404
 
-@app.route('/api/preload-weather', methods=['POST'])
+def weather_demo_info(historical_service, route_name):
+    """Details of the first demo route whose key contains route_name, or None"""
+    for route_key, route_info in historical_service.demo_routes.items():
+        if route_name.lower() in route_key.lower():
+            return {
+                'route_key': route_key,
+                'description': route_info['description'],
+                'winter_period': route_info['winter_period'],
+                'bbox': route_info['bbox'],
+                'data_source': 'OpenMeteo Historical Archive'
+            }
+    return None
+
+@routes.route('/api/preload-weather', methods=['POST'])
 def preload_weather():
     """API endpoint to preload all demo weather data"""
+    historical_service = get_engine().historical_service
     try:
-        historical_weather_service.preload_all_demo_data()
+        historical_service.preload_all_demo_data()
         return jsonify({
             'status': 'success',
             'message': 'All demo weather data preloaded',
-            'routes_cached': list(historical_weather_service.demo_routes.keys())
+            'routes_cached': list(historical_service.demo_routes.keys())
         })
     except Exception as e:
         return jsonify({
@@ -1528,21 +2052,41 @@ def preload_weather():
             'message': f'Failed to preload weather data: {str(e)}'
         }), 500
 
-@app.route('/api/cache-status')
+@routes.route('/api/reload-engine', methods=['POST'])
+def reload_engine():
+    """API endpoint to rebuild the worker's weather/risk engine"""
+    try:
+        engine = get_engine()
+        engine.reload()
+        return jsonify({
+            'status': 'success',
+            'message': 'Engine reloaded',
+            'started_at': engine.started_at.isoformat()
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to reload engine: {str(e)}'
+        }), 500
+
+@routes.route('/api/cache-status')
 def cache_status():
     """Check which weather data is already cached"""
+    historical_service = get_engine().historical_service
     cached_routes = []
     
-    for route_key in historical_weather_service.demo_routes.keys():
-        cache_file = os.path.join(WEATHER_CACHE_DIR, f"{route_key}_historical.pkl")
-        if os.path.exists(cache_file):
+    for route_key in historical_service.demo_routes.keys():
+        status = historical_service.station_store.status(route_key)
+        if status:
             # Get file modification time
-            mod_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
+            mod_time = datetime.fromtimestamp(status['cache_date'])
             cached_routes.append({
                 'route': route_key,
                 'cached': True,
                 'cache_date': mod_time.isoformat(),
-                'file_size': os.path.getsize(cache_file)
+                'file_size': status['file_size'],
+                'format_version': status['format_version'],
+                'mapped_size': status['mapped_size']
             })
         else:
             cached_routes.append({
@@ -1552,10 +2096,50 @@ def cache_status():
     
     return jsonify({
         'cache_directory': WEATHER_CACHE_DIR,
+        'format_version': FORMAT_VERSION,
         'routes': cached_routes,
+        'mapped_size': sum(r.get('mapped_size', 0) for r in cached_routes),
+        'resident_corridors': historical_service.station_store.loaded(),
+        'weather_tiles': get_engine().weather_service.tile_cache.stats(),
+        'route_results': get_engine().route_cache.stats(),
+        'rasters': get_engine().weather_service.raster_store.status(),
         'total_cached': sum(1 for r in cached_routes if r['cached'])
     })
 
+@routes.route('/metrics')
+def prometheus_metrics():
+    """Stage latencies, upstream errors, fallbacks and cache counters in Prometheus text format"""
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type)
+
+@routes.route('/api/refresh-status')
+def refresh_status():
+    """Background refresh queue, hot keys and last-run stats"""
+    return jsonify(get_engine().refresh_scheduler.stats())
+
+@routes.route('/api/refresh-now', methods=['POST'])
+def refresh_now():
+    """Run one background refresh pass immediately"""
+    try:
+        return jsonify({'status': 'success', 'run': get_engine().refresh_scheduler.run_once()})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Refresh failed: {str(e)}'}), 500
+
+def create_app(overrides=None):
+    """Flask app for IcyRoute. Nothing heavy happens here: upstream clients,
+    corridor data and caches are built by the engine on the first request.
+    
+    ``overrides`` replace entries of load_config() on this app's config only;
+    every app gets its own engine in ``flask_app.extensions['icyroute']``.
+    """
+    flask_app = Flask(__name__)
+    flask_app.config.update(load_config(overrides))
+    flask_app.extensions['icyroute'] = None
+    flask_app.register_blueprint(routes)
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
     print("🚗 IcyRoute - Enhanced Winter Route Planning System")
     print("=" * 70)
@@ -1573,8 +2157,9 @@ if __name__ == '__main__':
     print("• Smart caching system for weather data")
     print("• Enhanced ice risk calculation with real precipitation/snow data")
     print("=" * 70)
+    historical_service = get_engine(app).historical_service
     print("🎯 DEMO ROUTES WITH REAL HISTORICAL DATA:")
-    for route_key, route_info in historical_weather_service.demo_routes.items():
+    for route_key, route_info in historical_service.demo_routes.items():
         print(f"• {route_info['description']}")
         print(f"  {route_info['origin']} → {route_info['destination']}")
         print(f"  Period: {route_info['winter_period']['start']} to {route_info['winter_period']['end']}")
@@ -1593,13 +2178,14 @@ if __name__ == '__main__':
     print(f"• Cache directory: {WEATHER_CACHE_DIR}")
     print("• Automatic caching of historical data")
     print("• Visit /api/cache-status to check cache")
+    print("• Visit /api/refresh-status to check background refresh")
     print("• Visit /api/preload-weather to preload all data")
     print("=" * 70)
     
     # Preload demo weather data at startup (optional)
     try:
         print("🌨️ Preloading demo weather data...")
-        historical_weather_service.preload_all_demo_data()
+        historical_service.preload_all_demo_data()
     except Exception as e:
         print(f"⚠️ Warning: Could not preload weather data: {e}")
         print("Weather data will be fetched on-demand")
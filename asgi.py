@@ -0,0 +1,433 @@
+"""Async (ASGI) serving path for IcyRoute.
+
+Run with ``uvicorn asgi:application``. /api/routes, /api/routes/stream and
+the weather endpoints are served natively on the event loop, with Google
+Directions and Open-Meteo called through one shared httpx client, so a
+single process can hold hundreds of route requests in flight without a
+thread per request. Every other route is the unchanged Flask app, mounted
+as WSGI. Caches, corridor data and scoring are shared with the Flask path
+through the same engine.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import time
+from datetime import datetime
+
+import googlemaps
+import httpx
+from a2wsgi import WSGIMiddleware
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as icyroute
+import metrics
+import wire
+
+DIRECTIONS_PATH = "/maps/api/directions/json"
+
+# In-flight upstream calls allowed per service across every request on the event loop
+ASYNC_DIRECTIONS_CONCURRENCY = int(os.getenv('ASYNC_DIRECTIONS_CONCURRENCY', 64))
+ASYNC_OPENMETEO_CONCURRENCY = int(os.getenv('ASYNC_OPENMETEO_CONCURRENCY', 32))
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', 128))
+ASYNC_HTTP_TIMEOUT_SECONDS = float(os.getenv('ASYNC_HTTP_TIMEOUT_SECONDS', 20))
+
+
+class OpenMeteoError(Exception):
+    """Open-Meteo rejected a request or streamed back an error"""
+
+
+def decode_weather_responses(data):
+    """Split a length-prefixed FlatBuffers body into WeatherApiResponse messages"""
+    messages = []
+    pos = 0
+    while pos < len(data):
+        length = int.from_bytes(data[pos:pos + 4], byteorder='little')
+        # Errors inside a stream start with "Unexpected" where a length is expected
+        if length == 0x78656E55:
+            raise OpenMeteoError(data[pos:].decode('utf-8', errors='replace'))
+        messages.append(WeatherApiResponse.GetRootAs(data, pos + 4))
+        pos += length + 4
+    return messages
+
+
+class AsyncDirectionsClient:
+    """Google Directions over a shared httpx client"""
+
+    def __init__(self, http, api_key, base_url=icyroute.GOOGLE_MAPS_BASE_URL, concurrency=ASYNC_DIRECTIONS_CONCURRENCY):
+        self.http = http
+        self.api_key = api_key
+        self.url = base_url + DIRECTIONS_PATH
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def directions(self, origin, destination, avoid=None, departure_time=None):
+        params = {
+            'origin': origin,
+            'destination': destination,
+            'mode': 'driving',
+            'alternatives': 'true',
+            'departure_time': int((departure_time or datetime.now()).timestamp()),
+            'key': self.api_key
+        }
+        if avoid:
+            params['avoid'] = '|'.join(avoid)
+
+        try:
+            async with self._semaphore:
+                with metrics.UPSTREAM_SECONDS.labels('google_directions').time():
+                    response = await self.http.get(self.url, params=params)
+            response.raise_for_status()
+
+            body = response.json()
+            status = body.get('status')
+            if status == 'ZERO_RESULTS':
+                return []
+            if status != 'OK':
+                raise googlemaps.exceptions.ApiError(status, body.get('error_message'))
+            return body.get('routes', [])
+        except Exception:
+            metrics.UPSTREAM_ERRORS.labels('google_directions').inc()
+            raise
+
+
+class AsyncOpenMeteoClient:
+    """Open-Meteo FlatBuffers API over a shared httpx client"""
+
+    def __init__(self, http, concurrency=ASYNC_OPENMETEO_CONCURRENCY):
+        self.http = http
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def weather_api(self, url, params):
+        # Open-Meteo takes comma-separated lists for variables and coordinates
+        query = {
+            name: ','.join(str(v) for v in value) if isinstance(value, (list, tuple)) else value
+            for name, value in params.items()
+        }
+        query['format'] = 'flatbuffers'
+
+        upstream = 'openmeteo_archive' if 'archive' in url else 'openmeteo_forecast'
+        try:
+            async with self._semaphore:
+                with metrics.UPSTREAM_SECONDS.labels(upstream).time():
+                    response = await self.http.get(url, params=query)
+            if response.status_code in (400, 429):
+                raise OpenMeteoError(response.text)
+            response.raise_for_status()
+            return decode_weather_responses(response.content)
+        except Exception:
+            metrics.UPSTREAM_ERRORS.labels(upstream).inc()
+            raise
+
+
+def get_engine():
+    """Engine of the Flask app served next to the async routes"""
+    return icyroute.get_engine(icyroute.app)
+
+
+class AsyncRouteService:
+    """Coroutine versions of the engine's route pipeline.
+
+    Upstream I/O is awaited; geometry, sampling and scoring reuse the
+    engine's synchronous code, which is CPU-only and fast. The engine is
+    looked up on every call so /api/reload-engine is honoured.
+    """
+
+    def __init__(self, directions, openmeteo, engine_getter=get_engine):
+        self.directions = directions
+        self.openmeteo = openmeteo
+        self.engine_getter = engine_getter
+
+    async def get_routes(self, origin, destination, avoid_icy=False):
+        """Scored route set, from the shared route cache when possible; returns (routes, cache_hit)"""
+        engine = self.engine_getter()
+        key = engine.route_cache.key(origin, destination, avoid_icy, engine.weather_epoch())
+
+        return await engine.route_cache.aget_or_compute(
+            key, lambda: self._compute_routes(engine, origin, destination, avoid_icy)
+        )
+
+    async def _compute_routes(self, engine, origin, destination, avoid_icy):
+        try:
+            scored = [route async for route in self.iter_scored_routes(engine, origin, destination)]
+        except Exception as e:
+            print(f"Route calculation error: {e}")
+            return []
+        return engine.route_optimizer.rank_routes(sorted(scored, key=lambda r: r['route_index']), avoid_icy)
+
+    async def stream_routes(self, origin, destination, avoid_icy=False):
+        """Async form of IcyRouteEngine.stream_routes"""
+        engine = self.engine_getter()
+        key = engine.route_cache.key(origin, destination, avoid_icy, engine.weather_epoch())
+
+        async for event in engine.route_cache.astream_or_compute(
+            key, lambda: self._score_routes(engine, origin, destination, avoid_icy), icyroute.replay_routes
+        ):
+            yield event
+
+    async def _score_routes(self, engine, origin, destination, avoid_icy):
+        scored = []
+        async for route in self.iter_scored_routes(engine, origin, destination):
+            scored.append(route)
+            yield 'route', route
+        yield 'ranked', engine.route_optimizer.rank_routes(sorted(scored, key=lambda r: r['route_index']), avoid_icy)
+
+    async def iter_scored_routes(self, engine, origin, destination):
+        """Yield scored variations as soon as each base route's weather is in"""
+        optimizer = engine.route_optimizer
+        departure_time = datetime.now()
+        base_routes = await self.get_base_routes(engine, origin, destination, departure_time)
+        route_context = f"{origin} to {destination}"
+        first_indexes = optimizer.variation_offsets(base_routes)
+
+        async def route_weather(i, route):
+            return i, await self.match_route_weather(engine, route, route_context, departure_time)
+
+        tasks = [asyncio.ensure_future(route_weather(i, route)) for i, route in enumerate(base_routes)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, (route_key, weather_points) = await next_done
+                for route_info in optimizer.score_base_route(
+                    i, base_routes[i], weather_points, route_context, first_indexes[i], route_key
+                ):
+                    yield route_info
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_base_routes(self, engine, origin, destination, departure_time=None):
+        with metrics.DIRECTIONS_STAGE.time():
+            results = await asyncio.gather(
+                *(self.directions.directions(origin, destination, avoid, departure_time)
+                  for avoid in icyroute.BASE_ROUTE_AVOID_OPTIONS),
+                return_exceptions=True
+            )
+        return engine.route_optimizer.unique_base_routes(results)
+
+    async def match_route_weather(self, engine, route, route_context, departure_time=None):
+        """Async form of WeatherService.match_route_weather for one Directions route"""
+        optimizer = engine.route_optimizer
+        weather_service = engine.weather_service
+        coords = optimizer.extract_route_geometry(route, optimizer.simplify_tolerance)
+
+        route_key = engine.historical_service.match_route_geometry(coords)
+        if route_key:
+            # Corridor data is memory-mapped; only a first-time fetch does blocking I/O
+            return route_key, await asyncio.to_thread(
+                weather_service._get_historical_weather_route, coords, route_context, route_key
+            )
+
+        sample_points, fractions = weather_service.sample_route_positions(coords, 50000)  # 50km intervals
+        timeline = optimizer.route_timeline(route, departure_time or datetime.now())
+        etas = weather_service.sample_etas(fractions, timeline)
+
+        # Sampling a mapped raster is a few array lookups, cheap enough for the event loop
+        raster_points = weather_service._raster_weather_points(sample_points, etas)
+        if raster_points is not None:
+            return None, raster_points
+
+        if weather_service.wants_forecast(etas):
+            try:
+                weathers = await self.get_forecast_weather_batch(weather_service, sample_points, etas)
+                return None, weather_service._current_weather_points(
+                    sample_points, weathers, etas, data_source='forecast'
+                )
+            except Exception as e:
+                print(f"OpenMeteo hourly forecast error for {len(sample_points)} points: {e} - Using current weather")
+
+        weathers = await self.get_current_weather_batch(engine, sample_points)
+        return None, weather_service._current_weather_points(sample_points, weathers, etas)
+
+    async def get_forecast_weather_batch(self, weather_service, points, etas):
+        """Async form of WeatherService.get_forecast_weather_batch"""
+        started = time.perf_counter()
+        responses = await self._fetch_openmeteo(
+            weather_service.historical_service.forecast_url, points, weather_service.forecast_params(etas)
+        )
+        weathers = [
+            weather_service._parse_forecast_response(response, eta) for response, eta in zip(responses, etas.tolist())
+        ]
+        metrics.FORECAST_FETCH.observe(time.perf_counter() - started)
+        return weathers
+
+    async def get_current_weather_batch(self, engine, points):
+        """Async form of WeatherService.get_current_weather_batch, sharing its tile cache"""
+        weather_service = engine.weather_service
+        if not points:
+            return []
+
+        started = time.perf_counter()
+        try:
+            weathers = await weather_service.tile_cache.aget_many(
+                points, lambda cells: self._fetch_current_weather_batch(weather_service, cells)
+            )
+            metrics.CURRENT_FETCH.observe(time.perf_counter() - started)
+            return weathers
+        except Exception as e:
+            print(f"OpenMeteo current weather error for {len(points)} points: {e} - Falling back to simulated weather")
+            metrics.WEATHER_FALLBACKS.labels('current_weather_error').inc(len(points))
+            weathers = [weather_service._get_current_weather_simulation(point['lat'], point['lng']) for point in points]
+            metrics.FALLBACK_FETCH.observe(time.perf_counter() - started)
+            return weathers
+
+    async def _fetch_current_weather_batch(self, weather_service, points):
+        responses = await self._fetch_openmeteo(
+            weather_service.historical_service.forecast_url, points, icyroute.CURRENT_WEATHER_PARAMS
+        )
+        return [weather_service._parse_current_weather_response(response) for response in responses]
+
+    async def _fetch_openmeteo(self, url, points, params):
+        """One forecast response per point, from concurrent multi-location requests"""
+        chunks = icyroute.openmeteo_chunks(points)
+        chunk_results = await asyncio.gather(*(
+            self.openmeteo.weather_api(url, icyroute.openmeteo_chunk_params(params, chunk))
+            for chunk in chunks
+        ))
+
+        responses = []
+        for chunk, chunk_responses in zip(chunks, chunk_results):
+            if len(chunk_responses) != len(chunk):
+                raise OpenMeteoError(f"OpenMeteo returned {len(chunk_responses)} responses for {len(chunk)} locations")
+            responses.extend(chunk_responses)
+        return responses
+
+
+async def _route_request(request):
+    """Parsed /api/routes body, or an error response"""
+    data = await request.json()
+    if not data.get('origin') or not data.get('destination'):
+        return None, JSONResponse({'error': 'Origin and destination required'}, status_code=400)
+    return data, None
+
+
+def negotiated_json_response(request, payload, compact=False):
+    """Route response body, compact-encoded if asked and compressed with the best encoding the client accepts"""
+    with metrics.SERIALIZATION_STAGE.time():
+        if compact:
+            payload = wire.encode_routes_body(payload)
+        body, encoding = wire.compress(
+            wire.dumps(payload, compact).encode(),
+            wire.choose_encoding(request.headers.get('accept-encoding'))
+        )
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, media_type='application/json', headers=headers)
+
+
+async def get_routes(request):
+    data, error = await _route_request(request)
+    if error:
+        return error
+
+    origin, destination = data['origin'], data['destination']
+    driver_experience = data.get('driver_experience', 'intermediate')
+    compact = wire.wants_compact(data, request.query_params)
+    try:
+        service = request.app.state.route_service
+        all_routes, _ = await service.get_routes(origin, destination, data.get('avoid_icy', False))
+        body = icyroute.build_routes_response(driver_experience, all_routes)
+        return negotiated_json_response(request, body, compact)
+
+    except Exception as e:
+        print(f"Error in get_routes: {e}")
+        return JSONResponse({'error': f'Route calculation failed: {str(e)}'}, status_code=500)
+
+
+async def stream_routes(request):
+    """Same NDJSON events as the Flask /api/routes/stream"""
+    data, error = await _route_request(request)
+    if error:
+        return error
+
+    origin, destination = data['origin'], data['destination']
+    driver_experience = data.get('driver_experience', 'intermediate')
+    compact = wire.wants_compact(data, request.query_params)
+    encoding = wire.choose_encoding(request.headers.get('accept-encoding'))
+    service = request.app.state.route_service
+
+    async def generate():
+        try:
+            async for kind, payload in service.stream_routes(origin, destination, data.get('avoid_icy', False)):
+                if kind == 'route':
+                    with metrics.SERIALIZATION_STAGE.time():
+                        event = {'type': 'route', 'route': wire.encode_route(payload) if compact else payload}
+                        line = wire.dumps(event, compact)
+                else:
+                    body = icyroute.build_routes_response(driver_experience, payload)
+                    with metrics.SERIALIZATION_STAGE.time():
+                        event = dict(wire.encode_routes_body(body) if compact else body, type='result')
+                        line = wire.dumps(event, compact)
+                yield line + '\n'
+        except Exception as e:
+            print(f"Error in stream_routes: {e}")
+            yield json.dumps({'type': 'error', 'error': f'Route calculation failed: {str(e)}'}) + '\n'
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'Vary': 'Accept-Encoding'}
+    chunks = generate()
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        chunks = wire.acompress_stream(chunks, encoding)
+    return StreamingResponse(chunks, media_type='application/x-ndjson', headers=headers)
+
+
+async def weather_demo(request):
+    info = icyroute.weather_demo_info(get_engine().historical_service, request.path_params['route_name'])
+    if info:
+        return JSONResponse(info)
+    return JSONResponse({'error': 'Route not found'}, status_code=404)
+
+
+async def preload_weather(request):
+    historical_service = get_engine().historical_service
+    try:
+        # Historical archive fetches are rare and run off the event loop
+        await asyncio.to_thread(historical_service.preload_all_demo_data)
+        return JSONResponse({
+            'status': 'success',
+            'message': 'All demo weather data preloaded',
+            'routes_cached': list(historical_service.demo_routes.keys())
+        })
+    except Exception as e:
+        return JSONResponse({
+            'status': 'error',
+            'message': f'Failed to preload weather data: {str(e)}'
+        }, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(application):
+    http = httpx.AsyncClient(
+        timeout=ASYNC_HTTP_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=ASYNC_HTTP_MAX_CONNECTIONS
+        )
+    )
+    settings = icyroute.app.config
+    application.state.route_service = AsyncRouteService(
+        AsyncDirectionsClient(http, settings['GOOGLE_MAPS_API_KEY'], settings['GOOGLE_MAPS_BASE_URL']),
+        AsyncOpenMeteoClient(http)
+    )
+    # Build the engine before the first request instead of on the event loop
+    await asyncio.to_thread(get_engine)
+    print("⚡ IcyRoute async request path ready")
+    try:
+        yield
+    finally:
+        await http.aclose()
+
+
+application = Starlette(
+    routes=[
+        Route('/api/routes', get_routes, methods=['POST']),
+        Route('/api/routes/stream', stream_routes, methods=['POST']),
+        Route('/api/weather-demo/{route_name:path}', weather_demo),
+        Route('/api/preload-weather', preload_weather, methods=['POST']),
+        # Pages, static files and the remaining API endpoints stay on Flask
+        Mount('/', app=WSGIMiddleware(icyroute.app))
+    ],
+    lifespan=lifespan
+)
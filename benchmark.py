@@ -0,0 +1,408 @@
+"""Offline microbenchmarks for the IcyRoute scoring hot paths.
+
+Runs with no network: Google Directions is a stub that returns synthetic or
+recorded routes, Open-Meteo is a stub that answers current-weather requests
+in-process, and historical weather comes from the corridor data already in
+``weather_cache/``.
+
+    python benchmark.py                           # full run, JSON on stdout
+    python benchmark.py --quick -o results.json   # fewer repeats
+    python benchmark.py --compare baseline.json   # exit 1 on regressions
+
+Recorded Directions responses (a JSON list of routes, or an object with a
+``routes`` list) can be added with ``--recorded FILE``.
+
+Startup is timed in fresh interpreters: importing the app, and launching a
+server (against the load-test stand-ins) until its first route is served.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from tests.stubs import VERTEX_SPACING_M, StubDirections, StubOpenMeteo, directions_route, synthetic_path
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Synthetic route lengths, in km
+ROUTE_LENGTHS_KM = [10, 100, 300, 1000, 3000]
+
+
+def corridor_path(route_key, seed=0):
+    """Path along a demo corridor's highway, densified to VERTEX_SPACING_M with a little jitter"""
+    import geodesy
+    from corridors import DEMO_CORRIDORS
+
+    rng = np.random.default_rng(seed)
+    dense = geodesy.densify(np.array(DEMO_CORRIDORS[route_key]['path']), VERTEX_SPACING_M)
+    jitter = rng.normal(0, 0.0003, dense.shape)
+    jitter[[0, -1]] = 0
+    return dense + jitter
+
+
+def load_recorded_routes(path):
+    """Directions routes from a recorded response file"""
+    with open(path) as f:
+        data = json.load(f)
+    return data['routes'] if isinstance(data, dict) else data
+
+
+def measure(fn, repeats, min_seconds):
+    """Per-call timings in ms: fn is looped until one repeat lasts min_seconds, then timed repeats times"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_seconds / max(elapsed, 1e-9)) + 1)
+
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number * 1000)
+    return summarize(samples, number)
+
+
+def summarize(samples, number=1):
+    """Timing statistics of per-call samples in ms"""
+    return {
+        'number': number,
+        'repeats': len(samples),
+        'min_ms': round(min(samples), 6),
+        'median_ms': round(statistics.median(samples), 6),
+        'mean_ms': round(statistics.fmean(samples), 6),
+        'stdev_ms': round(statistics.stdev(samples), 6) if len(samples) > 1 else 0.0
+    }
+
+
+class BenchmarkSuite:
+    """Builds offline services and times each hot path over every geometry case"""
+
+    def __init__(self, quick=False, recorded=()):
+        os.chdir(REPO_DIR)
+        os.environ['REFRESH_ENABLED'] = 'false'
+
+        import app
+        from upstream import UpstreamPool
+
+        self.app = app
+        self.repeats = 5 if quick else 15
+        self.startup_repeats = 3 if quick else 7
+        self.min_seconds = 0.02 if quick else 0.1
+        self.results = []
+        self.checks = {}
+        self.quick = quick
+
+        random.seed(0)
+        self.pool = UpstreamPool(max_workers=8)
+        self.historical_service = app.HistoricalWeatherService(self.pool)
+        self.historical_service.openmeteo = StubOpenMeteo()
+        self.ice_detector = app.IceDetector()
+        self.weather_service = app.WeatherService(
+            'offline-benchmark', historical_service=self.historical_service, ice_detector=self.ice_detector
+        )
+        self.corridor_keys = [
+            key for key in self.historical_service.demo_routes
+            if self.historical_service.station_store.get(key) is not None
+        ]
+
+        self.cases = {}
+        for i, length_km in enumerate(ROUTE_LENGTHS_KM):
+            # Start in Texas so synthetic routes never run along a historical corridor
+            coords = synthetic_path(length_km, start=(29.76, -95.37), heading_deg=60 - 40 * (i % 2), seed=i)
+            self.cases[f"synthetic_{length_km}km"] = directions_route(coords, f"Synthetic {length_km} km")
+        for key in self.corridor_keys:
+            self.cases[f"corridor_{key}"] = directions_route(corridor_path(key), f"I-{key}")
+        for path in recorded:
+            for j, route in enumerate(load_recorded_routes(path)):
+                self.cases[f"recorded_{os.path.splitext(os.path.basename(path))[0]}_{j}"] = route
+
+    def record(self, name, case, timing, **params):
+        self.results.append(dict({'name': name, 'case': case, 'params': params}, **timing))
+        print(f"  {name:36s} {case:34s} {timing['median_ms']:12.4f} ms", file=sys.stderr)
+
+    def run(self):
+        optimizer = self.app.RouteOptimizer(StubDirections({}), self.weather_service, self.pool)
+        self.bench_geometry(optimizer)
+        self.bench_historical_points(optimizer)
+        self.bench_ice_risk()
+        self.check_ice_risk_batch()
+        self.bench_get_routes()
+        self.bench_startup()
+        self.pool.shutdown()
+        self.historical_service.close()
+        return {
+            'meta': self.meta(),
+            'results': self.results,
+            'checks': self.checks
+        }
+
+    def bench_geometry(self, optimizer):
+        for case, route in self.cases.items():
+            points = optimizer.extract_route_points(route)
+            self.record('extract_route_points', case,
+                        measure(lambda: optimizer.extract_route_points(route), self.repeats, self.min_seconds),
+                        vertices=len(points))
+            simplified = optimizer.extract_route_points(route, optimizer.simplify_tolerance)
+            for interval in (25000, 50000):
+                self.record('sample_route_points', case,
+                            measure(lambda: self.weather_service.sample_route_points(simplified, interval),
+                                    self.repeats, self.min_seconds),
+                            interval_m=interval, vertices=len(simplified))
+
+    def bench_historical_points(self, optimizer):
+        for key in self.corridor_keys:
+            coords = optimizer.extract_route_geometry(self.cases[f"corridor_{key}"], optimizer.simplify_tolerance)
+            points = self.weather_service.sample_route_points(coords, 25000)
+            self.record('_get_historical_weather_for_points', f"corridor_{key}",
+                        measure(lambda: self.historical_service._get_historical_weather_for_points(key, points),
+                                self.repeats, self.min_seconds),
+                        points=len(points))
+
+    def _ice_risk_inputs(self, n, seed):
+        rng = np.random.default_rng(seed)
+        detector = self.ice_detector
+        bridges = np.column_stack((detector.bridge_lats, detector.bridge_lngs))
+
+        # Values on and either side of every threshold in calculate_ice_risk
+        def edges(thresholds, low, high, eps=1e-9):
+            values = np.concatenate([[t - eps, t, t + eps] for t in thresholds])
+            return np.where(rng.random(n) < 0.3, rng.choice(values, n), rng.uniform(low, high, n))
+
+        temp = edges([-15, -8, -3, 0, 1, 2, 4, 5, 10, 15], -25, 25)
+        humidity = edges([70, 85], 30, 100)
+        precipitation = edges([0.2, 1], 0, 5)
+        snowfall = edges([0.5, 2], 0, 5)
+        wind_speed = edges([15, 25], 0, 40)
+
+        lat = rng.uniform(38, 48, n)
+        lng = rng.uniform(-107, -75, n)
+        near = rng.random(n) < 0.3
+        anchors = bridges[rng.integers(0, len(bridges), n)]
+        # Offsets of up to ~7 km put points on both sides of the 5 km bridge radius
+        lat = np.where(near, anchors[:, 0] + rng.uniform(-0.06, 0.06, n), lat)
+        lng = np.where(near, anchors[:, 1] + rng.uniform(-0.06, 0.06, n), lng)
+        lat = np.where(rng.random(n) < 0.1, rng.choice([40.0, 42.0, 45.0], n), lat)
+
+        route_types = rng.choice(['highway', 'arterial', 'local', 'scenic', 'unknown'], n)
+        return temp, humidity, precipitation, snowfall, wind_speed, lat, lng, route_types
+
+    def bench_ice_risk(self):
+        detector = self.ice_detector
+        temp, humidity, precipitation, snowfall, wind_speed, lat, lng, route_types = self._ice_risk_inputs(1000, 1)
+        weathers = [
+            {'temp': t, 'humidity': h, 'precipitation': p, 'snowfall': s, 'wind_speed': w}
+            for t, h, p, s, w in zip(temp.tolist(), humidity.tolist(), precipitation.tolist(),
+                                     snowfall.tolist(), wind_speed.tolist())
+        ]
+        points = list(zip(weathers, lat.tolist(), lng.tolist(), route_types.tolist()))
+
+        def scalar():
+            for weather, point_lat, point_lng, route_type in points:
+                detector.calculate_ice_risk(weather, point_lat, point_lng, 'Minneapolis to Duluth', route_type)
+
+        self.record('IceDetector.calculate_ice_risk', 'random_1000_points',
+                    measure(scalar, self.repeats, self.min_seconds), points=len(points))
+        self.record('IceDetector.calculate_ice_risk_batch', 'random_1000_points',
+                    measure(lambda: detector.calculate_ice_risk_batch(
+                        temp, humidity, precipitation, snowfall, wind_speed, lat, lng, route_types,
+                        'Minneapolis to Duluth'
+                    ), self.repeats, self.min_seconds), points=len(points))
+
+    def check_ice_risk_batch(self):
+        """calculate_ice_risk_batch must give exactly the scalar result for every point"""
+        detector = self.ice_detector
+        n = 20000 if self.quick else 200000
+        temp, humidity, precipitation, snowfall, wind_speed, lat, lng, route_types = self._ice_risk_inputs(n, 2)
+
+        mismatches = 0
+        max_difference = 0.0
+        for context in (None, 'Minneapolis to Duluth', 'scenic county mountain pass', 'interstate highway'):
+            risks, levels = detector.calculate_ice_risk_batch(
+                temp, humidity, precipitation, snowfall, wind_speed, lat, lng, route_types, context
+            )
+            for i in range(n):
+                weather = {'temp': temp[i], 'humidity': humidity[i], 'precipitation': precipitation[i],
+                           'snowfall': snowfall[i], 'wind_speed': wind_speed[i]}
+                expected = detector.calculate_ice_risk(weather, lat[i], lng[i], context, route_types[i])
+                difference = abs(expected - risks[i])
+                max_difference = max(max_difference, difference)
+                if difference > 1e-12 or detector.get_risk_level(expected) != levels[i]:
+                    mismatches += 1
+
+        self.checks['ice_risk_batch_matches_scalar'] = {
+            'passed': mismatches == 0,
+            'points': n * 4,
+            'mismatches': mismatches,
+            'max_abs_difference': max_difference
+        }
+        print(f"  ice risk batch vs scalar: {mismatches} mismatches in {n * 4} points", file=sys.stderr)
+
+    def bench_get_routes(self):
+        trips = {}
+        for case, route in self.cases.items():
+            if case.startswith('recorded_'):
+                continue
+            alternative = json.loads(json.dumps(route))
+            alternative['overview_polyline']['points'] += '?'  # distinct alternative, same geometry
+            trips[(f"{case} origin", f"{case} destination")] = [route, alternative]
+
+        stub = StubDirections(trips)
+        optimizer = self.app.RouteOptimizer(stub, self.weather_service, self.pool)
+        tile_cache = self.weather_service.tile_cache
+        openmeteo = self.historical_service.openmeteo
+
+        for (origin, destination) in trips:
+            case = origin[:-len(' origin')]
+
+            def cold():
+                tile_cache.clear()
+                optimizer.get_routes(origin, destination, avoid_icy=True)
+
+            calls_before = openmeteo.calls
+            routes = optimizer.get_routes(origin, destination, avoid_icy=True)
+            self.record('RouteOptimizer.get_routes', case,
+                        measure(cold, self.repeats, self.min_seconds),
+                        routes=len(routes), openmeteo_requests=openmeteo.calls - calls_before,
+                        source=routes[0]['weather_source'] if routes else None)
+
+    def bench_startup(self):
+        """Cold start in fresh interpreters: importing the app, and launch to first served route"""
+        import loadtest
+        import requests
+
+        # No key in the environment: importing the app must not need one
+        env = dict(os.environ)
+        env.pop('GOOGLE_MAPS_API_KEY', None)
+        script = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+        samples = []
+        for _ in range(self.startup_repeats):
+            output = subprocess.run([sys.executable, '-c', script], cwd=REPO_DIR, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            samples.append(float(output.split()[-1]) * 1000)
+        self.record('startup', 'import_app', summarize(samples))
+
+        options = {'latency_ms': 0, 'jitter_ms': 0, 'error_rate': 0, 'error_status': 500}
+        stand_ins = [loadtest.start_stand_in('directions', options), loadtest.start_stand_in('openmeteo', options)]
+        (_, directions_url), (_, openmeteo_url) = stand_ins
+        listening, first_route = [], []
+        try:
+            for _ in range(self.startup_repeats):
+                workdir = tempfile.mkdtemp(prefix='icyroute-startup-')
+                port = loadtest.free_port()
+                url = f"http://127.0.0.1:{port}"
+                # A trip nobody asked for before, so the Open-Meteo response cache cannot answer it
+                lat = 40 + (time.time_ns() // 1000 % 5000) / 1000
+                body = {'origin': f"{lat:.4f},-95.0000", 'destination': f"{lat + 0.5:.4f},-94.0000"}
+                started = time.perf_counter()
+                process = subprocess.Popen(loadtest.app_command('flask', port, 1, 1), cwd=REPO_DIR,
+                                           env=loadtest.app_environment(directions_url, openmeteo_url, workdir),
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    while process.poll() is None and time.perf_counter() - started < 120:
+                        try:
+                            requests.get(f"{url}/metrics", timeout=5)
+                            break
+                        except requests.ConnectionError:
+                            time.sleep(0.01)
+                    listening.append((time.perf_counter() - started) * 1000)
+                    response = requests.post(f"{url}/api/routes", json=body, timeout=120)
+                    response.raise_for_status()
+                    first_route.append((time.perf_counter() - started) * 1000)
+                finally:
+                    process.terminate()
+                    process.wait()
+        finally:
+            for process, _ in stand_ins:
+                process.terminate()
+
+        self.record('startup', 'listening', summarize(listening), server='flask')
+        self.record('startup', 'first_route_request', summarize(first_route), server='flask')
+
+    def meta(self):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                    cwd=REPO_DIR).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'quick': self.quick,
+            'corridors': self.corridor_keys
+        }
+
+
+def compare(results, baseline, threshold):
+    """Benchmarks whose median got slower than threshold times the baseline"""
+    previous = {(r['name'], r['case']): r for r in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        before = previous.get((result['name'], result['case']))
+        if before and before['median_ms'] > 0:
+            ratio = result['median_ms'] / before['median_ms']
+            if ratio > threshold:
+                regressions.append({
+                    'name': result['name'],
+                    'case': result['case'],
+                    'baseline_ms': before['median_ms'],
+                    'median_ms': result['median_ms'],
+                    'ratio': round(ratio, 3)
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline IcyRoute microbenchmarks")
+    parser.add_argument('-o', '--output', help="write JSON results to this file instead of stdout")
+    parser.add_argument('--quick', action='store_true', help="fewer and shorter repeats")
+    parser.add_argument('--recorded', action='append', default=[], metavar='FILE',
+                        help="recorded Directions response JSON to benchmark as well")
+    parser.add_argument('--compare', metavar='BASELINE', help="fail if slower than this earlier JSON output")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="allowed median slowdown ratio against the baseline (default 1.25)")
+    args = parser.parse_args(argv)
+
+    # The app logs to stdout; keep it out of the JSON
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = BenchmarkSuite(quick=args.quick, recorded=args.recorded).run()
+
+    failed = not all(check['passed'] for check in results['checks'].values())
+    if args.compare:
+        with open(args.compare) as f:
+            results['regressions'] = compare(results, json.load(f), args.threshold)
+        failed = failed or bool(results['regressions'])
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    for regression in results.get('regressions', []):
+        print(f"❌ {regression['name']} [{regression['case']}]: {regression['baseline_ms']} ms -> "
+              f"{regression['median_ms']} ms ({regression['ratio']}x)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,492 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Seconds a cell's current weather stays fresh. Every variable comes from the same
+# upstream response, so the whole cell expires at once, paced by fast-changing precipitation
+DEFAULT_WEATHER_TTL = 600
+
+
+def normalize_location(text):
+    """Case-, punctuation- and whitespace-insensitive form of a free-text location"""
+    cleaned = ''.join(ch if ch.isalnum() else ' ' for ch in (text or '').lower())
+    return ' '.join(cleaned.split())
+
+
+class SingleFlight:
+    """Coalesces concurrent work on the same key into one call.
+
+    ``claim`` returns (future, is_leader). The leader must resolve the future
+    with set_result/set_exception and then call ``release``; everybody else
+    waits on the same future.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def release(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+class HotKeys:
+    """Thread-safe access counts that decay over time, used to find the most requested keys"""
+
+    def __init__(self, max_keys=10000, min_score=0.01):
+        self.max_keys = max_keys
+        self.min_score = min_score
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def touch(self, keys, weight=1.0):
+        with self._lock:
+            for key in keys:
+                self._scores[key] = self._scores.get(key, 0.0) + weight
+
+    def top(self, n=None):
+        """(key, score) pairs, hottest first"""
+        with self._lock:
+            ranked = sorted(self._scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+
+    def score(self, key):
+        return self._scores.get(key, 0.0)
+
+    def decay(self, factor):
+        """Scale every score by factor, dropping cold keys and keeping at most max_keys"""
+        with self._lock:
+            scores = {key: score * factor for key, score in self._scores.items() if score * factor >= self.min_score}
+            if len(scores) > self.max_keys:
+                scores = dict(sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.max_keys])
+            self._scores = scores
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class WeatherTileCache:
+    """Bounded LRU cache of current weather keyed by grid cell and time bucket.
+
+    Points are quantized to cells of ``resolution`` degrees, so nearby users on
+    the same corridor share entries even though their sampled coordinates
+    differ. Each entry is fetched at its cell centre and expires as a whole
+    ``ttl_seconds`` after it was stored (or at the end of its time bucket),
+    and concurrent misses for the same cell are coalesced into a single
+    upstream fetch.
+    """
+
+    def __init__(self, resolution=0.1, time_bucket_seconds=3600, max_entries=50000,
+                 ttl_seconds=DEFAULT_WEATHER_TTL, clock=time.time):
+        self.resolution = resolution
+        self.time_bucket_seconds = time_bucket_seconds
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        # Request counts per (row, col) cell, read by the background refresher
+        self.hot_cells = HotKeys()
+
+    def cell_key(self, lat, lng, now=None):
+        """Grid cell and time bucket for a coordinate"""
+        now = self.clock() if now is None else now
+        return (
+            math.floor(lat / self.resolution),
+            math.floor(lng / self.resolution),
+            int(now // self.time_bucket_seconds)
+        )
+
+    def cell_center(self, key):
+        return {
+            'lat': (key[0] + 0.5) * self.resolution,
+            'lng': (key[1] + 0.5) * self.resolution
+        }
+
+    def _lookup(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if now >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _store(self, key, value, now):
+        expires = now + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, points, fetch_batch):
+        """Weather for every point, fetching only cells that are missing or stale.
+
+        fetch_batch receives a list of cell-centre points and must return one
+        weather dict per point in the same order, or raise. Failures are not
+        cached and are raised to every caller waiting on those cells.
+        """
+        now = self.clock()
+        keys, values, leading, waiting = self._claim(points, now)
+
+        if leading:
+            try:
+                fetched = fetch_batch(self._lead_points(leading))
+            except Exception as e:
+                self._fail(leading, e)
+                raise
+            self._complete(leading, fetched, values, now)
+
+        for key, future in waiting.items():
+            values[key] = future.result()
+
+        return [dict(values[key]) for key in keys]
+
+    async def aget_many(self, points, fetch_batch):
+        """Coroutine form of get_many; fetch_batch is awaited and waiters do not block the event loop.
+
+        Entries and in-flight fetches are shared with threaded get_many callers.
+        """
+        now = self.clock()
+        keys, values, leading, waiting = self._claim(points, now)
+
+        if leading:
+            try:
+                fetched = await fetch_batch(self._lead_points(leading))
+            except BaseException as e:
+                self._fail(leading, e)
+                raise
+            self._complete(leading, fetched, values, now)
+
+        for key, future in waiting.items():
+            values[key] = await asyncio.wrap_future(future)
+
+        return [dict(values[key]) for key in keys]
+
+    def _claim(self, points, now):
+        """Split the cells of a request into cached values, cells to fetch and cells already in flight"""
+        keys = [self.cell_key(p['lat'], p['lng'], now) for p in points]
+        values = {}
+        waiting = {}
+        leading = {}
+        self.hot_cells.touch({key[:2] for key in keys})
+
+        for key in dict.fromkeys(keys):
+            value = self._lookup(key, now)
+            if value is not None:
+                values[key] = value
+                continue
+            future, is_leader = self._single_flight.claim(key)
+            if is_leader:
+                leading[key] = future
+            else:
+                waiting[key] = future
+
+        with self._lock:
+            self.hits += len(values)
+            self.misses += len(leading)
+            self.coalesced += len(waiting)
+
+        return keys, values, leading, waiting
+
+    def _lead_points(self, leading):
+        return [self.cell_center(key) for key in leading]
+
+    def _complete(self, leading, fetched, values, now):
+        try:
+            if len(fetched) != len(leading):
+                raise ValueError(f"Expected {len(leading)} weather results, got {len(fetched)}")
+            for key, value in zip(leading, fetched):
+                self._store(key, value, now)
+                values[key] = value
+                leading[key].set_result(value)
+        except Exception as e:
+            self._fail(leading, e)
+            raise
+        finally:
+            for key in leading:
+                self._single_flight.release(key)
+
+    def _fail(self, leading, error):
+        for key, future in leading.items():
+            if not future.done():
+                future.set_exception(error if isinstance(error, Exception) else RuntimeError(str(error)))
+            self._single_flight.release(key)
+
+    def due_cells(self, cells, lead_seconds, now=None):
+        """The (row, col) cells whose weather is missing or expires within lead_seconds"""
+        now = self.clock() if now is None else now
+        horizon = now + lead_seconds
+        bucket = int(horizon // self.time_bucket_seconds)
+        due = []
+        with self._lock:
+            for cell in cells:
+                entry = self._entries.get((cell[0], cell[1], bucket))
+                if entry is None or entry[1] <= horizon:
+                    due.append(cell)
+        return due
+
+    def refresh_cells(self, cells, fetch_batch, lead_seconds):
+        """Fetch (row, col) cells now and store them for the current and the upcoming time bucket"""
+        now = self.clock()
+        fetched = fetch_batch([self.cell_center(cell) for cell in cells])
+        if len(fetched) != len(cells):
+            raise ValueError(f"Expected {len(cells)} weather results, got {len(fetched)}")
+
+        buckets = {int(now // self.time_bucket_seconds), int((now + lead_seconds) // self.time_bucket_seconds)}
+        for cell, value in zip(cells, fetched):
+            for bucket in buckets:
+                self._store((cell[0], cell[1], bucket), value, now)
+        return len(fetched)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'resolution_deg': self.resolution,
+            'time_bucket_seconds': self.time_bucket_seconds,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'hot_cells': len(self.hot_cells),
+            'in_flight': len(self._single_flight),
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+class RouteResultCache:
+    """TTL + LRU cache of scored route sets with coalesced misses.
+
+    Keys combine the normalized origin and destination, the avoid_icy flag
+    and a weather epoch, so entries roll over when the underlying weather
+    data changes. Driver experience is deliberately not part of the key:
+    callers filter the cached set on read.
+    """
+
+    def __init__(self, ttl_seconds=600, max_entries=1024, clock=time.time):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def key(self, origin, destination, avoid_icy, weather_epoch):
+        return (
+            normalize_location(origin),
+            normalize_location(destination),
+            bool(avoid_icy),
+            weather_epoch
+        )
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self.clock():
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def lookup(self, key):
+        """Cached routes for a key, or None; counts as a hit or a miss"""
+        value = self._get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def store(self, key, value):
+        """Cache a computed route set; empty results are skipped so failures are retried"""
+        if not value:
+            return
+        with self._lock:
+            self._entries[key] = (value, self.clock() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return (routes, cache_hit); concurrent misses for one key share a single compute()"""
+        value = self._get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value, True
+
+        future, is_leader = self._single_flight.claim(key)
+        if not is_leader:
+            with self._lock:
+                self.coalesced += 1
+            return future.result(), True
+
+        with self._lock:
+            self.misses += 1
+        try:
+            value = compute()
+            self.store(key, value)
+            future.set_result(value)
+            return value, False
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._single_flight.release(key)
+
+    async def aget_or_compute(self, key, compute):
+        """Coroutine form of get_or_compute; compute() is awaited.
+
+        In-flight computations are shared with threaded get_or_compute callers.
+        """
+        value = self._get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value, True
+
+        future, is_leader = self._single_flight.claim(key)
+        if not is_leader:
+            with self._lock:
+                self.coalesced += 1
+            return await asyncio.wrap_future(future), True
+
+        with self._lock:
+            self.misses += 1
+        try:
+            value = await compute()
+            self.store(key, value)
+            future.set_result(value)
+            return value, False
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError(f"Route computation cancelled: {e!r}"))
+            raise
+        finally:
+            self._single_flight.release(key)
+
+    def stream_or_compute(self, key, compute, replay):
+        """Streamed form of get_or_compute, yielding events instead of returning.
+
+        compute() yields events as it goes and its last event is a (kind, value)
+        pair whose value is cached. Only the leader of concurrent misses for a
+        key runs it, passing its events straight through; cache hits and, once
+        the leader is done, its followers get the events of replay(value).
+        """
+        value = self._get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            yield from replay(value)
+            return
+
+        future, is_leader = self._single_flight.claim(key)
+        if not is_leader:
+            with self._lock:
+                self.coalesced += 1
+            yield from replay(future.result())
+            return
+
+        with self._lock:
+            self.misses += 1
+        try:
+            event = None
+            for event in compute():
+                yield event
+            value = event[1]
+            self.store(key, value)
+            future.set_result(value)
+        except BaseException as e:
+            # Includes GeneratorExit when the leader's client goes away mid-stream
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError(f"Route computation cancelled: {e!r}"))
+            raise
+        finally:
+            self._single_flight.release(key)
+
+    async def astream_or_compute(self, key, compute, replay):
+        """Async generator form of stream_or_compute; compute() is an async generator.
+
+        In-flight computations are shared with threaded stream_or_compute and
+        get_or_compute callers.
+        """
+        value = self._get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            for event in replay(value):
+                yield event
+            return
+
+        future, is_leader = self._single_flight.claim(key)
+        if not is_leader:
+            with self._lock:
+                self.coalesced += 1
+            for event in replay(await asyncio.wrap_future(future)):
+                yield event
+            return
+
+        with self._lock:
+            self.misses += 1
+        try:
+            event = None
+            async for event in compute():
+                yield event
+            value = event[1]
+            self.store(key, value)
+            future.set_result(value)
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError(f"Route computation cancelled: {e!r}"))
+            raise
+        finally:
+            self._single_flight.release(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._single_flight),
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None
+        }
@@ -0,0 +1,170 @@
+import json
+import math
+import os
+
+import numpy as np
+
+import geodesy
+
+# Built-in historical corridors. ``path`` follows the highway the corridor is
+# named after and defines its buffered polyline; ``cities`` are the weather
+# stations fetched for it.
+DEMO_CORRIDORS = {
+    'minneapolis_duluth': {
+        'origin': 'Minneapolis, MN',
+        'destination': 'Duluth, MN',
+        'bbox': {'north': 47.0, 'south': 44.5, 'east': -92.0, 'west': -94.0},
+        'winter_period': {'start': '2024-01-15', 'end': '2024-01-25'},
+        'description': 'I-35 Ice Storm Corridor - January 2024',
+        'path': [
+            (44.9778, -93.2650), (45.2800, -92.9900), (45.5100, -92.9800),
+            (46.0116, -92.9444), (46.4500, -92.7600), (46.7867, -92.1005)
+        ],
+        'cities': [
+            ('Minneapolis', 44.9778, -93.2650),
+            ('Anoka', 45.1975, -93.3877),
+            ('Cambridge', 45.5719, -93.2244),
+            ('Mora', 45.8775, -93.2900),
+            ('Hinckley', 46.0116, -92.9444),
+            ('Duluth', 46.7867, -92.1005)
+        ]
+    },
+    'buffalo_syracuse': {
+        'origin': 'Buffalo, NY',
+        'destination': 'Syracuse, NY',
+        'bbox': {'north': 43.5, 'south': 42.5, 'east': -75.5, 'west': -79.0},
+        'winter_period': {'start': '2024-02-10', 'end': '2024-02-20'},
+        'description': 'Lake Effect Snow Belt - February 2024',
+        'path': [
+            (42.8864, -78.8784), (42.9981, -78.1875), (43.0600, -77.6100),
+            (43.0000, -77.4100), (42.9600, -76.8000), (43.0500, -76.5600),
+            (43.0481, -76.1474)
+        ],
+        'cities': [
+            ('Buffalo', 42.8864, -78.8784),
+            ('Batavia', 42.9981, -78.1875),
+            ('Rochester', 43.1566, -77.6088),
+            ('Geneva', 42.8698, -76.9777),
+            ('Auburn', 42.9317, -76.5660),
+            ('Syracuse', 43.0481, -76.1474)
+        ]
+    },
+    'detroit_grandrapids': {
+        'origin': 'Detroit, MI',
+        'destination': 'Grand Rapids, MI',
+        'bbox': {'north': 43.0, 'south': 42.0, 'east': -84.5, 'west': -86.0},
+        'winter_period': {'start': '2023-12-15', 'end': '2023-12-25'},
+        'description': 'Michigan Freezing Rain Event - December 2023',
+        'path': [
+            (42.3314, -83.0458), (42.4800, -83.4800), (42.5300, -83.7800),
+            (42.6800, -84.5500), (42.8700, -84.9000), (42.9634, -85.6681)
+        ],
+        'cities': [
+            ('Detroit', 42.3314, -83.0458),
+            ('Pontiac', 42.6389, -83.2910),
+            ('Flint', 43.0125, -83.6875),
+            ('Lansing', 42.3320, -84.5361),
+            ('Kalamazoo', 42.2917, -85.5872),
+            ('Grand Rapids', 42.9634, -85.6681)
+        ]
+    },
+    'denver_vail': {
+        'origin': 'Denver, CO',
+        'destination': 'Vail, CO',
+        'bbox': {'north': 40.0, 'south': 39.5, 'east': -105.5, 'west': -107.0},
+        'winter_period': {'start': '2024-01-20', 'end': '2024-01-30'},
+        'description': 'Mountain Pass Blizzard - January 2024',
+        'path': [
+            (39.7392, -104.9903), (39.7555, -105.2211), (39.7400, -105.5100),
+            (39.7061, -105.6972), (39.6800, -105.9200), (39.6300, -106.0700),
+            (39.5744, -106.0953), (39.5000, -106.1500), (39.6403, -106.3742)
+        ],
+        'cities': [
+            ('Denver', 39.7392, -104.9903),
+            ('Golden', 39.7555, -105.2211),
+            ('Georgetown', 39.7061, -105.6972),
+            ('Keystone', 39.6047, -105.9342),
+            ('Frisco', 39.5744, -106.0953),
+            ('Vail', 39.6403, -106.3742)
+        ]
+    }
+}
+
+
+class CorridorRegistry:
+    """Corridors as buffered polylines behind a uniform lat/lng grid.
+
+    Each corridor is registered in every grid cell its buffered extent
+    touches, so a lookup only ever tests the handful of corridors sharing a
+    cell with the query. A route belongs to a corridor when both of its
+    endpoints are inside the buffer and at least ``min_coverage`` of its
+    vertices are too.
+    """
+
+    def __init__(self, corridors, buffer_meters=30000, cell_degrees=1.0, min_coverage=0.8,
+                 max_samples=200):
+        self.corridors = dict(corridors)
+        self.buffer_meters = buffer_meters
+        self.cell_degrees = cell_degrees
+        self.min_coverage = min_coverage
+        self.max_samples = max_samples
+        self._indexes = {}
+        self._grid = {}
+        for key, info in self.corridors.items():
+            self._register(key, info)
+
+    @classmethod
+    def from_file(cls, path, base=None, **kwargs):
+        """Registry of the base corridors plus any defined in a JSON file of the same shape"""
+        corridors = dict(base or {})
+        if path and os.path.exists(path):
+            with open(path) as f:
+                corridors.update(json.load(f))
+        return cls(corridors, **kwargs)
+
+    def _register(self, key, info):
+        path = np.asarray(info.get('path') or [(lat, lng) for _, lat, lng in info['cities']],
+                          dtype=np.float64)
+        # Dense vertices make nearest-vertex distance a close stand-in for distance to the line
+        dense = geodesy.densify(path, self.buffer_meters / 10)
+        self._indexes[key] = geodesy.SpatialIndex(dense[:, 0], dense[:, 1])
+
+        pad_lat = math.degrees(self.buffer_meters / geodesy.EARTH_RADIUS_M)
+        pad_lng = pad_lat / max(math.cos(math.radians(np.abs(dense[:, 0]).max())), 0.01)
+        south, north = dense[:, 0].min() - pad_lat, dense[:, 0].max() + pad_lat
+        west, east = dense[:, 1].min() - pad_lng, dense[:, 1].max() + pad_lng
+        for row in range(self._cell(south), self._cell(north) + 1):
+            for col in range(self._cell(west), self._cell(east) + 1):
+                self._grid.setdefault((row, col), []).append(key)
+
+    def _cell(self, degrees):
+        return math.floor(degrees / self.cell_degrees)
+
+    def candidates(self, lat, lng):
+        """Corridors registered in the grid cell containing a point"""
+        return self._grid.get((self._cell(lat), self._cell(lng)), [])
+
+    def distance_to(self, key, lats, lngs):
+        """Meters from every point to the corridor's polyline"""
+        _, distances = self._indexes[key].query(lats, lngs)
+        return distances
+
+    def match_geometry(self, coords):
+        """Corridor covering most of an (n, 2) [lat, lng] route geometry, or None"""
+        coords = np.asarray(coords, dtype=np.float64)
+        if len(coords) == 0:
+            return None
+        keys = set(self.candidates(*coords[0])).intersection(self.candidates(*coords[-1]))
+        if not keys:
+            return None
+
+        step = max(1, len(coords) // self.max_samples)
+        sample = np.vstack((coords[::step], coords[-1:]))
+        best_key, best_score = None, None
+        for key in keys:
+            inside = self.distance_to(key, sample[:, 0], sample[:, 1]) <= self.buffer_meters
+            coverage = inside.mean()
+            if inside[0] and inside[-1] and coverage >= self.min_coverage:
+                if best_score is None or coverage > best_score:
+                    best_key, best_score = key, coverage
+        return best_key
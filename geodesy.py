@@ -0,0 +1,272 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # Earth radius in meters
+
+
+def points_to_arrays(points):
+    """Split a list of {'lat', 'lng'} dicts into float64 latitude and longitude arrays"""
+    lats = np.fromiter((p['lat'] for p in points), dtype=np.float64, count=len(points))
+    lngs = np.fromiter((p['lng'] for p in points), dtype=np.float64, count=len(points))
+    return lats, lngs
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters; broadcasts over scalars and NumPy arrays"""
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    delta_lat = np.radians(np.subtract(lat2, lat1))
+    delta_lng = np.radians(np.subtract(lng2, lng1))
+
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lng / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_M * c
+
+
+def pairwise_haversine(lats1, lngs1, lats2, lngs2):
+    """Distance matrix in meters of shape (len(lats1), len(lats2))"""
+    lats1 = np.asarray(lats1, dtype=np.float64)[:, None]
+    lngs1 = np.asarray(lngs1, dtype=np.float64)[:, None]
+    return haversine(lats1, lngs1, np.asarray(lats2, dtype=np.float64)[None, :],
+                     np.asarray(lngs2, dtype=np.float64)[None, :])
+
+
+def consecutive_haversine(lats, lngs):
+    """Distances in meters between consecutive vertices of a path (length n - 1)"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    return haversine(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+
+
+def cumulative_distance(lats, lngs):
+    """Along-track distance in meters from the first vertex to every vertex (length n)"""
+    cumulative = np.zeros(len(lats), dtype=np.float64)
+    if len(lats) > 1:
+        np.cumsum(consecutive_haversine(lats, lngs), out=cumulative[1:])
+    return cumulative
+
+
+def nearest(lats, lngs, ref_lats, ref_lngs):
+    """Index of and distance to the nearest reference point for every query point"""
+    distances = pairwise_haversine(lats, lngs, ref_lats, ref_lngs)
+    indices = np.argmin(distances, axis=1)
+    return indices, distances[np.arange(len(indices)), indices]
+
+
+def sample_indices(cumulative, interval_meters):
+    """Vertices picked by walking a path and keeping one every time interval_meters has been covered.
+
+    Matches the greedy rule: keep vertex i when its along-track distance is at
+    least interval_meters past the previously kept vertex. Vertex 0 is always kept.
+    Only the kept vertices are visited in Python, so long paths stay cheap.
+    """
+    n = len(cumulative)
+    indices = [0] if n else []
+    last_index = 0
+    last_distance = 0.0
+
+    while n:
+        idx = max(int(np.searchsorted(cumulative, last_distance + interval_meters, side='left')), last_index + 1)
+        # Settle float rounding so the test is exactly cumulative[i] - last >= interval
+        while idx < n and cumulative[idx] - last_distance < interval_meters:
+            idx += 1
+        while idx - 1 > last_index and cumulative[idx - 1] - last_distance >= interval_meters:
+            idx -= 1
+        if idx >= n:
+            break
+        indices.append(idx)
+        last_index = idx
+        last_distance = cumulative[idx]
+
+    return np.asarray(indices, dtype=np.intp)
+
+
+def interpolate_at_intervals(lats, lngs, interval_meters, cumulative=None):
+    """Points spaced every interval_meters along a path, plus its final vertex.
+
+    Positions are linearly interpolated in latitude/longitude between the
+    vertices that bracket each target distance.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if len(lats) < 2:
+        return lats.copy(), lngs.copy()
+
+    if cumulative is None:
+        cumulative = cumulative_distance(lats, lngs)
+    total = cumulative[-1]
+
+    targets = np.arange(0.0, total, interval_meters) if interval_meters > 0 else np.zeros(1)
+    targets = np.append(targets, total)
+    return np.interp(targets, cumulative, lats), np.interp(targets, cumulative, lngs)
+
+
+def to_unit_vectors(lats, lngs):
+    """Cartesian coordinates on the unit sphere, shape (n, 3)"""
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lng_rad = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lat = np.cos(lat_rad)
+    return np.column_stack((cos_lat * np.cos(lng_rad), cos_lat * np.sin(lng_rad), np.sin(lat_rad)))
+
+
+class SpatialIndex:
+    """KD-tree over points on the unit sphere for batched nearest-neighbour and radius queries.
+
+    Build it once per point set (for example a corridor's weather stations) and
+    query whole arrays of route points at a time. Distances are great-circle
+    meters derived from the chord length, so they agree with haversine.
+    """
+
+    def __init__(self, lats, lngs):
+        # scipy.spatial takes longer to import than the rest of the app; load it with the first index
+        from scipy.spatial import cKDTree
+        self.size = len(lats)
+        self._tree = cKDTree(to_unit_vectors(lats, lngs))
+
+    def query(self, lats, lngs, k=1):
+        """Indices of and distances in meters to the k nearest points for every query point.
+
+        Returns arrays of shape (n,) when k == 1 and (n, k) otherwise. When k exceeds
+        the index size the missing neighbours have index ``size`` and distance inf.
+        """
+        chords, indices = self._tree.query(to_unit_vectors(lats, lngs), k=k)
+        return indices, self._chord_to_meters(chords)
+
+    def query_radius(self, lats, lngs, radius_meters):
+        """For every query point, the indices of indexed points within radius_meters"""
+        chord = 2 * np.sin(min(radius_meters / EARTH_RADIUS_M, np.pi) / 2)
+        return [np.asarray(indices, dtype=np.intp)
+                for indices in self._tree.query_ball_point(to_unit_vectors(lats, lngs), chord)]
+
+    @staticmethod
+    def _chord_to_meters(chords):
+        meters = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(chords / 2, 1.0))
+        return np.where(np.isinf(chords), np.inf, meters)
+
+
+def decode_polyline(encoded):
+    """Decode a Google encoded polyline into an (n, 2) array of [lat, lng].
+
+    The decoding is vectorized: the 5-bit chunks of every value are combined
+    with one reduceat and the zigzag/delta steps are array operations.
+    """
+    chunks = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if chunks.size == 0:
+        return np.empty((0, 2), dtype=np.float64)
+
+    # A chunk without the 0x20 continuation bit ends a value; drop a trailing partial value
+    ends = np.flatnonzero((chunks & 0x20) == 0)
+    if ends.size == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    chunks = chunks[:ends[-1] + 1]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    # Position of every chunk inside its value gives its 5-bit shift
+    positions = np.arange(chunks.size) - np.repeat(starts, ends - starts + 1)
+    values = np.add.reduceat((chunks & 0x1f) << (5 * positions), starts)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    if deltas.size % 2:
+        deltas = deltas[:-1]
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 1e5
+
+
+def encode_polyline(coords):
+    """Encode an (n, 2) [lat, lng] array as a Google encoded polyline.
+
+    Inverse of decode_polyline. Every zigzagged delta is split into at most
+    seven 5-bit chunks at once and the unused chunks are masked out.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords) == 0:
+        return ''
+
+    fixed = np.round(coords * 1e5).astype(np.int64)
+    deltas = np.diff(fixed, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    positions = np.arange(7)
+    chunks = (values[:, None] >> (5 * positions)) & 0x1f
+    counts = 1 + np.count_nonzero((values[:, None] >> (5 * positions[1:])) > 0, axis=1)
+    # Every chunk but a value's last carries the 0x20 continuation bit
+    chunks[positions < counts[:, None] - 1] |= 0x20
+    return (chunks[positions < counts[:, None]] + 63).astype(np.uint8).tobytes().decode('ascii')
+
+
+def dedupe_consecutive(coords):
+    """Drop vertices identical to the vertex before them (e.g. repeated step boundaries)"""
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords) < 2:
+        return coords
+    keep = np.ones(len(coords), dtype=bool)
+    keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+    return coords[keep]
+
+
+def _project_meters(coords):
+    """Local equirectangular projection of [lat, lng] vertices to x/y meters"""
+    scale = np.pi / 180 * EARTH_RADIUS_M
+    cos_lat = np.cos(np.radians(np.mean(coords[:, 0])))
+    return np.column_stack((coords[:, 1] * scale * cos_lat, coords[:, 0] * scale))
+
+
+def simplify(coords, tolerance_meters):
+    """Douglas-Peucker simplification of an (n, 2) [lat, lng] path.
+
+    Keeps the first and last vertex and every vertex farther than
+    tolerance_meters from the simplified line. Works on a stack of spans with
+    vectorized point-to-segment distances, so no recursion depth limits apply.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    n = len(coords)
+    if n < 3 or not tolerance_meters or tolerance_meters <= 0:
+        return coords
+
+    xy = _project_meters(coords)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        a = xy[start]
+        segment = xy[end] - a
+        points = xy[start + 1:end] - a
+        length_sq = segment @ segment
+        if length_sq > 0:
+            t = np.clip(points @ segment / length_sq, 0.0, 1.0)
+            offsets = points - t[:, None] * segment
+        else:
+            offsets = points
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_meters:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return coords[keep]
+
+
+def densify(coords, max_segment_meters):
+    """Insert evenly spaced vertices so no segment is longer than max_segment_meters"""
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords) < 2:
+        return coords
+
+    lengths = consecutive_haversine(coords[:, 0], coords[:, 1])
+    pieces = np.maximum(np.ceil(lengths / max_segment_meters).astype(np.intp), 1)
+    if np.all(pieces == 1):
+        return coords
+
+    # Fractions 0, 1/k, ..., (k-1)/k along each segment, then the final vertex
+    segment_ids = np.repeat(np.arange(len(pieces)), pieces)
+    fractions = (np.arange(segment_ids.size) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / pieces[segment_ids]
+    starts = coords[segment_ids]
+    dense = starts + (coords[segment_ids + 1] - starts) * fractions[:, None]
+    return np.vstack((dense, coords[-1:]))
@@ -0,0 +1,729 @@
+"""Offline end-to-end load test for /api/routes.
+
+Starts local stand-ins for Google Directions and for the Open-Meteo
+forecast and archive APIs (FlatBuffers responses, as ``openmeteo_requests``
+expects), starts the app pointed at them, then drives /api/routes at rising
+concurrency and reports throughput and latency percentiles per level.
+
+    python loadtest.py                                      # Flask server, 1..32 clients
+    python loadtest.py --server uvicorn --workers 4 --levels 8,16,32,64
+    python loadtest.py --openmeteo-error-rate 0.05 --directions-latency-ms 400
+    python loadtest.py --slo-p99-ms 2000 -o capacity.json
+
+Each stand-in delays every response by its latency plus uniform jitter and
+fails a fraction of requests with an HTTP error, to rehearse slow or
+degraded upstreams. No request leaves the machine.
+"""
+import argparse
+import functools
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import flatbuffers
+import numpy as np
+import requests
+from openmeteo_sdk.Aggregation import Aggregation
+from openmeteo_sdk.Unit import Unit
+from openmeteo_sdk.Variable import Variable
+
+from benchmark import REPO_DIR, corridor_path
+from corridors import DEMO_CORRIDORS
+from tests.stubs import VERTEX_SPACING_M, directions_route
+
+# Area random trips are drawn from: the continental US snow belt
+TRIP_LAT_RANGE = (36.0, 47.0)
+TRIP_LNG_RANGE = (-110.0, -72.0)
+
+
+# --- Trip geometry ---------------------------------------------------------
+
+def _hash_unit(*parts):
+    """Deterministic float in [0, 1) from any strings"""
+    digest = hashlib.sha1('|'.join(str(p) for p in parts).encode()).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+
+@functools.lru_cache(maxsize=None)
+def corridor_endpoints():
+    """{normalized place text: (lat, lng)} for every corridor origin and destination"""
+    places = {}
+    for corridor in DEMO_CORRIDORS.values():
+        places[corridor['origin'].lower()] = tuple(corridor['path'][0])
+        places[corridor['destination'].lower()] = tuple(corridor['path'][-1])
+    return places
+
+
+def place(text):
+    """(lat, lng) for a "lat,lng" string, a corridor endpoint, or any other text (hashed)"""
+    try:
+        lat, lng = (float(v) for v in text.split(','))
+        return lat, lng
+    except ValueError:
+        pass
+    known = corridor_endpoints().get(text.strip().lower())
+    if known:
+        return known
+    return (TRIP_LAT_RANGE[0] + _hash_unit(text, 'lat') * (TRIP_LAT_RANGE[1] - TRIP_LAT_RANGE[0]),
+            TRIP_LNG_RANGE[0] + _hash_unit(text, 'lng') * (TRIP_LNG_RANGE[1] - TRIP_LNG_RANGE[0]))
+
+
+def corridor_key(origin, destination):
+    for key, corridor in DEMO_CORRIDORS.items():
+        if (corridor['origin'].lower(), corridor['destination'].lower()) == (origin.lower(), destination.lower()):
+            return key
+    return None
+
+
+def trip_path(start, end, seed=0):
+    """Road-like (n, 2) path between two points: a straight line with small seeded wiggles"""
+    lat0, lng0 = start
+    scale = 111320.0
+    x_end = (end[1] - lng0) * scale * math.cos(math.radians(lat0))
+    y_end = (end[0] - lat0) * scale
+    length = math.hypot(x_end, y_end)
+    n = max(2, int(length / VERTEX_SPACING_M) + 1)
+    t = np.linspace(0.0, 1.0, n)
+    rng = np.random.default_rng(seed)
+    # Low-frequency lateral drift that returns to zero at both ends
+    wiggle = sum(rng.normal(0, 0.01 * length / k) * np.sin(k * math.pi * t) for k in (1, 2, 3, 5))
+    nx, ny = (-y_end / length, x_end / length) if length else (0.0, 0.0)
+    x = x_end * t + nx * wiggle
+    y = y_end * t + ny * wiggle
+    lat = lat0 + y / scale
+    lng = lng0 + x / (scale * np.cos(np.radians(lat)))
+    return np.column_stack((lat, lng))
+
+
+def bow(coords, offset_m):
+    """Path displaced sideways by up to offset_m in the middle, as an alternative road would be"""
+    if offset_m == 0 or len(coords) < 3:
+        return coords
+    t = np.linspace(0.0, 1.0, len(coords))
+    direction = coords[-1] - coords[0]
+    normal = np.array([-direction[1], direction[0]])
+    normal /= np.linalg.norm(normal) or 1.0
+    shift = offset_m / 111320.0 * np.sin(math.pi * t)
+    return coords + shift[:, None] * normal[None, :]
+
+
+@functools.lru_cache(maxsize=512)
+def directions_routes(origin, destination, avoid, alternatives):
+    """Directions routes for a trip; stable for the same arguments"""
+    key = corridor_key(origin, destination)
+    if key:
+        base = corridor_path(key)
+        name = f"I-{key}"
+    else:
+        base = trip_path(place(origin), place(destination), seed=int(_hash_unit(origin, destination) * 2 ** 32))
+        name = "Synthetic"
+
+    length_km = float(np.abs(np.diff(base, axis=0)).sum()) * 111
+    spread = max(2000.0, length_km * 30)  # alternatives run up to 3% of the trip length apart
+    first = 1 if avoid else 0
+    routes = []
+    for i in range(first, first + (alternatives if alternatives > 1 else 1)):
+        offset = spread * ((i + 1) // 2) * (1 if i % 2 else -1)
+        routes.append(directions_route(bow(base, offset), f"{name} via {'abcdefgh'[i % 8]}"))
+    return routes
+
+
+def random_trip(rng, min_km, max_km):
+    """(origin, destination) as "lat,lng" strings for a random trip in the trip area"""
+    lat = rng.uniform(*TRIP_LAT_RANGE)
+    lng = rng.uniform(*TRIP_LNG_RANGE)
+    distance = rng.uniform(min_km, max_km) * 1000
+    heading = rng.uniform(0, 2 * math.pi)
+    dlat = math.degrees(distance * math.cos(heading) / 6371000)
+    dlng = math.degrees(distance * math.sin(heading) / (6371000 * math.cos(math.radians(lat))))
+    return f"{lat:.4f},{lng:.4f}", f"{lat + dlat:.4f},{lng + dlng:.4f}"
+
+
+# --- Open-Meteo FlatBuffers responses -----------------------------------------
+
+AGGREGATIONS = {'max': Aggregation.maximum, 'min': Aggregation.minimum, 'mean': Aggregation.mean,
+                'sum': Aggregation.sum}
+
+
+def describe_variable(name, wind_unit):
+    """(variable, unit, altitude, aggregation) codes for an Open-Meteo variable name"""
+    base = name
+    aggregation = Aggregation.none
+    suffix = base.rsplit('_', 1)[-1]
+    if suffix in AGGREGATIONS:
+        aggregation = AGGREGATIONS[suffix]
+        base = base.rsplit('_', 1)[0]
+    altitude = 0
+    match = re.match(r'(.*)_(\d+)m$', base)
+    if match:
+        base, altitude = match.group(1), int(match.group(2))
+
+    if 'temperature' in base:
+        unit = Unit.celsius
+    elif 'humidity' in base:
+        unit = Unit.percentage
+    elif base == 'snowfall':
+        unit = Unit.centimetre
+    elif base in ('precipitation', 'rain', 'showers'):
+        unit = Unit.millimetre
+    elif base.startswith('wind'):
+        unit = Unit.metre_per_second if wind_unit == 'ms' else Unit.kilometres_per_hour
+    else:
+        unit = Unit.undefined
+    return getattr(Variable, base, Variable.undefined), unit, altitude, aggregation
+
+
+def synthetic_weather(name, lat, lng, timestamps, wind_unit):
+    """Plausible winter values for a variable at one location, varying with latitude and time of day"""
+    t = np.asarray(timestamps, dtype=np.float64)
+    phase = np.sin(2 * math.pi * (t / 86400.0) + math.radians(lng))
+    temp = 4.0 - (lat - 38.0) * 0.7 + 4.0 * phase
+    wet = np.clip(np.sin(t / 43200.0 + lat), 0, None)
+    if 'temperature' in name:
+        values = temp + (3.0 if name.endswith('_max') else -3.0 if name.endswith('_min') else 0.0)
+    elif 'humidity' in name:
+        values = 75.0 + 15.0 * wet
+    elif name.startswith('snowfall'):
+        values = np.where(temp < 0.5, 0.6 * wet, 0.0)
+    elif name.startswith('rain'):
+        values = np.where(temp >= 0.5, 1.2 * wet, 0.0)
+    elif name.startswith('precipitation'):
+        values = 1.2 * wet
+    elif name.startswith('wind'):
+        values = (6.0 if 'gusts' in name else 4.0) + 3.0 * np.abs(phase)
+        if wind_unit != 'ms':
+            values = values * 3.6
+    else:
+        values = np.zeros_like(t)
+    if name.endswith('_sum'):
+        values = values * 24
+    return values.astype(np.float32)
+
+
+def _variable_table(builder, name, wind_unit, value=None, values=None):
+    variable, unit, altitude, aggregation = describe_variable(name, wind_unit)
+    vector = builder.CreateNumpyVector(values) if values is not None else None
+    builder.StartObject(13)
+    builder.PrependUint8Slot(0, variable, 0)
+    builder.PrependUint8Slot(1, unit, 0)
+    if value is not None:
+        builder.PrependFloat32Slot(2, float(value), 0.0)
+    if vector is not None:
+        builder.PrependUOffsetTRelativeSlot(3, vector, 0)
+    builder.PrependInt16Slot(5, altitude, 0)
+    builder.PrependUint8Slot(6, aggregation, 0)
+    return builder.EndObject()
+
+
+def _variables_block(builder, start, end, interval, variables):
+    """VariablesWithTime table from already-built VariableWithValues offsets"""
+    builder.StartVector(4, len(variables), 4)
+    for offset in reversed(variables):
+        builder.PrependUOffsetTRelative(offset)
+    vector = builder.EndVector()
+    builder.StartObject(4)
+    builder.PrependInt64Slot(0, start, 0)
+    builder.PrependInt64Slot(1, end, 0)
+    builder.PrependInt32Slot(2, interval, 0)
+    builder.PrependUOffsetTRelativeSlot(3, vector, 0)
+    return builder.EndObject()
+
+
+def encode_location(lat, lng, location_id, blocks, wind_unit):
+    """One size-prefixed WeatherApiResponse message.
+
+    ``blocks`` maps 'current', 'hourly' or 'daily' to (start, interval, steps,
+    variable names); 'current' has one step and scalar values.
+    """
+    builder = flatbuffers.Builder(1024)
+    tables = {}
+    for kind, (start, interval, steps, names) in blocks.items():
+        timestamps = start + interval * np.arange(steps)
+        variables = []
+        for name in names:
+            values = synthetic_weather(name, lat, lng, timestamps, wind_unit)
+            if kind == 'current':
+                variables.append(_variable_table(builder, name, wind_unit, value=values[0]))
+            else:
+                variables.append(_variable_table(builder, name, wind_unit, values=values))
+        tables[kind] = _variables_block(builder, start, start + interval * steps, interval, variables)
+
+    tz = builder.CreateString('GMT')
+    builder.StartObject(15)
+    builder.PrependFloat32Slot(0, lat, 0.0)
+    builder.PrependFloat32Slot(1, lng, 0.0)
+    builder.PrependFloat32Slot(2, 250.0, 0.0)
+    builder.PrependFloat32Slot(3, 0.5, 0.0)
+    builder.PrependInt64Slot(4, location_id, 0)
+    builder.PrependInt32Slot(6, 0, 0)
+    builder.PrependUOffsetTRelativeSlot(7, tz, 0)
+    builder.PrependUOffsetTRelativeSlot(8, tz, 0)
+    for slot, kind in ((9, 'current'), (10, 'daily'), (11, 'hourly')):
+        if kind in tables:
+            builder.PrependUOffsetTRelativeSlot(slot, tables[kind], 0)
+    builder.Finish(builder.EndObject())
+    message = builder.Output()
+    return len(message).to_bytes(4, 'little') + bytes(message)
+
+
+def _list_param(query, name):
+    """Values of a list parameter sent either comma-separated or repeated"""
+    values = []
+    for value in query.get(name, []):
+        values.extend(v for v in value.split(',') if v)
+    return values
+
+
+def openmeteo_body(query, archive):
+    """Concatenated FlatBuffers messages answering a forecast or archive query"""
+    lats = [float(v) for v in _list_param(query, 'latitude')]
+    lngs = [float(v) for v in _list_param(query, 'longitude')]
+    if not lats or len(lats) != len(lngs):
+        raise ValueError("latitude and longitude must have the same number of values")
+    wind_unit = query.get('wind_speed_unit', ['kmh'])[0]
+
+    if archive:
+        start = datetime.fromisoformat(query['start_date'][0]).replace(tzinfo=timezone.utc)
+        end = datetime.fromisoformat(query['end_date'][0]).replace(tzinfo=timezone.utc)
+        days = (end - start).days + 1
+        blocks = {'daily': (int(start.timestamp()), 86400, days, _list_param(query, 'daily'))}
+    else:
+        now = int(time.time())
+        midnight = int(datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+        days = int(query.get('forecast_days', ['7'])[0])
+        blocks = {}
+        if 'current' in query:
+            blocks['current'] = (now - now % 900, 900, 1, _list_param(query, 'current'))
+        if 'hourly' in query:
+            hours = int(query['forecast_hours'][0]) if 'forecast_hours' in query else days * 24
+            hourly_start = now - now % 3600 if 'forecast_hours' in query else midnight
+            blocks['hourly'] = (hourly_start, 3600, hours, _list_param(query, 'hourly'))
+        if 'daily' in query:
+            blocks['daily'] = (midnight, 86400, days, _list_param(query, 'daily'))
+
+    return b''.join(
+        encode_location(lat, lng, i, blocks, wind_unit) for i, (lat, lng) in enumerate(zip(lats, lngs))
+    )
+
+
+# --- Stand-in servers -------------------------------------------------------
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server with latency and error injection and per-path counters"""
+
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, address, handler, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=500):
+        super().__init__(address, handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def inject(self, path):
+        """Wait out the configured latency; True when this request should fail"""
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        fail = random.random() < self.error_rate
+        with self._lock:
+            counts = self.counts.setdefault(path, {'requests': 0, 'errors': 0, 'locations': 0})
+            counts['requests'] += 1
+            counts['errors'] += fail
+        return fail
+
+    def count_locations(self, path, n):
+        with self._lock:
+            self.counts[path]['locations'] += n
+
+    def snapshot(self):
+        with self._lock:
+            return {path: dict(counts) for path, counts in self.counts.items()}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    paths = {}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/__stats':
+            return self._send(200, json.dumps(self.server.snapshot()).encode(), 'application/json')
+        method = self.paths.get(url.path)
+        if method is None:
+            return self._send(404, b'{"error": true, "reason": "Not found"}', 'application/json')
+
+        if self.server.inject(url.path):
+            return self._send(self.server.error_status, b'{"error": true, "reason": "Injected failure"}',
+                              'application/json')
+        try:
+            body, content_type = getattr(self, method)(url.path, parse_qs(url.query))
+        except (KeyError, ValueError) as e:
+            return self._send(400, json.dumps({'error': True, 'reason': str(e)}).encode(), 'application/json')
+        self._send(200, body, content_type)
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DirectionsHandler(StandInHandler):
+    """Google Directions JSON"""
+
+    paths = {'/maps/api/directions/json': 'directions'}
+
+    def directions(self, path, query):
+        avoid = query.get('avoid', [''])[0]
+        alternatives = 3 if query.get('alternatives', ['false'])[0] == 'true' else 1
+        routes = directions_routes(query['origin'][0], query['destination'][0], avoid, alternatives)
+        body = {'geocoded_waypoints': [], 'routes': routes, 'status': 'OK'}
+        return json.dumps(body).encode(), 'application/json; charset=UTF-8'
+
+
+class OpenMeteoHandler(StandInHandler):
+    """Open-Meteo forecast and archive APIs in FlatBuffers format"""
+
+    paths = {'/v1/forecast': 'weather', '/v1/archive': 'weather'}
+
+    def weather(self, path, query):
+        if query.get('format', [''])[0] != 'flatbuffers':
+            raise ValueError("only format=flatbuffers is supported by this stand-in")
+        body = openmeteo_body(query, archive=path == '/v1/archive')
+        self.server.count_locations(path, len(_list_param(query, 'latitude')))
+        return body, 'application/octet-stream'
+
+
+STAND_INS = {'directions': DirectionsHandler, 'openmeteo': OpenMeteoHandler}
+
+
+def serve_stand_in(kind, options, ready):
+    """Process entry point: serve one stand-in on a free port and report the port"""
+    server = StandInServer(('127.0.0.1', 0), STAND_INS[kind], **options)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stand_in(kind, options):
+    """(process, base URL) of a stand-in running in its own process, clear of the load generator's GIL"""
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    process = context.Process(target=serve_stand_in, args=(kind, options, ready), daemon=True)
+    process.start()
+    port = ready.get(timeout=30)
+    return process, f"http://127.0.0.1:{port}"
+
+
+# --- App under test -----------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def app_command(server, port, workers, threads):
+    python = sys.executable
+    if server == 'flask':
+        return [python, '-c', f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    if server == 'gunicorn':
+        return [python, '-m', 'gunicorn', '-w', str(workers), '-k', 'gthread', '--threads', str(threads),
+                '-b', f"127.0.0.1:{port}", '--timeout', '120', 'app:app']
+    return [python, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--no-access-log', '--log-level', 'warning']
+
+
+def app_environment(directions_url, openmeteo_url, workdir):
+    """Environment that points the app at the stand-ins, with its writable state in workdir"""
+    env = dict(os.environ)
+    env.update({
+        'GOOGLE_MAPS_BASE_URL': directions_url,
+        'OPENMETEO_FORECAST_URL': f"{openmeteo_url}/v1/forecast",
+        'OPENMETEO_ARCHIVE_URL': f"{openmeteo_url}/v1/archive",
+        'OPENMETEO_CACHE_FILE': os.path.join(workdir, 'openmeteo_cache.sqlite'),
+        'REFRESH_ENABLED': 'false',
+        'PYTHONUNBUFFERED': '1'
+    })
+    # googlemaps.Client only checks the key's format; no request reaches Google
+    env.setdefault('GOOGLE_MAPS_API_KEY', 'AIza-offline-loadtest')
+    return env
+
+
+def start_app(args, directions_url, openmeteo_url, workdir):
+    """(process, base URL, log path) of the app serving against the stand-ins"""
+    port = free_port()
+    env = app_environment(directions_url, openmeteo_url, workdir)
+    log_path = os.path.join(workdir, 'app.log')
+    log = open(log_path, 'w')
+    process = subprocess.Popen(app_command(args.server, port, args.workers, args.threads),
+                               cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app exited with status {process.returncode}; see {log_path}")
+        try:
+            if requests.get(f"{base_url}/metrics", timeout=2).status_code == 200:
+                return process, base_url, log_path
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"app did not start within {args.startup_timeout}s; see {log_path}")
+
+
+# --- Load generation --------------------------------------------------------
+
+class TripSource:
+    """Thread-safe stream of /api/routes request bodies.
+
+    A share of requests asks for a demo corridor (historical weather, mostly
+    route-cache hits); the rest are random trips, drawn from a fixed pool of
+    ``pool_size`` or fresh every time when ``pool_size`` is 0.
+    """
+
+    def __init__(self, seed, corridor_share, pool_size, min_km, max_km, compact):
+        self.rng = random.Random(seed)
+        self.corridor_share = corridor_share
+        self.min_km = min_km
+        self.max_km = max_km
+        self.compact = compact
+        self.corridors = [(c['origin'], c['destination']) for c in DEMO_CORRIDORS.values()]
+        self.pool = [random_trip(self.rng, min_km, max_km) for _ in range(pool_size)]
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if self.corridors and self.rng.random() < self.corridor_share:
+                origin, destination = self.rng.choice(self.corridors)
+            elif self.pool:
+                origin, destination = self.rng.choice(self.pool)
+            else:
+                origin, destination = random_trip(self.rng, self.min_km, self.max_km)
+            avoid_icy = self.rng.random() < 0.5
+        body = {'origin': origin, 'destination': destination, 'avoid_icy': avoid_icy}
+        if self.compact:
+            body['format'] = 'compact'
+        return body
+
+
+def percentile_ms(latencies, q):
+    return round(float(np.percentile(latencies, q)) * 1000, 1) if len(latencies) else None
+
+
+def run_level(base_url, concurrency, duration, trips, timeout):
+    """Drive /api/routes with ``concurrency`` closed-loop clients for ``duration`` seconds"""
+    samples = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < stop_at:
+            body = trips.next()
+            started = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}/api/routes", json=body, timeout=timeout)
+                status = response.status_code
+                size = len(response.content)
+            except requests.RequestException:
+                status, size = None, 0
+            local.append((time.perf_counter() - started, status, size))
+        session.close()
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ok = np.array([latency for latency, status, _ in samples if status == 200])
+    errors = {}
+    for _, status, _ in samples:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'requests': len(samples),
+        'ok': int(len(ok)),
+        'errors': errors,
+        'error_rate': round(1 - len(ok) / len(samples), 4) if samples else None,
+        'throughput_rps': round(len(ok) / elapsed, 2),
+        'p50_ms': percentile_ms(ok, 50),
+        'p95_ms': percentile_ms(ok, 95),
+        'p99_ms': percentile_ms(ok, 99),
+        'max_ms': round(float(ok.max()) * 1000, 1) if len(ok) else None,
+        'mean_response_bytes': int(np.mean([size for _, status, size in samples if status == 200])) if len(ok) else None
+    }
+
+
+def stand_in_stats(url):
+    try:
+        return requests.get(f"{url}/__stats", timeout=5).json()
+    except requests.RequestException:
+        return {}
+
+
+def stats_delta(after, before):
+    delta = {}
+    for path, counts in after.items():
+        previous = before.get(path, {})
+        delta[path] = {name: value - previous.get(name, 0) for name, value in counts.items()}
+    return delta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test of /api/routes against local upstream stand-ins")
+    parser.add_argument('--server', choices=('flask', 'gunicorn', 'uvicorn'), default='flask',
+                        help="how to serve the app (default: Flask's threaded server)")
+    parser.add_argument('--workers', type=int, default=2, help="worker processes for gunicorn/uvicorn")
+    parser.add_argument('--threads', type=int, default=8, help="threads per gunicorn worker")
+    parser.add_argument('--levels', default='1,2,4,8,16,32', help="comma-separated client concurrency levels")
+    parser.add_argument('--duration', type=float, default=15, help="seconds per concurrency level")
+    parser.add_argument('--warmup', type=float, default=5, help="seconds of single-client warmup, not reported")
+    parser.add_argument('--timeout', type=float, default=60, help="client request timeout in seconds")
+    parser.add_argument('--startup-timeout', type=float, default=120, help="seconds to wait for the app")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trips', type=int, default=0,
+                        help="draw random trips from a pool of this size (default 0: every trip is new)")
+    parser.add_argument('--corridor-share', type=float, default=0.2,
+                        help="fraction of requests for demo corridors (default 0.2)")
+    parser.add_argument('--min-km', type=float, default=50, help="shortest random trip")
+    parser.add_argument('--max-km', type=float, default=400, help="longest random trip")
+    parser.add_argument('--compact', action='store_true', help="request the compact response format")
+    parser.add_argument('--directions-latency-ms', type=float, default=150)
+    parser.add_argument('--directions-jitter-ms', type=float, default=100)
+    parser.add_argument('--directions-error-rate', type=float, default=0.0)
+    parser.add_argument('--openmeteo-latency-ms', type=float, default=80)
+    parser.add_argument('--openmeteo-jitter-ms', type=float, default=60)
+    parser.add_argument('--openmeteo-error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument('--max-error-rate', type=float, default=0.5,
+                        help="stop rising once a level fails more than this fraction of requests")
+    parser.add_argument('--slo-p99-ms', type=float, help="report the highest level whose p99 stays under this")
+    parser.add_argument('-o', '--output', help="write JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+    levels = [int(level) for level in args.levels.split(',') if level]
+
+    directions_options = {'latency_ms': args.directions_latency_ms, 'jitter_ms': args.directions_jitter_ms,
+                          'error_rate': args.directions_error_rate, 'error_status': args.error_status}
+    openmeteo_options = {'latency_ms': args.openmeteo_latency_ms, 'jitter_ms': args.openmeteo_jitter_ms,
+                         'error_rate': args.openmeteo_error_rate, 'error_status': args.error_status}
+
+    workdir = tempfile.mkdtemp(prefix='icyroute-loadtest-')
+    processes = []
+    app_process = None
+    try:
+        directions_process, directions_url = start_stand_in('directions', directions_options)
+        openmeteo_process, openmeteo_url = start_stand_in('openmeteo', openmeteo_options)
+        processes += [directions_process, openmeteo_process]
+        print(f"🧪 Stand-ins: Directions {directions_url}, Open-Meteo {openmeteo_url}", file=sys.stderr)
+
+        app_process, base_url, log_path = start_app(args, directions_url, openmeteo_url, workdir)
+        print(f"🚀 App ({args.server}) at {base_url}, log {log_path}", file=sys.stderr)
+
+        trips = TripSource(args.seed, args.corridor_share, args.trips, args.min_km, args.max_km, args.compact)
+        if args.warmup > 0:
+            run_level(base_url, 1, args.warmup, trips, args.timeout)
+
+        print(f"  {'clients':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} "
+              f"{'upstream/req':>12}", file=sys.stderr)
+        results = []
+        for concurrency in levels:
+            before = (stand_in_stats(directions_url), stand_in_stats(openmeteo_url))
+            level = run_level(base_url, concurrency, args.duration, trips, args.timeout)
+            upstream = {
+                'directions': stats_delta(stand_in_stats(directions_url), before[0]),
+                'openmeteo': stats_delta(stand_in_stats(openmeteo_url), before[1])
+            }
+            level['upstream'] = upstream
+            upstream_requests = sum(c['requests'] for stats in upstream.values() for c in stats.values())
+            level['upstream_requests_per_request'] = (
+                round(upstream_requests / level['requests'], 2) if level['requests'] else None
+            )
+            results.append(level)
+            print(f"  {concurrency:7d} {level['throughput_rps']:8.2f} {level['p50_ms'] or 0:9.1f} "
+                  f"{level['p95_ms'] or 0:9.1f} {level['p99_ms'] or 0:9.1f} {level['error_rate'] or 0:7.1%} "
+                  f"{level['upstream_requests_per_request'] or 0:12.2f}", file=sys.stderr)
+            if level['error_rate'] is None or level['error_rate'] > args.max_error_rate:
+                print(f"⚠️ Stopping: error rate above {args.max_error_rate:.0%}", file=sys.stderr)
+                break
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            try:
+                app_process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                app_process.kill()
+        for process in processes:
+            process.terminate()
+
+    summary = {}
+    if results:
+        peak = max(results, key=lambda level: level['throughput_rps'])
+        summary['peak_throughput_rps'] = peak['throughput_rps']
+        summary['peak_concurrency'] = peak['concurrency']
+    if args.slo_p99_ms is not None:
+        within = [level for level in results
+                  if level['p99_ms'] is not None and level['p99_ms'] <= args.slo_p99_ms and level['error_rate'] <= 0.01]
+        best = max(within, key=lambda level: level['throughput_rps']) if within else None
+        summary['slo_p99_ms'] = args.slo_p99_ms
+        summary['slo_concurrency'] = best['concurrency'] if best else None
+        summary['slo_throughput_rps'] = best['throughput_rps'] if best else None
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'server': args.server,
+            'workers': args.workers if args.server != 'flask' else 1,
+            'duration_s': args.duration,
+            'trips': args.trips,
+            'corridor_share': args.corridor_share,
+            'trip_km': [args.min_km, args.max_km],
+            'compact': args.compact,
+            'directions': directions_options,
+            'openmeteo': openmeteo_options
+        },
+        'levels': results,
+        'summary': summary
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Latency buckets from sub-millisecond CPU stages up to slow upstream calls, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    'icyroute_stage_seconds', 'Time spent in each stage of the route pipeline',
+    ['stage'], buckets=LATENCY_BUCKETS
+)
+WEATHER_FETCH_SECONDS = Histogram(
+    'icyroute_weather_fetch_seconds', 'Time to get weather for one route, by the source that served it',
+    ['source'], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_SECONDS = Histogram(
+    'icyroute_upstream_seconds', 'Duration of individual upstream API calls',
+    ['upstream'], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_ERRORS = Counter(
+    'icyroute_upstream_errors_total', 'Upstream API calls that raised or returned an error',
+    ['upstream']
+)
+WEATHER_FALLBACKS = Counter(
+    'icyroute_weather_fallbacks_total', 'Weather points served from simulated fallback weather',
+    ['reason']
+)
+
+# Children bound once at import, so recording is a lock and an add on the hot path
+DIRECTIONS_STAGE = STAGE_SECONDS.labels('directions')
+GEOMETRY_STAGE = STAGE_SECONDS.labels('geometry')
+SAMPLING_STAGE = STAGE_SECONDS.labels('sampling')
+SCORING_STAGE = STAGE_SECONDS.labels('scoring')
+SERIALIZATION_STAGE = STAGE_SECONDS.labels('serialization')
+
+HISTORICAL_FETCH = WEATHER_FETCH_SECONDS.labels('historical')
+CURRENT_FETCH = WEATHER_FETCH_SECONDS.labels('current')
+FALLBACK_FETCH = WEATHER_FETCH_SECONDS.labels('fallback')
+RASTER_FETCH = WEATHER_FETCH_SECONDS.labels('raster')
+FORECAST_FETCH = WEATHER_FETCH_SECONDS.labels('forecast')
+
+
+class CacheCollector:
+    """Reports every cache's own counters at scrape time instead of on each lookup.
+
+    ``caches`` returns {name: cache} for the live engine, or {} before one
+    exists; each cache exposes ``stats()`` with hits, misses and entries.
+    """
+
+    COUNTERS = ('hits', 'misses', 'coalesced', 'evictions')
+
+    def __init__(self, caches):
+        self.caches = caches
+
+    def collect(self):
+        counters = {
+            name: CounterMetricFamily(f'icyroute_cache_{name}', f'Cache lookups counted as {name}', labels=['cache'])
+            for name in self.COUNTERS
+        }
+        entries = GaugeMetricFamily('icyroute_cache_entries', 'Entries currently held by each cache', labels=['cache'])
+        hit_ratio = GaugeMetricFamily('icyroute_cache_hit_ratio', 'Hits over all lookups since start', labels=['cache'])
+
+        for cache_name, cache in self.caches().items():
+            stats = cache.stats()
+            for name, family in counters.items():
+                if name in stats:
+                    family.add_metric([cache_name], stats[name])
+            entries.add_metric([cache_name], stats['entries'])
+            if stats.get('hit_ratio') is not None:
+                hit_ratio.add_metric([cache_name], stats['hit_ratio'])
+
+        yield from counters.values()
+        yield entries
+        yield hit_ratio
+
+
+def register_caches(caches):
+    """Expose cache statistics from a {name: cache} provider on /metrics"""
+    REGISTRY.register(CacheCollector(caches))
+
+
+def exposition():
+    """(body, content type) of every registered metric in Prometheus text format"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,518 @@
+"""Gridded ice-risk rasters over a bounding box.
+
+A raster is a regular lat/lng grid scored with the vectorized IceDetector
+logic from interpolated weather fields, one file per time step:
+``<raster_dir>/<name>/<step>.npy`` holds an int16 array of shape
+(n_bands, rows, cols) in fixed point, and ``<step>.json`` next to it holds
+the grid, band scales and validity window. Grids are processed in square
+tiles written straight into a memory-mapped file, so memory stays bounded
+however many cells the box has.
+
+Build rasters with ``python raster.py corridor <route_key>`` (one step per
+historical day of a demo corridor) or ``python raster.py current --bbox
+N,S,E,W --name <name>`` (current conditions interpolated from a coarse
+Open-Meteo lattice). Route scoring samples a current raster that covers the
+route instead of calling Open-Meteo.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from geodesy import SpatialIndex
+
+# Version of the on-disk raster format written by write_raster
+RASTER_FORMAT_VERSION = 1
+
+# Bands stored for every cell, in on-disk order, as int16 codes: value = code / scale
+BAND_SCALES = {
+    'ice_risk': 10000,
+    'base_risk': 10000,
+    'temp': 100,
+    'feels_like': 100,
+    'humidity': 100,
+    'precipitation': 100,
+    'snowfall': 100,
+    'rain': 100,
+    'wind_speed': 10,
+    'visibility': 100
+}
+BANDS = list(BAND_SCALES)
+
+# Weather variables a field has to provide; the rest of the bands are derived
+FIELD_VARIABLES = ('temp', 'feels_like', 'humidity', 'precipitation', 'snowfall', 'rain', 'wind_speed')
+
+# Code of cells without data (outside every station's reach)
+NODATA = np.iinfo(np.int16).min
+
+# Cells per tile side; a 256 x 256 tile needs a few tens of MB of scratch arrays
+DEFAULT_TILE_SIZE = 256
+
+# Road type the stored ice_risk band is scored for
+RASTER_ROUTE_TYPE = 'highway'
+
+
+class RasterGrid:
+    """Regular grid of ``resolution``-degree cells covering a bounding box.
+
+    Row 0 is the northern edge and column 0 the western edge; cell values
+    stand for the cell centre.
+    """
+
+    def __init__(self, north, south, east, west, resolution):
+        if north <= south or east <= west or resolution <= 0:
+            raise ValueError(f"Invalid raster grid {north},{south},{east},{west} at {resolution}")
+        self.north = float(north)
+        self.south = float(south)
+        self.east = float(east)
+        self.west = float(west)
+        self.resolution = float(resolution)
+        self.rows = int(np.ceil(round((self.north - self.south) / self.resolution, 9)))
+        self.cols = int(np.ceil(round((self.east - self.west) / self.resolution, 9)))
+
+    @classmethod
+    def from_bbox(cls, bbox, resolution):
+        return cls(bbox['north'], bbox['south'], bbox['east'], bbox['west'], resolution)
+
+    @property
+    def shape(self):
+        return (self.rows, self.cols)
+
+    @property
+    def cells(self):
+        return self.rows * self.cols
+
+    def bbox(self):
+        return {'north': self.north, 'south': self.south, 'east': self.east, 'west': self.west}
+
+    def tiles(self, tile_size=DEFAULT_TILE_SIZE):
+        """(row_start, row_end, col_start, col_end) of every tile, row-major"""
+        for r0 in range(0, self.rows, tile_size):
+            for c0 in range(0, self.cols, tile_size):
+                yield r0, min(r0 + tile_size, self.rows), c0, min(c0 + tile_size, self.cols)
+
+    def cell_centers(self, r0, r1, c0, c1):
+        """Flattened latitude and longitude arrays of a tile's cell centres"""
+        lats = self.north - (np.arange(r0, r1, dtype=np.float64) + 0.5) * self.resolution
+        lngs = self.west + (np.arange(c0, c1, dtype=np.float64) + 0.5) * self.resolution
+        return np.repeat(lats, c1 - c0), np.tile(lngs, r1 - r0)
+
+    def locate(self, lats, lngs):
+        """(rows, cols, inside) of the cells holding each point"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        rows = np.floor((self.north - lats) / self.resolution).astype(np.intp)
+        cols = np.floor((lngs - self.west) / self.resolution).astype(np.intp)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        return np.where(inside, rows, 0), np.where(inside, cols, 0), inside
+
+
+class StationField:
+    """Weather interpolated from scattered stations by inverse-distance weighting.
+
+    ``values`` maps each variable to one value per station. Cells further than
+    ``max_distance`` meters from every station get NaN.
+    """
+
+    def __init__(self, lats, lngs, values, k=4, power=2, max_distance=None):
+        self.index = SpatialIndex(lats, lngs)
+        self.values = {name: np.asarray(column, dtype=np.float64) for name, column in values.items()}
+        self.k = min(k, len(lats))
+        self.power = power
+        self.max_distance = max_distance
+
+    def __call__(self, lats, lngs):
+        indices, distances = self.index.query(lats, lngs, k=self.k)
+        if self.k == 1:
+            indices, distances = indices[:, None], distances[:, None]
+
+        # Points sitting on a station take its value; elsewhere weights fall off with distance
+        weights = 1.0 / np.maximum(distances, 1.0) ** self.power
+        weights /= weights.sum(axis=1, keepdims=True)
+        out_of_reach = distances[:, 0] > self.max_distance if self.max_distance else None
+
+        field = {}
+        for name, column in self.values.items():
+            interpolated = (column[indices] * weights).sum(axis=1)
+            if out_of_reach is not None:
+                interpolated[out_of_reach] = np.nan
+            field[name] = interpolated
+        return field
+
+
+class LatticeField:
+    """Weather bilinearly interpolated from a regular lattice of sample points.
+
+    ``values`` maps each variable to an array of shape (ny, nx) sampled at
+    ``south + i * step`` and ``west + j * step``; points past the lattice
+    edge take the nearest edge value.
+    """
+
+    def __init__(self, south, west, step, values):
+        self.south = south
+        self.west = west
+        self.step = step
+        self.values = {name: np.asarray(grid, dtype=np.float64) for name, grid in values.items()}
+        self.ny, self.nx = next(iter(self.values.values())).shape
+
+    def __call__(self, lats, lngs):
+        y = np.clip((np.asarray(lats) - self.south) / self.step, 0, self.ny - 1)
+        x = np.clip((np.asarray(lngs) - self.west) / self.step, 0, self.nx - 1)
+        y0 = np.minimum(np.floor(y).astype(np.intp), max(self.ny - 2, 0))
+        x0 = np.minimum(np.floor(x).astype(np.intp), max(self.nx - 2, 0))
+        y1 = np.minimum(y0 + 1, self.ny - 1)
+        x1 = np.minimum(x0 + 1, self.nx - 1)
+        fy = y - y0
+        fx = x - x0
+
+        field = {}
+        for name, grid in self.values.items():
+            top = grid[y0, x0] * (1 - fx) + grid[y0, x1] * fx
+            bottom = grid[y1, x0] * (1 - fx) + grid[y1, x1] * fx
+            field[name] = top * (1 - fy) + bottom * fy
+        return field
+
+
+def score_cells(weather, lats, lngs, ice_detector):
+    """Every band for a batch of cells from their interpolated weather"""
+    base_risk = ice_detector.base_risk_batch(
+        weather['temp'], weather['humidity'], weather['precipitation'], weather['snowfall'], weather['wind_speed']
+    )
+    ice_risk, _ = ice_detector.calculate_ice_risk_batch(
+        weather['temp'], weather['humidity'], weather['precipitation'], weather['snowfall'], weather['wind_speed'],
+        lats, lngs, RASTER_ROUTE_TYPE, base_risk=base_risk
+    )
+    bands = dict(weather, ice_risk=ice_risk, base_risk=base_risk)
+    bands['visibility'] = np.maximum(1, 15 - weather['precipitation'])
+    # Cells the field could not reach stay without data in every band
+    missing = np.isnan(weather['temp'])
+    if missing.any():
+        for name in ('ice_risk', 'base_risk', 'visibility'):
+            bands[name] = np.where(missing, np.nan, bands[name])
+    return bands
+
+
+def quantize(values, scale):
+    """int16 codes of a float array, NODATA where NaN"""
+    codes = np.rint(np.clip(values * scale, NODATA + 1, np.iinfo(np.int16).max))
+    return np.where(np.isnan(values), NODATA, codes).astype(np.int16)
+
+
+class Raster:
+    """One memory-mapped raster time step"""
+
+    def __init__(self, header, data, mtime=None):
+        self.header = header
+        self.data = data
+        self.mtime = mtime
+        self.grid = RasterGrid.from_bbox(header['bbox'], header['resolution'])
+        self.band_index = {name: i for i, name in enumerate(header['bands'])}
+
+    @property
+    def name(self):
+        return self.header['name']
+
+    @property
+    def step(self):
+        return self.header['step']
+
+    def valid_at(self, when):
+        return self.header['valid_from'] <= when < self.header['valid_until']
+
+    def covers(self, lats, lngs):
+        return bool(self.grid.locate(lats, lngs)[2].all())
+
+    def sample(self, lats, lngs, bands=None):
+        """{band: float array} at the cell holding each point; NaN outside the grid or without data"""
+        rows, cols, inside = self.grid.locate(lats, lngs)
+        samples = {}
+        for name in bands or self.header['bands']:
+            codes = self.data[self.band_index[name], rows, cols]
+            values = codes / self.header['scales'][name]
+            samples[name] = np.where(inside & (codes != NODATA), values, np.nan)
+        return samples
+
+
+class RasterStore:
+    """Process-resident index of the rasters under one directory.
+
+    Headers are re-read only when a raster directory's mtime changes and each
+    step's array is memory-mapped read-only on first use, so looking up the
+    raster for a route costs a few stat calls.
+    """
+
+    def __init__(self, raster_dir):
+        self.raster_dir = raster_dir
+        self._headers = {}   # name -> (directory mtime, {step: header})
+        self._rasters = {}   # (name, step) -> Raster
+        self._lock = threading.RLock()
+
+    def header_file(self, name, step):
+        return os.path.join(self.raster_dir, name, f"{step}.json")
+
+    def data_file(self, name, step):
+        return os.path.join(self.raster_dir, name, f"{step}.npy")
+
+    def headers(self):
+        """{name: {step: header}} of every complete raster on disk"""
+        try:
+            entries = [entry for entry in os.scandir(self.raster_dir) if entry.is_dir()]
+        except OSError:
+            return {}
+
+        found = {}
+        for entry in entries:
+            mtime = entry.stat().st_mtime
+            cached = self._headers.get(entry.name)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, self._read_headers(entry.path))
+                with self._lock:
+                    self._headers[entry.name] = cached
+            found[entry.name] = cached[1]
+        return found
+
+    def _read_headers(self, path):
+        headers = {}
+        for filename in sorted(os.listdir(path)):
+            if not filename.endswith('.json'):
+                continue
+            with open(os.path.join(path, filename)) as f:
+                header = json.load(f)
+            if header.get('format_version') == RASTER_FORMAT_VERSION:
+                headers[header['step']] = header
+        return headers
+
+    def get(self, name, step):
+        """The mapped raster for one step, reopened if rewritten; None if not on disk"""
+        try:
+            mtime = os.stat(self.header_file(name, step)).st_mtime
+        except OSError:
+            self._rasters.pop((name, step), None)
+            return None
+
+        raster = self._rasters.get((name, step))
+        if raster is not None and raster.mtime == mtime:
+            return raster
+
+        with self._lock:
+            raster = self._rasters.get((name, step))
+            if raster is None or raster.mtime != mtime:
+                with open(self.header_file(name, step)) as f:
+                    header = json.load(f)
+                data = np.load(self.data_file(name, step), mmap_mode='r', allow_pickle=False)
+                raster = Raster(header, data, mtime)
+                self._rasters[(name, step)] = raster
+        return raster
+
+    def find(self, lats, lngs, kind, when=None):
+        """Finest raster of a kind, valid at ``when``, whose grid covers every point; None if there is none"""
+        when = time.time() if when is None else when
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        if not len(lats):
+            return None
+
+        candidates = [
+            header
+            for steps in self.headers().values()
+            for header in steps.values()
+            if header['kind'] == kind and header['valid_from'] <= when < header['valid_until']
+            and header['bbox']['south'] <= lats.min() and lats.max() < header['bbox']['north']
+            and header['bbox']['west'] <= lngs.min() and lngs.max() < header['bbox']['east']
+        ]
+        for header in sorted(candidates, key=lambda h: h['resolution']):
+            raster = self.get(header['name'], header['step'])
+            if raster is not None and raster.covers(lats, lngs):
+                return raster
+        return None
+
+    def status(self):
+        """Rasters on disk for cache reporting"""
+        return [
+            {
+                'name': name,
+                'step': step,
+                'kind': header['kind'],
+                'shape': header['shape'],
+                'resolution': header['resolution'],
+                'valid_from': header['valid_from'],
+                'valid_until': header['valid_until'],
+                'file_size': os.path.getsize(self.data_file(name, step))
+            }
+            for name, steps in sorted(self.headers().items())
+            for step, header in steps.items()
+        ]
+
+    def invalidate(self):
+        with self._lock:
+            self._headers.clear()
+            self._rasters.clear()
+
+
+def write_raster(store, name, step, grid, field, ice_detector, kind, valid_from, valid_until,
+                 tile_size=DEFAULT_TILE_SIZE, **meta):
+    """Score every cell of a grid tile by tile and save it as one raster step; returns its header"""
+    os.makedirs(os.path.join(store.raster_dir, name), exist_ok=True)
+    data_file = store.data_file(name, step)
+    data_tmp = data_file + '.tmp'
+    data = np.lib.format.open_memmap(data_tmp, mode='w+', dtype=np.int16, shape=(len(BANDS),) + grid.shape)
+
+    for r0, r1, c0, c1 in grid.tiles(tile_size):
+        lats, lngs = grid.cell_centers(r0, r1, c0, c1)
+        bands = score_cells(field(lats, lngs), lats, lngs, ice_detector)
+        for i, band in enumerate(BANDS):
+            data[i, r0:r1, c0:c1] = quantize(bands[band], BAND_SCALES[band]).reshape(r1 - r0, c1 - c0)
+    data.flush()
+    del data
+    os.replace(data_tmp, data_file)
+
+    header = {
+        'format_version': RASTER_FORMAT_VERSION,
+        'name': name,
+        'step': step,
+        'kind': kind,
+        'bbox': grid.bbox(),
+        'resolution': grid.resolution,
+        'shape': [len(BANDS), grid.rows, grid.cols],
+        'dtype': 'int16',
+        'nodata': int(NODATA),
+        'bands': BANDS,
+        'scales': BAND_SCALES,
+        'route_type': RASTER_ROUTE_TYPE,
+        'valid_from': valid_from,
+        'valid_until': valid_until,
+        'created': time.time(),
+        **meta
+    }
+    # Array first, header last: the header marks a complete step
+    header_file = store.header_file(name, step)
+    with open(header_file + '.tmp', 'w') as f:
+        json.dump(header, f, indent=1)
+    os.replace(header_file + '.tmp', header_file)
+    return header
+
+
+def build_corridor_rasters(historical_service, store, route_key, resolution, dates=None,
+                           tile_size=DEFAULT_TILE_SIZE):
+    """One raster per historical day of a demo corridor over its bbox, from its station-days"""
+    corridor = historical_service.load_or_fetch_historical_data(route_key)
+    if corridor is None or not corridor.n_stations:
+        raise ValueError(f"No weather stations for corridor {route_key}")
+
+    table = historical_service.day_table(corridor)
+    grid = RasterGrid.from_bbox(historical_service.demo_routes[route_key]['bbox'], resolution)
+    days = corridor.dates.astype('datetime64[D]').astype(str)
+    headers = []
+
+    for d, date in enumerate(days):
+        if dates and date not in dates:
+            continue
+        stations = np.flatnonzero(corridor.day_counts > d)
+        if not len(stations):
+            continue
+        field = StationField(
+            corridor.lats[stations], corridor.lngs[stations],
+            {name: table[name][stations, d] for name in FIELD_VARIABLES},
+            max_distance=historical_service.max_station_distance
+        )
+        valid_from = datetime.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp()
+        headers.append(write_raster(
+            store, route_key, date, grid, field, historical_service.ice_detector,
+            'historical', valid_from, valid_from + 86400, tile_size=tile_size, date=date
+        ))
+        print(f"🧊 {route_key} {date}: {grid.rows}x{grid.cols} cells")
+    return headers
+
+
+def build_current_raster(weather_service, store, name, bbox, resolution, lattice_step, bucket_seconds,
+                         tile_size=DEFAULT_TILE_SIZE):
+    """Raster of current conditions over a bbox, interpolated from a lattice of Open-Meteo points"""
+    grid = RasterGrid.from_bbox(bbox, resolution)
+
+    # Lattice one step past the box on every side, so edge cells interpolate instead of clamping
+    south = grid.south - lattice_step
+    west = grid.west - lattice_step
+    ny = int(np.ceil((grid.north - south) / lattice_step)) + 2
+    nx = int(np.ceil((grid.east - west) / lattice_step)) + 2
+    lattice_lats = south + np.arange(ny) * lattice_step
+    lattice_lngs = west + np.arange(nx) * lattice_step
+    points = [{'lat': float(lat), 'lng': float(lng)} for lat in lattice_lats for lng in lattice_lngs]
+
+    print(f"🌐 Fetching current weather for {len(points)} lattice points")
+    weathers = weather_service._fetch_current_weather_batch(points)
+    field = LatticeField(south, west, lattice_step, {
+        variable: np.array([w[variable] for w in weathers], dtype=np.float64).reshape(ny, nx)
+        for variable in FIELD_VARIABLES
+    })
+
+    valid_from = time.time() // bucket_seconds * bucket_seconds
+    step = datetime.fromtimestamp(valid_from, timezone.utc).strftime('%Y%m%dT%H%MZ')
+    header = write_raster(
+        store, name, step, grid, field, weather_service.ice_detector,
+        'current', valid_from, valid_from + bucket_seconds, tile_size=tile_size, lattice_step=lattice_step
+    )
+    print(f"🧊 {name} {step}: {grid.rows}x{grid.cols} cells")
+    return header
+
+
+def parse_bbox(text):
+    north, south, east, west = (float(value) for value in text.split(','))
+    return {'north': north, 'south': south, 'east': east, 'west': west}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build gridded ice-risk rasters')
+    parser.add_argument('--resolution', type=float, default=0.01, help='cell size in degrees')
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE, help='cells per tile side')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    corridor = commands.add_parser('corridor', help='one raster per historical day of a demo corridor')
+    corridor.add_argument('route_key')
+    corridor.add_argument('--date', action='append', help='only this day (YYYY-MM-DD); repeatable')
+
+    current = commands.add_parser('current', help='current conditions over a bounding box')
+    current.add_argument('--bbox', help='north,south,east,west; defaults to the named corridor bbox')
+    current.add_argument('--name', required=True)
+    current.add_argument('--lattice-step', type=float, default=0.25,
+                         help='spacing of Open-Meteo sample points in degrees')
+    args = parser.parse_args(argv)
+
+    # The app owns the weather services the jobs read from; import it only when a job runs
+    import app as icyroute
+    from upstream import UpstreamPool
+
+    settings = icyroute.load_config()
+    upstream_pool = UpstreamPool(max_workers=settings['UPSTREAM_MAX_WORKERS'])
+    historical_service = icyroute.HistoricalWeatherService(upstream_pool, settings=settings)
+    store = RasterStore(settings['RASTER_DIR'])
+    started = time.perf_counter()
+
+    try:
+        if args.command == 'corridor':
+            headers = build_corridor_rasters(
+                historical_service, store, args.route_key, args.resolution, args.date, args.tile_size
+            )
+        else:
+            bbox = parse_bbox(args.bbox) if args.bbox else historical_service.demo_routes[args.name]['bbox']
+            weather_service = icyroute.WeatherService(
+                None, historical_service=historical_service, ice_detector=historical_service.ice_detector,
+                settings=settings
+            )
+            headers = [build_current_raster(
+                weather_service, store, args.name, bbox, args.resolution, args.lattice_step,
+                settings['WEATHER_TILE_BUCKET_SECONDS'], args.tile_size
+            )]
+    finally:
+        historical_service.close()
+        upstream_pool.shutdown()
+
+    cells = sum(h['shape'][1] * h['shape'][2] for h in headers)
+    print(f"✅ Wrote {len(headers)} rasters, {cells} cells in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
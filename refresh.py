@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+
+class RefreshScheduler:
+    """In-process background refresher for the weather the app serves most.
+
+    Every run it builds a queue from what users actually request:
+
+    * corridors, hottest first, that are not resident in the station store.
+      Mapping one from disk is free; fetching a missing one from the archive
+      costs one upstream request.
+    * grid cells of the current-weather tile cache that are hot and whose
+      entry is missing or expires within ``lead_seconds``, in batches that
+      cost one Open-Meteo request each.
+
+    Work is taken off the queue until ``budget_per_run`` upstream requests
+    have been spent; the rest waits for the next run. Access counts decay
+    after every run so the hot set follows current traffic.
+    """
+
+    def __init__(self, engine, interval_seconds=300, budget_per_run=10, lead_seconds=360,
+                 max_cells=500, batch_size=100, decay=0.5):
+        self.engine = engine
+        self.interval_seconds = interval_seconds
+        self.budget_per_run = budget_per_run
+        self.lead_seconds = lead_seconds
+        self.max_cells = max_cells
+        self.batch_size = batch_size
+        self.decay = decay
+        self.runs = 0
+        self.last_run = None
+        self.queue = []
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Run in a daemon thread: once right away, then every interval_seconds"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='weather-refresh', daemon=True)
+        self._thread.start()
+        print(f"🔁 Weather refresh scheduler started (every {self.interval_seconds}s, "
+              f"budget {self.budget_per_run} upstream requests)")
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Weather refresh run failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def plan(self):
+        """Queue of refresh tasks, most valuable first, with their upstream cost"""
+        historical_service = self.engine.historical_service
+        tile_cache = self.engine.weather_service.tile_cache
+        store = historical_service.station_store
+        resident = store.loaded()
+
+        tasks = []
+        for route_key in historical_service.demo_routes:
+            if route_key in resident:
+                continue
+            on_disk = os.path.exists(store.header_file(route_key)) or os.path.exists(store.legacy_file(route_key))
+            tasks.append({
+                'kind': 'corridor',
+                'key': route_key,
+                'score': round(historical_service.hot_corridors.score(route_key), 3),
+                'cost': 0 if on_disk else 1
+            })
+        tasks.sort(key=lambda task: (task['cost'], -task['score']))
+
+        hot = tile_cache.hot_cells.top(self.max_cells)
+        scores = dict(hot)
+        due = tile_cache.due_cells([cell for cell, _ in hot], self.lead_seconds)
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            tasks.append({
+                'kind': 'cells',
+                'key': f"{len(batch)} cells",
+                'cells': batch,
+                'score': round(sum(scores[cell] for cell in batch), 3),
+                'cost': 1
+            })
+        return tasks
+
+    def run_once(self):
+        """Plan and execute one refresh run within the upstream budget"""
+        with self._run_lock:
+            started = time.time()
+            tasks = self.plan()
+            budget = self.budget_per_run
+            summary = {
+                'started_at': datetime.fromtimestamp(started).isoformat(),
+                'corridors_loaded': 0,
+                'cells_refreshed': 0,
+                'upstream_requests': 0,
+                'deferred': 0,
+                'errors': []
+            }
+
+            corridors = []
+            for task in tasks:
+                if task['cost'] > budget:
+                    task['status'] = 'deferred'
+                    summary['deferred'] += 1
+                    continue
+                budget -= task['cost']
+                summary['upstream_requests'] += task['cost']
+                task['status'] = 'scheduled'
+                if task['kind'] == 'corridor':
+                    corridors.append(task)
+
+            # Corridors load concurrently; they are independent of each other
+            if corridors:
+                results = self.engine.upstream_pool.map(
+                    None,
+                    lambda task: self.engine.historical_service.load_or_fetch_historical_data(task['key']),
+                    corridors,
+                    return_exceptions=True
+                )
+                for task, result in zip(corridors, results):
+                    self._finish(task, result, summary)
+                    if task['status'] == 'done':
+                        summary['corridors_loaded'] += 1
+
+            weather_service = self.engine.weather_service
+            for task in tasks:
+                if task['kind'] != 'cells' or task['status'] != 'scheduled':
+                    continue
+                try:
+                    refreshed = weather_service.tile_cache.refresh_cells(
+                        task['cells'], weather_service._fetch_current_weather_batch, self.lead_seconds
+                    )
+                    summary['cells_refreshed'] += refreshed
+                    self._finish(task, refreshed, summary)
+                except Exception as e:
+                    self._finish(task, e, summary)
+
+            self.engine.historical_service.hot_corridors.decay(self.decay)
+            weather_service.tile_cache.hot_cells.decay(self.decay)
+
+            summary['duration_ms'] = round((time.time() - started) * 1000, 1)
+            self.queue = [{k: v for k, v in task.items() if k != 'cells'} for task in tasks]
+            self.last_run = summary
+            self.runs += 1
+            return summary
+
+    def _finish(self, task, result, summary):
+        if isinstance(result, Exception):
+            task['status'] = 'failed'
+            summary['errors'].append(f"{task['kind']} {task['key']}: {result}")
+        else:
+            task['status'] = 'done'
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'interval_seconds': self.interval_seconds,
+            'budget_per_run': self.budget_per_run,
+            'lead_seconds': self.lead_seconds,
+            'runs': self.runs,
+            'queue': self.queue,
+            'pending': sum(1 for task in self.queue if task.get('status') == 'deferred'),
+            'hot_corridors': [
+                {'route': key, 'score': round(score, 3)}
+                for key, score in self.engine.historical_service.hot_corridors.top(10)
+            ],
+            'hot_cells': len(self.engine.weather_service.tile_cache.hot_cells),
+            'last_run': self.last_run
+        }
@@ -2,7 +2,6 @@
 // Google Maps Platform Awards Submission
 
 let map;
-let directionsService;
 let routeDisplays = [];
 let currentRoutes = [];
 let markers = [];
@@ -10,6 +9,9 @@ let weatherMarkers = [];
 let routeMarkers = [];
 let isSatelliteView = false;
 
+// Routes received so far from a streamed /api/routes request
+let streamedRoutes = [];
+
 // Enhanced risk level colors with gradients
 const RISK_COLORS = {
     'minimal': '#2ecc71',
@@ -50,7 +52,6 @@ function initMap() {
         ]
     });
 
-    directionsService = new google.maps.DirectionsService();
     loadDemo('Minneapolis, MN', 'Duluth, MN');
 }
 
@@ -76,25 +77,21 @@ document.addEventListener('DOMContentLoaded', function() {
         };
 
         clearAllRoutes();
+        streamedRoutes = [];
         document.getElementById('loading').style.display = 'block';
         document.getElementById('results').style.display = 'none';
         document.getElementById('legend').style.display = 'none';
 
         try {
-            const response = await fetch('/api/routes', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(formData)
-            });
-
-            const data = await response.json();
-            
-            if (data.error) {
-                throw new Error(data.error);
-            }
-
-            displayResults(data);
-            displayRoutesOnMap(data.routes, formData.origin, formData.destination);
+            // Draw each route as soon as it is scored, then replace them with the final ranking
+            await fetchRoutesStreaming(
+                formData,
+                route => displayStreamedRoute(route, formData.origin, formData.destination),
+                data => {
+                    displayResults(data);
+                    displayRoutesOnMap(data.routes, formData.origin, formData.destination);
+                }
+            );
         } catch (error) {
             console.error('Error:', error);
             displayError(error.message);
@@ -104,6 +101,114 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Read the NDJSON stream from /api/routes/stream, one event per line
+async function fetchRoutesStreaming(formData, onRoute, onResult) {
+    const response = await fetch('/api/routes/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...formData, format: 'compact' })
+    });
+
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.error || `Request failed with status ${response.status}`);
+    }
+
+    const handleLine = line => {
+        if (!line.trim()) return;
+        const event = JSON.parse(line);
+        if (event.type === 'route') {
+            onRoute(decodeCompactRoute(event.route));
+        } else if (event.type === 'result') {
+            event.routes = (event.routes || []).map(decodeCompactRoute);
+            onResult(event);
+        } else if (event.type === 'error') {
+            throw new Error(event.error);
+        }
+    };
+
+    if (!response.body || !response.body.getReader) {
+        // No streaming support: handle the whole body at once
+        (await response.text()).split('\n').forEach(handleLine);
+        return;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(handleLine);
+    }
+    handleLine(buffer + decoder.decode());
+}
+
+// Expand a compact route's weather_columns back into the weather_points list
+function decodeCompactRoute(route) {
+    if (!route.weather_columns) return route;
+
+    const encoded = route.weather_columns;
+    const columns = { ...encoded.columns };
+    (encoded.delta || []).forEach(name => {
+        let total = 0;
+        columns[name] = columns[name].map(delta => (total += delta));
+    });
+    Object.entries(encoded.scales).forEach(([name, scale]) => {
+        columns[name] = columns[name].map(code => (code === null ? null : code / scale));
+    });
+    Object.entries(encoded.enums).forEach(([name, table]) => {
+        columns[name] = columns[name].map(code => table[code]);
+    });
+
+    const weatherFields = ['temp', 'feels_like', 'humidity', 'precipitation', 'snowfall', 'rain',
+                           'wind_speed', 'visibility', 'description'];
+    const weatherPoints = [];
+    for (let i = 0; i < encoded.n; i++) {
+        const weather = {};
+        weatherFields.forEach(name => {
+            if (columns[name]) weather[name] = columns[name][i];
+        });
+        const point = {
+            location: { lat: columns.lat[i], lng: columns.lng[i] },
+            weather: weather,
+            ice_risk: columns.ice_risk[i],
+            segment_index: columns.segment_index[i],
+            route_type: columns.route_type[i],
+            data_source: columns.data_source[i]
+        };
+        if (columns.eta) point.eta = columns.eta[i];
+        weatherPoints.push(point);
+    }
+
+    const decoded = { ...route, weather_points: weatherPoints };
+    delete decoded.weather_columns;
+    return decoded;
+}
+
+// Show a scored route before the final ranking arrives
+function displayStreamedRoute(route, origin, destination) {
+    const index = streamedRoutes.length;
+    streamedRoutes.push(route);
+    currentRoutes = streamedRoutes;
+
+    if (index === 0) {
+        addLocationMarkers(origin, destination);
+        document.getElementById('routesList').innerHTML = '';
+        document.getElementById('results').style.display = 'block';
+        document.getElementById('legend').style.display = 'block';
+        document.getElementById('loading').style.display = 'none';
+    }
+
+    document.getElementById('routesList').appendChild(createEnhancedRouteCard(route, index));
+    drawRoute(route, index);
+}
+
 function displayResults(data) {
     const resultsDiv = document.getElementById('results');
     const routesList = document.getElementById('routesList');
@@ -210,105 +315,60 @@ function displayRoutesOnMap(routes, origin, destination) {
     clearAllRoutes();
     addLocationMarkers(origin, destination);
 
-    // Process routes sequentially to ensure proper marker placement
-    processRoutesSequentially(routes, origin, destination, 0);
+    // Every route carries its own path, so all overlays are drawn in one pass
+    routes.forEach((route, index) => drawRoute(route, index));
+    fitMapToRoutes();
 }
 
-function processRoutesSequentially(routes, origin, destination, routeIndex) {
-    if (routeIndex >= routes.length) {
-        // All routes processed, now fit map
-        setTimeout(fitMapToRoutes, 1000);
+// Path for a route: the server's detailed road geometry, or the Directions overview polyline
+function getRoutePath(route) {
+    const encoded = route.path_polyline || route.polyline;
+    return encoded ? google.maps.geometry.encoding.decodePath(encoded) : [];
+}
+
+// Draw one route and its markers from the geometry sent by the server
+function drawRoute(route, routeIndex) {
+    const path = getRoutePath(route);
+    if (path.length === 0) {
+        console.warn(`Route ${routeIndex} has no geometry to draw`);
         return;
     }
 
-    const route = routes[routeIndex];
-    
-    // Get directions for this specific route
-    const routeOptions = getRouteOptions(route, routeIndex);
-    
-    directionsService.route({
-        origin: origin,
-        destination: destination,
-        travelMode: google.maps.TravelMode.DRIVING,
-        provideRouteAlternatives: true,
-        ...routeOptions
-    }, (response, status) => {
-        if (status === 'OK') {
-            // Use the best matching route from Google's response
-            const googleRouteIndex = Math.min(routeIndex, response.routes.length - 1);
-            createRouteRenderer(route, routeIndex, response, googleRouteIndex);
-            
-            // Add markers based on the actual Google route path
-            addMarkersAlongRoute(route, routeIndex, response.routes[googleRouteIndex]);
-        } else {
-            console.error(`Route ${routeIndex} failed:`, status);
-        }
-        
-        // Process next route
-        processRoutesSequentially(routes, origin, destination, routeIndex + 1);
-    });
+    createRoutePolyline(route, routeIndex, path);
+    addMarkersAlongRoute(route, routeIndex, path);
 }
 
-function createRouteRenderer(route, index, googleResponse, googleRouteIndex) {
+function createRoutePolyline(route, index, path) {
     const color = RISK_COLORS[route.risk_level];
     const strokeWeight = getStrokeWeight(route, index);
     const strokePattern = getStrokePattern(route, index);
     
-    const directionsRenderer = new google.maps.DirectionsRenderer({
+    const polyline = new google.maps.Polyline({
         map: map,
-        polylineOptions: {
-            strokeColor: color,
-            strokeWeight: strokeWeight,
-            strokeOpacity: 0.9,
-            zIndex: 1000 - index,
-            ...strokePattern
-        },
-        suppressMarkers: true,
-        preserveViewport: true
+        path: path,
+        strokeColor: color,
+        strokeWeight: strokeWeight,
+        strokeOpacity: 0.9,
+        zIndex: 1000 - index,
+        ...strokePattern
     });
-
-    try {
-        directionsRenderer.setDirections(googleResponse);
-        directionsRenderer.setRouteIndex(googleRouteIndex);
-    } catch (error) {
-        console.warn(`Error setting route ${index}:`, error);
-        return;
-    }
     
     routeDisplays.push({
-        renderer: directionsRenderer,
+        polyline: polyline,
         visible: true,
         route: route,
         index: index,
-        googleRoute: googleResponse.routes[googleRouteIndex]
+        path: path
     });
 }
 
-// FIXED: New function to add markers along the actual Google route path
-function addMarkersAlongRoute(route, routeIndex, googleRoute) {
-    if (!googleRoute || !route.weather_points) return;
-    
-    const routePath = [];
-    
-    // Extract all points from the Google route
-    googleRoute.legs.forEach(leg => {
-        leg.steps.forEach(step => {
-            if (step.path) {
-                routePath.push(...step.path);
-            } else {
-                // Fallback: use start and end points
-                routePath.push(step.start_location);
-                routePath.push(step.end_location);
-            }
-        });
-    });
+// Add the route identifier and weather markers along the drawn route path
+function addMarkersAlongRoute(route, routeIndex, routePath) {
+    if (!route.weather_points || routePath.length === 0) return;
 
     // Add route identifier marker at midpoint
-    if (routePath.length > 0) {
-        const midIndex = Math.floor(routePath.length / 2);
-        const midPoint = routePath[midIndex];
-        addRouteIdentifierMarker(route, routeIndex, midPoint);
-    }
+    const midIndex = Math.floor(routePath.length / 2);
+    addRouteIdentifierMarker(route, routeIndex, routePath[midIndex]);
 
     // Add weather markers along the route path
     addWeatherMarkersOnRoute(route, routeIndex, routePath);
@@ -458,28 +518,6 @@ function calculateDistance(lat1, lng1, lat2, lng2) {
     return R * c;
 }
 
-function getRouteOptions(route, index) {
-    // Create different routing options based on route type and index
-    const options = {};
-    
-    if (route.route_type === 'highway' || route.summary.includes('Highway')) {
-        options.avoidTolls = false;
-        options.avoidHighways = false;
-    } else if (route.route_type === 'local' || route.summary.includes('Local')) {
-        options.avoidHighways = true;
-        options.avoidTolls = true;
-    } else {
-        // Alternate between different options for variation
-        if (index % 2 === 0) {
-            options.avoidTolls = true;
-        } else {
-            options.avoidHighways = false;
-        }
-    }
-    
-    return options;
-}
-
 function getStrokeWeight(route, index) {
     // Vary stroke weight by risk level and route index
     let baseWeight = route.risk_level === 'high' ? 8 : 
@@ -615,9 +653,9 @@ function focusRoute(index) {
     
     // Hide ALL other routes first
     routeDisplays.forEach((display, i) => {
-        if (display.renderer) {
+        if (display.polyline) {
             if (i !== index) {
-                display.renderer.setMap(null);
+                display.polyline.setMap(null);
                 display.visible = false;
             }
         }
@@ -625,22 +663,20 @@ function focusRoute(index) {
 
     // Ensure the selected route is visible and highlighted
     const selectedDisplay = routeDisplays[index];
-    if (selectedDisplay && selectedDisplay.renderer) {
+    if (selectedDisplay && selectedDisplay.polyline) {
         // Make sure it's visible
-        selectedDisplay.renderer.setMap(map);
+        selectedDisplay.polyline.setMap(map);
         selectedDisplay.visible = true;
         
         // Enhance the focused route appearance
         const route = selectedDisplay.route;
         const color = RISK_COLORS[route.risk_level];
         
-        selectedDisplay.renderer.setOptions({
-            polylineOptions: {
-                strokeColor: color,
-                strokeWeight: 12,
-                strokeOpacity: 1.0,
-                zIndex: 2000
-            }
+        selectedDisplay.polyline.setOptions({
+            strokeColor: color,
+            strokeWeight: 12,
+            strokeOpacity: 1.0,
+            zIndex: 2000
         });
 
         console.log(`Route ${index + 1} is now visible and highlighted`);
@@ -664,7 +700,7 @@ function focusRoute(index) {
 
     // Fit map to the focused route
     setTimeout(() => {
-        fitMapToSingleRoute(selectedDisplay.renderer);
+        fitMapToSingleRoute(selectedDisplay.polyline);
     }, 100);
 }
 
@@ -693,7 +729,7 @@ function updateCardVisibility() {
 }
 
 function fitMapToRoutes() {
-    const visibleDisplays = routeDisplays.filter(d => d.visible && d.renderer);
+    const visibleDisplays = routeDisplays.filter(d => d.visible && d.polyline);
     
     if (visibleDisplays.length === 0) {
         console.warn('No visible routes to fit map to');
@@ -701,46 +737,43 @@ function fitMapToRoutes() {
     }
 
     const bounds = new google.maps.LatLngBounds();
-    let boundsExtended = false;
-
     visibleDisplays.forEach(display => {
-        try {
-            if (display.renderer.getDirections()) {
-                const route = display.renderer.getDirections().routes[0];
-                route.legs.forEach(leg => {
-                    leg.steps.forEach(step => {
-                        bounds.extend(step.start_location);
-                        bounds.extend(step.end_location);
-                        boundsExtended = true;
-                    });
-                });
-            }
-        } catch (error) {
-            console.warn('Error accessing route directions:', error);
-        }
+        display.path.forEach(point => bounds.extend(point));
     });
+    fitMapToBounds(bounds);
+}
 
-    if (boundsExtended) {
-        map.fitBounds(bounds);
-        
-        google.maps.event.addListenerOnce(map, 'bounds_changed', function() {
-            const zoom = map.getZoom();
-            if (zoom > 13) {
-                map.setZoom(13);
-            }
-            if (zoom < 6) {
-                map.setZoom(6);
-            }
-        });
-    } else {
+function fitMapToSingleRoute(polyline) {
+    if (!polyline) return;
+
+    const bounds = new google.maps.LatLngBounds();
+    polyline.getPath().forEach(point => bounds.extend(point));
+    fitMapToBounds(bounds);
+}
+
+function fitMapToBounds(bounds) {
+    if (bounds.isEmpty()) {
         console.warn('Could not extend bounds for any routes');
+        return;
     }
+
+    map.fitBounds(bounds);
+    
+    google.maps.event.addListenerOnce(map, 'bounds_changed', function() {
+        const zoom = map.getZoom();
+        if (zoom > 13) {
+            map.setZoom(13);
+        }
+        if (zoom < 6) {
+            map.setZoom(6);
+        }
+    });
 }
 
 function clearAllRoutes() {
     routeDisplays.forEach(display => {
-        if (display.renderer) {
-            display.renderer.setMap(null);
+        if (display.polyline) {
+            display.polyline.setMap(null);
         }
     });
     routeDisplays = [];
@@ -1170,8 +1203,8 @@ function showAllRoutes() {
     let visibleCount = 0;
     
     routeDisplays.forEach((display, index) => {
-        if (display.renderer) {
-            display.renderer.setMap(map);
+        if (display.polyline) {
+            display.polyline.setMap(map);
             display.visible = true;
             visibleCount++;
             
@@ -1181,14 +1214,12 @@ function showAllRoutes() {
             const strokeWeight = getStrokeWeight(route, index);
             const strokePattern = getStrokePattern(route, index);
             
-            display.renderer.setOptions({
-                polylineOptions: {
-                    strokeColor: color,
-                    strokeWeight: strokeWeight,
-                    strokeOpacity: 0.9,
-                    zIndex: 1000 - index,
-                    ...strokePattern
-                }
+            display.polyline.setOptions({
+                strokeColor: color,
+                strokeWeight: strokeWeight,
+                strokeOpacity: 0.9,
+                zIndex: 1000 - index,
+                ...strokePattern
             });
         }
     });
@@ -1210,24 +1241,22 @@ function showAllRoutes() {
 
 function ensureRouteVisible(index) {
     const display = routeDisplays[index];
-    if (display && display.renderer && !display.visible) {
+    if (display && display.polyline && !display.visible) {
         console.log(`Making route ${index + 1} visible`);
         
-        // Show the route renderer
-        display.renderer.setMap(map);
+        // Show the route polyline
+        display.polyline.setMap(map);
         display.visible = true;
         
         // Apply proper styling
         const route = display.route;
         const color = RISK_COLORS[route.risk_level];
         
-        display.renderer.setOptions({
-            polylineOptions: {
-                strokeColor: color,
-                strokeWeight: 12,
-                strokeOpacity: 1.0,
-                zIndex: 2000
-            }
+        display.polyline.setOptions({
+            strokeColor: color,
+            strokeWeight: 12,
+            strokeOpacity: 1.0,
+            zIndex: 2000
         });
     }
 }
@@ -1235,10 +1264,10 @@ function ensureRouteVisible(index) {
 function hideAllRoutes() {
     console.log('Hiding all routes');
     
-    // Hide all route renderers
+    // Hide all route polylines
     routeDisplays.forEach(display => {
-        if (display.renderer) {
-            display.renderer.setMap(null);
+        if (display.polyline) {
+            display.polyline.setMap(null);
             display.visible = false;
         }
     });
@@ -1264,16 +1293,16 @@ function hideAllRoutes() {
 
 function toggleRoute(index) {
     const display = routeDisplays[index];
-    if (!display || !display.renderer) {
+    if (!display || !display.polyline) {
         console.warn(`Route ${index} not found or not properly initialized`);
         return;
     }
 
     if (display.visible) {
-        display.renderer.setMap(null);
+        display.polyline.setMap(null);
         display.visible = false;
     } else {
-        display.renderer.setMap(map);
+        display.polyline.setMap(map);
         display.visible = true;
         
         // Apply proper styling when showing
@@ -1282,14 +1311,12 @@ function toggleRoute(index) {
         const strokeWeight = getStrokeWeight(route, index);
         const strokePattern = getStrokePattern(route, index);
         
-        display.renderer.setOptions({
-            polylineOptions: {
-                strokeColor: color,
-                strokeWeight: strokeWeight,
-                strokeOpacity: 0.9,
-                zIndex: 1000 - index,
-                ...strokePattern
-            }
+        display.polyline.setOptions({
+            strokeColor: color,
+            strokeWeight: strokeWeight,
+            strokeOpacity: 0.9,
+            zIndex: 1000 - index,
+            ...strokePattern
         });
     }
 
@@ -1361,8 +1388,8 @@ function debugRoutes() {
     routeDisplays.forEach((display, index) => {
         console.log(`Route ${index}:`, {
             visible: display.visible,
-            hasRenderer: !!display.renderer,
-            hasDirections: !!(display.renderer && display.renderer.getDirections()),
+            hasPolyline: !!display.polyline,
+            pathPoints: display.path ? display.path.length : 0,
             summary: display.route.summary,
             riskLevel: display.route.risk_level,
             weatherPoints: display.route.weather_points?.length || 0
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The app is a set of top-level modules; make them importable from the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the app offline and out of the shared cache files while tests run
+os.environ.setdefault('REFRESH_ENABLED', 'false')
+os.environ.pop('GOOGLE_MAPS_API_KEY', None)
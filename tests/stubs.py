@@ -0,0 +1,178 @@
+"""Offline stand-ins for Google Directions and Open-Meteo.
+
+Shared by the tests, benchmark.py and loadtest.py: synthetic road-like
+paths, Directions route dicts built from them, and clients that answer
+Directions and Open-Meteo requests in-process.
+"""
+import math
+import random
+import time
+
+import numpy as np
+
+# Vertex spacing of synthetic step polylines and length of each Directions step, in meters
+VERTEX_SPACING_M = 150
+STEP_LENGTH_M = 5000
+
+EARTH_RADIUS_M = 6371000
+
+
+def _offset(lat, lng, distance_m, heading_rad):
+    """Point distance_m from (lat, lng) along a heading, on a local flat-earth approximation"""
+    dlat = distance_m * math.cos(heading_rad) / EARTH_RADIUS_M
+    dlng = distance_m * math.sin(heading_rad) / (EARTH_RADIUS_M * math.cos(math.radians(lat)))
+    return lat + math.degrees(dlat), lng + math.degrees(dlng)
+
+
+def synthetic_path(length_km, start=(44.9778, -93.2650), heading_deg=20, seed=0):
+    """Road-like (n, 2) [lat, lng] path: a vertex every VERTEX_SPACING_M with a slowly wandering heading"""
+    rng = random.Random(seed)
+    n = max(2, int(length_km * 1000 / VERTEX_SPACING_M) + 1)
+    heading = math.radians(heading_deg)
+    lat, lng = start
+    coords = [(lat, lng)]
+    for _ in range(n - 1):
+        heading += rng.gauss(0, 0.03)
+        lat, lng = _offset(lat, lng, VERTEX_SPACING_M, heading)
+        coords.append((lat, lng))
+    return np.array(coords)
+
+
+def directions_route(coords, summary):
+    """Google Directions route dict for a path, split into STEP_LENGTH_M steps"""
+    import geodesy
+
+    segment = geodesy.haversine(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+    cumulative = np.concatenate(([0.0], np.cumsum(segment)))
+    total_m = float(cumulative[-1])
+    boundaries = np.searchsorted(cumulative, np.arange(0, total_m, STEP_LENGTH_M)[1:])
+    boundaries = [0] + [int(b) for b in boundaries if 0 < b < len(coords) - 1] + [len(coords) - 1]
+
+    steps = []
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        distance = float(cumulative[end] - cumulative[start])
+        steps.append({
+            'start_location': {'lat': float(coords[start, 0]), 'lng': float(coords[start, 1])},
+            'end_location': {'lat': float(coords[end, 0]), 'lng': float(coords[end, 1])},
+            'polyline': {'points': geodesy.encode_polyline(coords[start:end + 1])},
+            'distance': {'value': int(distance), 'text': f"{distance / 1000:.1f} km"},
+            'duration': {'value': int(distance / 25), 'text': f"{int(distance / 25 / 60)} mins"}
+        })
+
+    duration_s = int(total_m / 25)  # 90 km/h
+    return {
+        'summary': summary,
+        'legs': [{
+            'steps': steps,
+            'distance': {'value': int(total_m), 'text': f"{total_m / 1000:.0f} km"},
+            'duration': {'value': duration_s, 'text': f"{duration_s // 3600} hours {duration_s % 3600 // 60} mins"},
+            'start_location': steps[0]['start_location'],
+            'end_location': steps[-1]['end_location']
+        }],
+        'overview_polyline': {'points': geodesy.encode_polyline(geodesy.simplify(coords, 200))},
+        'bounds': {
+            'northeast': {'lat': float(coords[:, 0].max()), 'lng': float(coords[:, 1].max())},
+            'southwest': {'lat': float(coords[:, 0].min()), 'lng': float(coords[:, 1].min())}
+        }
+    }
+
+
+class StubDirections:
+    """googlemaps.Client stand-in serving fixed routes per (origin, destination)"""
+
+    def __init__(self, routes_by_trip):
+        self.routes_by_trip = routes_by_trip
+        self.calls = 0
+
+    def directions(self, origin, destination, **kwargs):
+        self.calls += 1
+        routes = self.routes_by_trip[(origin, destination)]
+        # Avoid options return the alternatives in a different order, as the real API often does
+        return list(reversed(routes)) if kwargs.get('avoid') else list(routes)
+
+
+class _Value:
+    def __init__(self, value):
+        self.value = value
+
+    def Value(self):
+        return self.value
+
+    def ValuesAsNumpy(self):
+        return np.array([self.value], dtype=np.float32)
+
+
+class _Block:
+    def __init__(self, values):
+        self.values = values
+
+    def Variables(self, index):
+        return _Value(self.values[index])
+
+
+class CurrentResponse:
+    """Minimal Open-Meteo current-weather response for one location"""
+
+    def __init__(self, lat, lng):
+        temp = 2.0 - (lat - 40) * 0.8 + math.sin(lng) * 3
+        self.current = _Block([temp, 82.0, 0.6, 0.4, 0.2, 6.0, 9.0])
+        self.daily = _Block([temp + 3, temp - 4])
+
+    def Current(self):
+        return self.current
+
+    def Daily(self):
+        return self.daily
+
+
+class _Series:
+    def __init__(self, values):
+        self.values = values
+
+    def ValuesAsNumpy(self):
+        return self.values
+
+
+class _HourlyBlock:
+    def __init__(self, start, series):
+        self.start = start
+        self.series = series
+
+    def Time(self):
+        return self.start
+
+    def Interval(self):
+        return 3600
+
+    def Variables(self, index):
+        return _Series(self.series[index])
+
+
+class HourlyResponse:
+    """Minimal Open-Meteo hourly-forecast response for one location, starting this hour"""
+
+    def __init__(self, lat, lng, hours):
+        now = int(time.time())
+        hour = np.arange(hours, dtype=np.float32)
+        temp = 2.0 - (lat - 40) * 0.8 + math.sin(lng) * 3 - 0.3 * hour
+        constant = lambda value: np.full(hours, value, dtype=np.float32)
+        self.hourly = _HourlyBlock(now - now % 3600, [
+            temp, constant(82.0), constant(0.6), constant(0.4), constant(0.2), constant(6.0), temp - 4
+        ])
+
+    def Hourly(self):
+        return self.hourly
+
+
+class StubOpenMeteo:
+    """openmeteo_requests.Client stand-in answering multi-location current-weather and hourly-forecast requests"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def weather_api(self, url, params):
+        self.calls += 1
+        if 'hourly' in params:
+            return [HourlyResponse(lat, lng, params['forecast_hours'])
+                    for lat, lng in zip(params['latitude'], params['longitude'])]
+        return [CurrentResponse(lat, lng) for lat, lng in zip(params['latitude'], params['longitude'])]
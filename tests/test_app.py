@@ -0,0 +1,55 @@
+import pytest
+
+import app
+from tests.stubs import StubDirections
+
+
+@pytest.fixture
+def apps(tmp_path):
+    created = [
+        app.create_app({
+            'GOOGLE_MAPS_CLIENT': StubDirections({}),
+            'OPENMETEO_CACHE_FILE': str(tmp_path / f"openmeteo_{i}.sqlite"),
+            'RASTER_DIR': str(tmp_path / f"rasters_{i}"),
+            'OPENMETEO_FORECAST_URL': f"http://127.0.0.1:{9000 + i}/v1/forecast",
+            'UPSTREAM_MAX_WORKERS': 2 + i,
+            'ROUTE_CACHE_TTL_SECONDS': 60 * (i + 1),
+            'REFRESH_BUDGET_PER_RUN': 3 + i
+        })
+        for i in range(2)
+    ]
+    yield created
+    for flask_app in created:
+        if flask_app.extensions['icyroute'] is not None:
+            flask_app.extensions['icyroute'].shutdown()
+
+
+def test_overrides_stay_on_their_own_app(apps):
+    first, second = apps
+
+    assert first.config['ROUTE_CACHE_TTL_SECONDS'] == 60
+    assert second.config['ROUTE_CACHE_TTL_SECONDS'] == 120
+    assert app.app.config['GOOGLE_MAPS_CLIENT'] is None
+    assert app.app.config['ROUTE_CACHE_TTL_SECONDS'] == app.ROUTE_CACHE_TTL_SECONDS
+
+
+def test_every_app_builds_its_engine_from_its_own_config(apps, tmp_path):
+    engines = [app.get_engine(flask_app) for flask_app in apps]
+
+    assert engines[0] is not engines[1]
+    assert app.get_engine(apps[0]) is engines[0]
+    for i, engine in enumerate(engines):
+        assert engine.gmaps is apps[i].config['GOOGLE_MAPS_CLIENT']
+        assert engine.upstream_pool.max_workers == 2 + i
+        assert engine.route_cache.ttl_seconds == 60 * (i + 1)
+        assert engine.refresh_scheduler.budget_per_run == 3 + i
+        assert engine.weather_service.raster_store.raster_dir == str(tmp_path / f"rasters_{i}")
+        assert engine.historical_service.forecast_url == f"http://127.0.0.1:{9000 + i}/v1/forecast"
+        assert str(engine.historical_service.cache_session.cache.db_path) == str(tmp_path / f"openmeteo_{i}.sqlite")
+
+
+def test_requests_use_the_engine_of_the_app_serving_them(apps):
+    budgets = [flask_app.test_client().get('/api/refresh-status').get_json()['budget_per_run'] for flask_app in apps]
+
+    assert budgets == [3, 4]
+    assert apps[0].extensions['icyroute'] is not apps[1].extensions['icyroute']
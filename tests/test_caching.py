@@ -0,0 +1,249 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from caching import RouteResultCache, WeatherTileCache, normalize_location
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Fetcher:
+    """fetch_batch stand-in that records every batch and numbers its results"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, points):
+        self.batches.append(points)
+        return [{'temp': float(len(self.batches)), 'precipitation': 0.5, 'lat': p['lat']} for p in points]
+
+
+@pytest.fixture
+def clock():
+    # Start at the beginning of an hour bucket so TTLs expire before the bucket rolls over
+    return Clock(3600.0 * 500)
+
+
+@pytest.fixture
+def tile_cache(clock):
+    return WeatherTileCache(resolution=0.1, time_bucket_seconds=3600, ttl_seconds=600, clock=clock)
+
+
+def test_points_in_one_cell_share_a_single_fetch_at_the_cell_centre(tile_cache):
+    fetch = Fetcher()
+    weathers = tile_cache.get_many([{'lat': 45.01, 'lng': -93.01}, {'lat': 45.09, 'lng': -93.09}], fetch)
+
+    assert len(fetch.batches) == 1
+    assert fetch.batches[0] == [{'lat': pytest.approx(45.05), 'lng': pytest.approx(-93.05)}]
+    assert weathers[0] == weathers[1]
+    assert tile_cache.stats()['misses'] == 1
+
+
+def test_entries_are_served_until_the_ttl_then_refetched(tile_cache, clock):
+    fetch = Fetcher()
+    point = [{'lat': 45.0, 'lng': -93.0}]
+    first = tile_cache.get_many(point, fetch)
+
+    clock.now += 599
+    assert tile_cache.get_many(point, fetch) == first
+    assert len(fetch.batches) == 1
+
+    clock.now += 1
+    refetched = tile_cache.get_many(point, fetch)
+    assert len(fetch.batches) == 2
+    assert refetched[0]['temp'] == 2.0
+    # Every variable expires together; no stale value survives the refetch
+    assert set(refetched[0]) == set(first[0])
+
+
+def test_a_new_time_bucket_is_a_miss_even_within_the_ttl(clock):
+    cache = WeatherTileCache(time_bucket_seconds=3600, ttl_seconds=1800, clock=clock)
+    fetch = Fetcher()
+    point = [{'lat': 45.0, 'lng': -93.0}]
+
+    clock.now = 3600.0 * 500 + 3500
+    cache.get_many(point, fetch)
+    clock.now += 200
+    cache.get_many(point, fetch)
+    assert len(fetch.batches) == 2
+
+
+def test_returned_weather_is_a_copy(tile_cache):
+    fetch = Fetcher()
+    point = [{'lat': 45.0, 'lng': -93.0}]
+    tile_cache.get_many(point, fetch)[0]['temp'] = -99
+    assert tile_cache.get_many(point, fetch)[0]['temp'] == 1.0
+
+
+def test_failed_fetches_are_not_cached(tile_cache):
+    def failing(points):
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        tile_cache.get_many([{'lat': 45.0, 'lng': -93.0}], failing)
+
+    fetch = Fetcher()
+    tile_cache.get_many([{'lat': 45.0, 'lng': -93.0}], fetch)
+    assert len(fetch.batches) == 1
+
+
+def test_lru_bound_evicts_the_oldest_cell(clock):
+    cache = WeatherTileCache(max_entries=2, clock=clock)
+    fetch = Fetcher()
+    for lat in (44.0, 45.0, 46.0):
+        cache.get_many([{'lat': lat, 'lng': -93.0}], fetch)
+
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 1
+    cache.get_many([{'lat': 44.0, 'lng': -93.0}], fetch)
+    assert len(fetch.batches) == 4
+
+
+def test_due_cells_reports_missing_and_soon_expiring_cells(tile_cache, clock):
+    fetch = Fetcher()
+    tile_cache.get_many([{'lat': 45.0, 'lng': -93.0}], fetch)
+    cached = tile_cache.cell_key(45.0, -93.0)[:2]
+    missing = tile_cache.cell_key(46.0, -93.0)[:2]
+
+    assert tile_cache.due_cells([cached, missing], lead_seconds=300) == [missing]
+    clock.now += 400
+    assert tile_cache.due_cells([cached, missing], lead_seconds=300) == [cached, missing]
+
+
+def test_refresh_cells_fills_the_current_and_upcoming_bucket(tile_cache, clock):
+    fetch = Fetcher()
+    cell = tile_cache.cell_key(45.0, -93.0)[:2]
+    clock.now += 3400
+    assert tile_cache.refresh_cells([cell], fetch, lead_seconds=300) == 1
+
+    tile_cache.get_many([{'lat': 45.0, 'lng': -93.0}], fetch)
+    clock.now += 250   # next bucket, still within the TTL of the refreshed entry
+    tile_cache.get_many([{'lat': 45.0, 'lng': -93.0}], fetch)
+    assert len(fetch.batches) == 1
+
+
+def test_route_keys_ignore_case_punctuation_and_spacing():
+    cache = RouteResultCache()
+    assert normalize_location('  Minneapolis,  MN ') == 'minneapolis mn'
+    assert cache.key('Minneapolis, MN', 'DULUTH MN', True, 'e1') == cache.key('minneapolis mn', 'duluth, mn', 1, 'e1')
+    assert cache.key('Minneapolis', 'Duluth', True, 'e1') != cache.key('Minneapolis', 'Duluth', True, 'e2')
+
+
+def test_route_results_expire_after_the_ttl(clock):
+    cache = RouteResultCache(ttl_seconds=600, clock=clock)
+    key = cache.key('Minneapolis', 'Duluth', False, 'e1')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [{'route_index': len(calls)}]
+
+    assert cache.get_or_compute(key, compute) == ([{'route_index': 1}], False)
+    clock.now += 599
+    assert cache.get_or_compute(key, compute) == ([{'route_index': 1}], True)
+    clock.now += 1
+    assert cache.lookup(key) is None
+    assert cache.get_or_compute(key, compute) == ([{'route_index': 2}], False)
+    assert cache.stats()['hits'] == 1
+
+
+def test_empty_route_results_are_not_cached(clock):
+    cache = RouteResultCache(clock=clock)
+    key = cache.key('Nowhere', 'Elsewhere', False, 'e1')
+    cache.get_or_compute(key, lambda: [])
+    assert cache.lookup(key) is None
+
+
+def test_route_cache_evicts_least_recently_used(clock):
+    cache = RouteResultCache(max_entries=2, clock=clock)
+    keys = [cache.key(f'origin {i}', 'destination', False, 'e1') for i in range(3)]
+    cache.store(keys[0], ['a'])
+    cache.store(keys[1], ['b'])
+    cache.lookup(keys[0])
+    cache.store(keys[2], ['c'])
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[0]) == ['a']
+
+
+def replay(routes):
+    for route in routes:
+        yield 'route', route
+    yield 'ranked', routes
+
+
+class StreamedCompute:
+    """Route stream stand-in: one route event, then the ranked set"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        yield 'route', {'route_index': 0}
+        yield 'ranked', [{'route_index': 0}]
+
+    async def stream(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        yield 'route', {'route_index': 0}
+        yield 'ranked', [{'route_index': 0}]
+
+
+def test_concurrent_streamed_misses_score_once_and_replay(clock):
+    cache = RouteResultCache(clock=clock)
+    key = cache.key('Minneapolis', 'Duluth', False, 'e1')
+    compute = StreamedCompute()
+    expected = [('route', {'route_index': 0}), ('ranked', [{'route_index': 0}])]
+
+    leader = cache.stream_or_compute(key, compute, replay)
+    assert next(leader) == expected[0]
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        follower = pool.submit(lambda: list(cache.stream_or_compute(key, compute, replay)))
+        while cache.stats()['coalesced'] == 0:
+            time.sleep(0.001)
+        assert list(leader) == expected[1:]
+        assert follower.result(timeout=5) == expected
+
+    assert compute.calls == 1
+    assert list(cache.stream_or_compute(key, compute, replay)) == expected
+    assert cache.stats()['hits'] == 1 and cache.stats()['in_flight'] == 0
+
+
+def test_an_abandoned_streamed_miss_is_not_cached(clock):
+    cache = RouteResultCache(clock=clock)
+    key = cache.key('Minneapolis', 'Duluth', False, 'e1')
+    compute = StreamedCompute()
+
+    leader = cache.stream_or_compute(key, compute, replay)
+    next(leader)
+    leader.close()
+
+    assert cache.lookup(key) is None
+    assert list(cache.stream_or_compute(key, compute, replay))[-1] == ('ranked', [{'route_index': 0}])
+    assert compute.calls == 2
+
+
+def test_async_streamed_misses_share_one_computation(clock):
+    cache = RouteResultCache(clock=clock)
+    key = cache.key('Minneapolis', 'Duluth', False, 'e1')
+    compute = StreamedCompute()
+
+    async def consume():
+        return [event async for event in cache.astream_or_compute(key, compute.stream, replay)]
+
+    async def both():
+        return await asyncio.gather(consume(), consume())
+
+    first, second = asyncio.run(both())
+
+    assert first == second == [('route', {'route_index': 0}), ('ranked', [{'route_index': 0}])]
+    assert compute.calls == 1
+    assert cache.stats()['coalesced'] == 1
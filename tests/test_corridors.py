@@ -0,0 +1,13 @@
+import numpy as np
+
+from corridors import DEMO_CORRIDORS, CorridorRegistry
+
+
+def test_registry_matches_geometry():
+    registry = CorridorRegistry(DEMO_CORRIDORS)
+    path = np.array(DEMO_CORRIDORS['minneapolis_duluth']['path'])
+
+    assert registry.match_geometry(path) == 'minneapolis_duluth'
+    # Same endpoints, but a detour far outside the buffer
+    detour = np.vstack([path[:1], np.full((10, 2), (45.9, -95.5)), path[-1:]])
+    assert registry.match_geometry(detour) is None
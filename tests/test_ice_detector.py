@@ -0,0 +1,106 @@
+import math
+
+import numpy as np
+import pytest
+
+from app import IceDetector
+
+ROUTE_TYPES = ['highway', 'arterial', 'local', 'scenic', 'unknown']
+CONTEXTS = [None, 'Minneapolis to Duluth', 'scenic county mountain pass', 'interstate highway']
+
+# Every threshold the scalar scoring branches on
+TEMP_EDGES = [-15, -8, -3, 1, 2, 4, 5, 10, 15]
+HUMIDITY_EDGES = [70, 85]
+PRECIPITATION_EDGES = [0.2, 1]
+SNOWFALL_EDGES = [0.5, 2]
+WIND_EDGES = [15, 25]
+
+BRIDGES = [(44.98, -93.25), (46.78, -92.10), (42.88, -78.87)]
+
+
+def around(edges, offset=1e-9):
+    """Each edge plus the values just below and above it"""
+    return sorted({edge + d for edge in edges for d in (-offset, 0.0, offset)})
+
+
+def scalar_scores(detector, inputs, context):
+    temp, humidity, precipitation, snowfall, wind_speed, lat, lng, route_types = inputs
+    risks = []
+    for i in range(len(temp)):
+        weather = {'temp': temp[i], 'humidity': humidity[i], 'precipitation': precipitation[i],
+                   'snowfall': snowfall[i], 'wind_speed': wind_speed[i]}
+        risks.append(detector.calculate_ice_risk(weather, lat[i], lng[i], context, route_types[i]))
+    return np.array(risks, dtype=np.float64)
+
+
+def assert_batch_matches_scalar(detector, inputs, context):
+    risks, levels = detector.calculate_ice_risk_batch(*inputs, route_context=context)
+    expected = scalar_scores(detector, inputs, context)
+    np.testing.assert_array_equal(risks, expected)
+    assert list(levels) == [detector.get_risk_level(r) for r in expected]
+
+
+def random_inputs(n, seed):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(38, 48, n)
+    lng = rng.uniform(-106, -75, n)
+    # Put some points within a few km of the bridge zones
+    near = rng.random(n) < 0.2
+    bridge = rng.integers(len(BRIDGES), size=n)
+    lat = np.where(near, np.array([b[0] for b in BRIDGES])[bridge] + rng.normal(0, 0.03, n), lat)
+    lng = np.where(near, np.array([b[1] for b in BRIDGES])[bridge] + rng.normal(0, 0.03, n), lng)
+    return (
+        rng.uniform(-25, 25, n),
+        rng.uniform(30, 100, n),
+        rng.exponential(1.0, n),
+        rng.exponential(1.0, n),
+        rng.uniform(0, 40, n),
+        lat,
+        lng,
+        np.array(ROUTE_TYPES, dtype=object)[rng.integers(len(ROUTE_TYPES), size=n)]
+    )
+
+
+@pytest.fixture(scope='module')
+def detector():
+    return IceDetector()
+
+
+@pytest.mark.parametrize('context', CONTEXTS)
+def test_batch_matches_scalar_on_random_points(detector, context):
+    assert_batch_matches_scalar(detector, random_inputs(5000, seed=len(context or '')), context)
+
+
+@pytest.mark.parametrize('context', CONTEXTS)
+def test_batch_matches_scalar_at_thresholds(detector, context):
+    # Every combination of threshold-adjacent values, for every route type
+    grid = np.array(np.meshgrid(
+        around(TEMP_EDGES), around(HUMIDITY_EDGES), around(PRECIPITATION_EDGES),
+        around(SNOWFALL_EDGES), around(WIND_EDGES), indexing='ij'
+    )).reshape(5, -1)
+    n = grid.shape[1]
+    inputs = (*grid, np.full(n, 45.0), np.full(n, -90.0), np.array(ROUTE_TYPES * (n // len(ROUTE_TYPES) + 1))[:n])
+    assert_batch_matches_scalar(detector, inputs, context)
+
+
+@pytest.mark.parametrize('route_type', ROUTE_TYPES)
+def test_batch_matches_scalar_near_bridges_and_latitude_bands(detector, route_type):
+    # Bridge radius edges and the 42/45 degree latitude steps
+    points = [(lat + d, lng) for lat, lng in BRIDGES for d in (0.0, 0.04, 0.0449, 0.0451, 0.06)]
+    points += [(lat, -100.0) for lat in around([42, 45, 40])]
+    lat = np.array([p[0] for p in points])
+    lng = np.array([p[1] for p in points])
+    n = len(points)
+    for temp in (-2.0, 3.0, 7.0, 12.0, 20.0):
+        inputs = (np.full(n, temp), np.full(n, 90.0), np.full(n, 1.5), np.full(n, 1.0), np.full(n, 20.0),
+                  lat, lng, [route_type] * n)
+        assert_batch_matches_scalar(detector, inputs, 'Minneapolis to Duluth')
+
+
+def test_batch_matches_scalar_with_nan_weather(detector):
+    values = [math.nan, -3.0, 0.0, 4.0, 12.0, 20.0]
+    grid = np.array(np.meshgrid(values, [math.nan, 90.0], [math.nan, 1.5], [math.nan, 1.0], [math.nan, 30.0],
+                                indexing='ij')).reshape(5, -1)
+    n = grid.shape[1]
+    inputs = (*grid, np.full(n, 46.0), np.full(n, -93.0), ['local'] * n)
+    assert_batch_matches_scalar(detector, inputs, None)
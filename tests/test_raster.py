@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import app
+from raster import BAND_SCALES, LatticeField, RasterGrid, RasterStore, StationField, score_cells, write_raster
+
+BBOX = {'north': 46.0, 'south': 45.0, 'east': -92.0, 'west': -93.5}
+VALID_FROM = 1_700_000_000
+VALID_UNTIL = VALID_FROM + 3600
+
+
+def lattice_field():
+    """Temperature falling to the north and east across the box, wet everywhere"""
+    ny, nx = 3, 4
+    temp = 2.0 - np.arange(ny)[:, None] * 1.5 - np.arange(nx)[None, :] * 0.8
+    constant = lambda value: np.full((ny, nx), value)
+    return LatticeField(44.9, -93.6, 0.5, {
+        'temp': temp, 'feels_like': temp - 3, 'humidity': constant(85.0), 'precipitation': constant(0.8),
+        'snowfall': constant(0.4), 'rain': constant(0.2), 'wind_speed': constant(18.0)
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RasterStore(str(tmp_path))
+
+
+def write(store, name, resolution, field=None):
+    return write_raster(store, name, 'now', RasterGrid.from_bbox(BBOX, resolution), field or lattice_field(),
+                        app.IceDetector(), 'current', VALID_FROM, VALID_UNTIL, tile_size=7)
+
+
+def test_written_raster_samples_back_to_the_scored_cells(store):
+    write(store, 'box', 0.05)
+    grid = RasterGrid.from_bbox(BBOX, 0.05)
+    lats, lngs = grid.cell_centers(0, grid.rows, 0, grid.cols)
+
+    raster = store.find(lats, lngs, 'current', when=VALID_FROM + 60)
+    samples = raster.sample(lats, lngs)
+    expected = score_cells(lattice_field()(lats, lngs), lats, lngs, app.IceDetector())
+
+    assert raster.name == 'box'
+    assert raster.data.shape == (len(BAND_SCALES), grid.rows, grid.cols)
+    for band, scale in BAND_SCALES.items():
+        np.testing.assert_allclose(samples[band], expected[band], atol=0.5 / scale + 1e-9)
+
+
+def test_find_needs_kind_validity_and_coverage(store):
+    write(store, 'box', 0.05)
+    lats, lngs = np.array([45.2, 45.8]), np.array([-93.2, -92.3])
+
+    assert store.find(lats, lngs, 'current', when=VALID_FROM) is not None
+    assert store.find(lats, lngs, 'historical', when=VALID_FROM) is None
+    assert store.find(lats, lngs, 'current', when=VALID_UNTIL) is None
+    assert store.find(np.array([45.2, 46.5]), lngs, 'current', when=VALID_FROM) is None
+
+
+def test_find_prefers_the_finest_covering_raster(store):
+    write(store, 'coarse', 0.1)
+    write(store, 'fine', 0.02)
+
+    raster = store.find([45.5], [-92.7], 'current', when=VALID_FROM)
+
+    assert raster.name == 'fine'
+
+
+def test_cells_out_of_station_reach_sample_as_nan(store):
+    values = {name: [value] for name, value in
+              dict(temp=-4.0, feels_like=-8.0, humidity=90.0, precipitation=1.0, snowfall=0.8, rain=0.0,
+                   wind_speed=12.0).items()}
+    field = StationField([45.1], [-93.4], values, max_distance=20000)
+    write(store, 'station', 0.05, field)
+
+    raster = store.find([45.1, 45.9], [-93.4, -92.1], 'current', when=VALID_FROM)
+    samples = raster.sample([45.1, 45.9], [-93.4, -92.1])
+
+    assert samples['temp'][0] == pytest.approx(-4.0)
+    assert np.isnan(samples['temp'][1]) and np.isnan(samples['ice_risk'][1])
+    assert np.isnan(raster.sample([47.0], [-93.0])['temp'][0])
@@ -0,0 +1,109 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from caching import HotKeys, WeatherTileCache
+from refresh import RefreshScheduler
+from upstream import UpstreamPool
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StationStore:
+    """Station store stand-in: corridors with a header file under root map for free"""
+
+    def __init__(self, root, on_disk):
+        self.root = root
+        self.resident = set()
+        for route_key in on_disk:
+            open(self.header_file(route_key), 'w').close()
+
+    def loaded(self):
+        return set(self.resident)
+
+    def header_file(self, route_key):
+        return os.path.join(self.root, f"{route_key}.json")
+
+    def legacy_file(self, route_key):
+        return os.path.join(self.root, f"{route_key}.pkl")
+
+
+class HistoricalService:
+    def __init__(self, store, routes):
+        self.station_store = store
+        self.demo_routes = dict.fromkeys(routes)
+        self.hot_corridors = HotKeys()
+        self.loads = []
+
+    def load_or_fetch_historical_data(self, route_key):
+        self.loads.append(route_key)
+        self.station_store.resident.add(route_key)
+
+
+class WeatherService:
+    def __init__(self, tile_cache):
+        self.tile_cache = tile_cache
+        self.batches = []
+
+    def _fetch_current_weather_batch(self, points):
+        self.batches.append(points)
+        return [{'temp': -1.0} for _ in points]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    historical_service = HistoricalService(StationStore(str(tmp_path), ['on_disk']), ['on_disk', 'hot', 'cold'])
+    historical_service.hot_corridors.touch(['hot'], weight=5)
+    historical_service.hot_corridors.touch(['cold'])
+
+    tile_cache = WeatherTileCache(resolution=0.1, ttl_seconds=600, clock=Clock(3600.0 * 500))
+    tile_cache.hot_cells.touch({(450 + i // 25, -930 + i % 25) for i in range(250)})
+
+    pool = UpstreamPool(max_workers=2)
+    yield SimpleNamespace(historical_service=historical_service, weather_service=WeatherService(tile_cache),
+                          upstream_pool=pool)
+    pool.shutdown()
+
+
+def test_run_spends_at_most_the_budget_and_defers_the_rest(engine):
+    scheduler = RefreshScheduler(engine, budget_per_run=3, lead_seconds=360, batch_size=100)
+
+    summary = scheduler.run_once()
+
+    # The mapped corridor is free; two fetched corridors and one cell batch use up the budget
+    assert summary['upstream_requests'] == 3
+    assert set(engine.historical_service.loads) == {'on_disk', 'hot', 'cold'}
+    assert len(engine.weather_service.batches) == 1
+    assert summary['cells_refreshed'] == 100
+    assert summary['deferred'] == 2
+    assert scheduler.stats()['pending'] == 2
+
+
+def test_deferred_work_runs_next_time(engine):
+    scheduler = RefreshScheduler(engine, budget_per_run=3, lead_seconds=360, batch_size=100)
+    scheduler.run_once()
+
+    summary = scheduler.run_once()
+
+    # Corridors are resident and refreshed cells are not due, so only the deferred 150 cells are left
+    assert summary['upstream_requests'] == 2
+    assert summary['cells_refreshed'] == 150
+    assert summary['deferred'] == 0
+    assert len(engine.historical_service.loads) == 3
+
+
+def test_cheaper_and_hotter_corridors_go_first(engine):
+    scheduler = RefreshScheduler(engine, budget_per_run=1, batch_size=100)
+
+    scheduler.run_once()
+
+    assert set(engine.historical_service.loads) == {'on_disk', 'hot'}
+    assert engine.weather_service.batches == []
+    assert [task['status'] for task in scheduler.queue if task['kind'] == 'cells'] == ['deferred'] * 3
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+import app
+from corridors import DEMO_CORRIDORS
+from tests.stubs import StubDirections, StubOpenMeteo, directions_route, synthetic_path
+from upstream import UpstreamPool
+
+TRIP = ('Houston, TX', 'Beaumont, TX')
+# Runs along the I-35 corridor, but neither place name says so
+CORRIDOR_TRIP = ('Home', 'Cabin up north')
+
+
+@pytest.fixture
+def optimizer(tmp_path):
+    settings = app.load_config({'OPENMETEO_CACHE_FILE': str(tmp_path / 'openmeteo.sqlite')})
+    pool = UpstreamPool(max_workers=4)
+    historical_service = app.HistoricalWeatherService(pool, settings=settings)
+    historical_service.openmeteo = StubOpenMeteo()
+    weather_service = app.WeatherService(
+        'test', historical_service=historical_service, ice_detector=app.IceDetector(), settings=settings
+    )
+
+    # Three distinct alternatives; the middle one has a "via" summary, so only two variations
+    routes = []
+    for i, summary in enumerate(['I-10 E', 'US-90 E via Liberty', 'TX-73 E']):
+        route = directions_route(synthetic_path(40, start=(29.76, -95.37), heading_deg=70 + 10 * i, seed=i), summary)
+        routes.append(json.loads(json.dumps(route)))
+    corridor_path = np.array(DEMO_CORRIDORS['minneapolis_duluth']['path'])
+    corridor_routes = [json.loads(json.dumps(directions_route(corridor_path, 'I-35 N')))]
+    yield app.RouteOptimizer(StubDirections({TRIP: routes, CORRIDOR_TRIP: corridor_routes}), weather_service, pool)
+    pool.shutdown()
+    historical_service.close()
+
+
+def test_variation_offsets_follow_variation_counts(optimizer):
+    base_routes = optimizer._get_base_routes(*TRIP, app.datetime.now())
+
+    counts = [len(optimizer._create_route_variations(route, i)) for i, route in enumerate(base_routes)]
+    assert sorted(counts) == [2, 3, 3]
+    assert optimizer.variation_offsets(base_routes) == [sum(counts[:i]) for i in range(len(counts))]
+
+
+def test_route_indexes_are_unique_and_consecutive(optimizer):
+    scored = list(optimizer.iter_scored_routes(*TRIP))
+
+    assert sorted(route['route_index'] for route in scored) == list(range(8))
+
+
+def test_responses_report_the_corridor_scoring_matched(optimizer):
+    scored = list(optimizer.iter_scored_routes(*CORRIDOR_TRIP))
+    body = app.build_routes_response('intermediate', optimizer.rank_routes(scored))
+
+    assert {route['route_key'] for route in scored} == {'minneapolis_duluth'}
+    assert body['route_key'] == 'minneapolis_duluth'
+    assert body['is_historical_simulation']
+    assert body['weather_source'] == 'OpenMeteo Historical Data (Winter 2023-2024)'
+
+
+def test_off_corridor_responses_report_current_weather(optimizer):
+    scored = list(optimizer.iter_scored_routes(*TRIP))
+    body = app.build_routes_response('intermediate', optimizer.rank_routes(scored))
+
+    assert body['route_key'] is None and body['route_keys'] == []
+    assert not body['is_historical_simulation']
+    assert body['weather_source'] == 'Current Weather Simulation'
@@ -0,0 +1,62 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import app
+from tests.stubs import CurrentResponse, HourlyResponse
+from upstream import UpstreamPool
+from weather_store import StationStore
+
+
+@pytest.fixture
+def weather_service(tmp_path):
+    settings = app.load_config({'OPENMETEO_CACHE_FILE': str(tmp_path / 'openmeteo.sqlite')})
+    pool = UpstreamPool(max_workers=2)
+    historical_service = app.HistoricalWeatherService(pool, settings=settings)
+    yield app.WeatherService(
+        'test', historical_service=historical_service, ice_detector=app.IceDetector(), settings=settings
+    )
+    pool.shutdown()
+    historical_service.close()
+
+
+def test_current_and_forecast_requests_ask_for_the_same_wind_unit(weather_service):
+    forecast = weather_service.forecast_params(np.array([time.time() + 7200]))
+
+    assert app.CURRENT_WEATHER_PARAMS['wind_speed_unit'] == forecast['wind_speed_unit'] == 'ms'
+
+
+def test_current_and_forecast_parsers_agree_on_wind_speed(weather_service):
+    # Both stand-in responses carry a 6 m/s wind
+    current = weather_service._parse_current_weather_response(CurrentResponse(44.0, -93.0))
+    forecast = weather_service._parse_forecast_response(HourlyResponse(44.0, -93.0, 6), time.time() + 3600)
+
+    assert current['wind_speed'] == forecast['wind_speed'] == pytest.approx(21.6)
+
+
+def test_fallback_weather_is_the_same_for_the_same_seed_and_date(weather_service):
+    historical_service = weather_service.historical_service
+    # Far from every Minneapolis-Duluth station, so every point falls back
+    points = [{'lat': 30.0 + i * 0.1, 'lng': -100.0} for i in range(5)]
+
+    first = historical_service._get_historical_weather_for_points('minneapolis_duluth', points, seed=7, date='2024-01-15')
+    second = historical_service._get_historical_weather_for_points('minneapolis_duluth', points, seed=7, date='2024-01-15')
+    other = historical_service._get_historical_weather_for_points('minneapolis_duluth', points, seed=8, date='2024-01-15')
+
+    assert {point['data_source'] for point in first} == {'fallback'}
+    assert first == second
+    assert [point['weather'] for point in first] != [point['weather'] for point in other]
+
+
+def test_store_version_changes_when_a_corridor_is_written_or_removed(tmp_path):
+    store = StationStore(str(tmp_path))
+    empty = store.version(['minneapolis_duluth', 'chicago_milwaukee'])
+
+    open(store.header_file('chicago_milwaukee'), 'w').close()
+    written = store.version(['minneapolis_duluth', 'chicago_milwaukee'])
+    os.remove(store.header_file('chicago_milwaukee'))
+
+    assert written != empty
+    assert store.version(['minneapolis_duluth', 'chicago_milwaukee']) == empty
@@ -0,0 +1,77 @@
+import gzip
+import json
+
+import brotli
+import pytest
+
+import wire
+
+
+def make_points(with_eta=True):
+    points = []
+    for i in range(6):
+        point = {
+            'location': {'lat': 44.97781 + 0.0123 * i, 'lng': -93.26502 + 0.0071 * i},
+            'weather': {
+                'temp': -2.3 + i, 'feels_like': -5.1 + i, 'humidity': 84, 'precipitation': 0.42,
+                'snowfall': 0.3 if i % 2 else 0.0, 'rain': 0.0, 'wind_speed': 21.6, 'visibility': 8.5,
+                'description': 'snow conditions' if i % 2 else 'freezing conditions'
+            },
+            'ice_risk': 0.137 * i,
+            'segment_index': i * 3,
+            'route_type': 'highway',
+            'data_source': 'openmeteo_forecast'
+        }
+        if with_eta:
+            point['eta'] = 1792193838 + 1181 * i
+        points.append(point)
+    return points
+
+
+@pytest.mark.parametrize('with_eta', [True, False])
+def test_weather_points_round_trip(with_eta):
+    points = make_points(with_eta)
+
+    # Through JSON text, as a client receives it
+    encoded = json.loads(wire.dumps(wire.encode_weather_points(points), compact=True))
+    decoded = wire.decode_weather_points(encoded)
+
+    assert ('eta' in encoded['delta']) == with_eta
+    assert len(decoded) == len(points)
+    for original, point in zip(points, decoded):
+        assert point['location'] == pytest.approx(original['location'], abs=1e-5)
+        assert point['ice_risk'] == pytest.approx(original['ice_risk'], abs=1e-3)
+        assert point['segment_index'] == original['segment_index']
+        assert point.get('eta') == original.get('eta')
+        assert point['route_type'] == original['route_type']
+        assert point['data_source'] == original['data_source']
+        for name in wire.WEATHER_COLUMNS:
+            assert point['weather'][name] == pytest.approx(original['weather'][name], abs=0.5 / wire.POINT_SCALES[name])
+        assert point['weather']['description'] == original['weather']['description']
+
+
+def test_eta_column_is_sent_as_deltas():
+    points = make_points()
+
+    encoded = wire.encode_weather_points(points)
+
+    assert encoded['columns']['eta'] == [points[0]['eta']] + [1181] * (len(points) - 1)
+
+
+def test_missing_values_survive_the_round_trip():
+    points = make_points()
+    points[2]['weather']['temp'] = None
+    points[3]['weather']['humidity'] = float('nan')
+
+    decoded = wire.decode_weather_points(wire.encode_weather_points(points))
+
+    assert decoded[2]['weather']['temp'] is None
+    assert decoded[3]['weather']['humidity'] is None
+
+
+def test_compressed_stream_decodes_to_the_original_lines():
+    lines = [wire.dumps({'type': 'route', 'n': i}, compact=True) + '\n' for i in range(50)]
+    text = ''.join(lines).encode()
+
+    assert brotli.decompress(b''.join(wire.compress_stream(iter(lines), 'br'))) == text
+    assert gzip.decompress(b''.join(wire.compress_stream(iter(lines), 'gzip'))) == text
@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+
+
+# Maximum in-flight requests per upstream service, shared by every request in the process
+DEFAULT_UPSTREAM_LIMITS = {
+    'google_directions': 4,
+    'openmeteo': 8
+}
+
+
+class UpstreamPool:
+    """Shared, bounded thread pool for upstream I/O.
+
+    ``map`` runs one call per item concurrently and returns the results in
+    item order. Each upstream has its own concurrency limit so one slow
+    service cannot take every worker. Calls made from inside a pool thread
+    run inline, which keeps nested fan-out from deadlocking the pool.
+    """
+
+    def __init__(self, max_workers=16, limits=None):
+        self.max_workers = max_workers
+        self.limits = dict(DEFAULT_UPSTREAM_LIMITS, **(limits or {}))
+        self._semaphores = {
+            name: threading.BoundedSemaphore(limit) for name, limit in self.limits.items()
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upstream')
+        self._local = threading.local()
+
+    def _limit(self, upstream):
+        semaphore = self._semaphores.get(upstream)
+        return semaphore if semaphore is not None else nullcontext()
+
+    def _run(self, upstream, fn, item):
+        self._local.in_pool = True
+        with self._limit(upstream):
+            return fn(item)
+
+    def map(self, upstream, fn, items, return_exceptions=False):
+        """Call fn(item) for every item and return results in the same order.
+
+        With return_exceptions=True a failed call yields its exception in
+        place of a result; otherwise the first failure is raised.
+        """
+        items = list(items)
+        results = []
+
+        if len(items) <= 1 or getattr(self._local, 'in_pool', False):
+            for item in items:
+                try:
+                    with self._limit(upstream):
+                        results.append(fn(item))
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results.append(e)
+            return results
+
+        futures = [self._executor.submit(self._run, upstream, fn, item) for item in items]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def iter_completed(self, upstream, fn, items):
+        """Yield (index, result) for every item as soon as its call finishes.
+
+        The first failure is raised once it is reached; calls made from inside
+        a pool thread, or for a single item, run inline in item order.
+        """
+        items = list(items)
+        if len(items) <= 1 or getattr(self._local, 'in_pool', False):
+            for index, item in enumerate(items):
+                with self._limit(upstream):
+                    yield index, fn(item)
+            return
+
+        futures = {
+            self._executor.submit(self._run, upstream, fn, item): index
+            for index, item in enumerate(items)
+        }
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def pool_session(session, pool_maxsize):
+    """Resize a session's keep-alive connection pools, keeping any retry policy already mounted"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = session or requests.Session()
+    for prefix in ('http://', 'https://'):
+        current = session.get_adapter(prefix)
+        session.mount(prefix, HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_maxsize,
+            max_retries=current.max_retries
+        ))
+    return session
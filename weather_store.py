@@ -0,0 +1,291 @@
+import glob
+import json
+import os
+import pickle
+import threading
+
+import numpy as np
+
+from geodesy import SpatialIndex
+
+# Version of the on-disk corridor format written by StationStore.save
+FORMAT_VERSION = 1
+
+# Daily variables kept for every weather station, in on-disk column order
+DAILY_VARIABLES = [
+    "temperature_max",
+    "temperature_min",
+    "temperature_mean",
+    "precipitation_sum",
+    "snowfall_sum",
+    "rain_sum",
+    "humidity_max",
+    "humidity_min",
+    "wind_speed_max",
+    "wind_speed_mean"
+]
+
+
+class CorridorData:
+    """Columnar weather data for one corridor.
+
+    Every daily variable is a contiguous float32 array of shape
+    (n_stations, n_days). Stations with fewer days are padded with NaN and
+    their real length is kept in ``day_counts``.
+    """
+
+    def __init__(self, route_key, station_ids, cities, lats, lngs, dates, day_counts, variables,
+                 mtime=None, format_version=None):
+        self.route_key = route_key
+        self.station_ids = list(station_ids)
+        self.cities = list(cities)
+        self.lats = np.ascontiguousarray(lats, dtype=np.float64)
+        self.lngs = np.ascontiguousarray(lngs, dtype=np.float64)
+        self.dates = dates
+        self.day_counts = np.ascontiguousarray(day_counts, dtype=np.int32)
+        self.variables = variables
+        self.mtime = mtime
+        self.format_version = format_version
+        # Per station-day values derived from the raw variables, attached by the store's on_load hook
+        self.day_table = None
+        # Built once per load so nearest-station lookups never scan every station
+        self.spatial_index = SpatialIndex(self.lats, self.lngs) if len(self.station_ids) else None
+
+    @property
+    def n_stations(self):
+        return len(self.station_ids)
+
+    @property
+    def n_days(self):
+        return self.dates.shape[0]
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.variables.values())
+
+    @classmethod
+    def from_stations(cls, route_key, stations, mtime=None):
+        """Build columnar arrays from the legacy list of station dicts with DataFrames"""
+        stations = [s for s in stations if 'location' in s and 'data' in s]
+        n_days = max((len(s['data']) for s in stations), default=0)
+
+        variables = {
+            name: np.full((len(stations), n_days), np.nan, dtype=np.float32)
+            for name in DAILY_VARIABLES
+        }
+        dates = np.full(n_days, np.datetime64('NaT'), dtype='datetime64[s]')
+        day_counts = []
+
+        for row, station in enumerate(stations):
+            df = station['data']
+            count = len(df)
+            day_counts.append(count)
+            for name in DAILY_VARIABLES:
+                if name in df:
+                    variables[name][row, :count] = df[name].to_numpy(dtype=np.float32, na_value=np.nan)
+            if 'date' in df and count == n_days and np.isnat(dates).all():
+                # Daily rows are stamped at local midnight in UTC; keep them timezone-naive
+                dates = np.array([d.value // 10**9 for d in df['date']], dtype='datetime64[s]')
+
+        return cls(
+            route_key,
+            [s.get('station_id', f"{route_key}_{i}") for i, s in enumerate(stations)],
+            [s['location'].get('city', '') for s in stations],
+            [s['location']['lat'] for s in stations],
+            [s['location']['lng'] for s in stations],
+            dates,
+            day_counts,
+            variables,
+            mtime=mtime
+        )
+
+
+class StationStore:
+    """Process-resident store of corridor weather data.
+
+    Each corridor is stored as ``<route_key>_historical.npy`` holding one
+    float32 array of shape (n_variables, n_stations, n_days) plus a small
+    ``<route_key>_historical.json`` header with the format version, station
+    metadata and dates. The array is memory-mapped read-only, so worker
+    processes share its pages through the OS cache. An entry is reopened only
+    when the header's mtime changes, so the request path never touches the
+    disk beyond a stat call.
+    """
+
+    def __init__(self, cache_dir, on_load=None):
+        self.cache_dir = cache_dir
+        # Called with every corridor as it is mapped, to precompute derived data off the request path
+        self.on_load = on_load
+        self._corridors = {}
+        self._lock = threading.RLock()
+
+    def header_file(self, route_key):
+        return os.path.join(self.cache_dir, f"{route_key}_historical.json")
+
+    def data_file(self, route_key):
+        return os.path.join(self.cache_dir, f"{route_key}_historical.npy")
+
+    def legacy_file(self, route_key):
+        return os.path.join(self.cache_dir, f"{route_key}_historical.pkl")
+
+    def get(self, route_key):
+        """Return the resident corridor, mapping it if missing or stale; None if not on disk"""
+        path = self.header_file(route_key)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            if os.path.exists(self.legacy_file(route_key)):
+                # One-time upgrade of a pickle written by an older version
+                with self._lock:
+                    if not os.path.exists(path):
+                        convert_legacy_file(self.legacy_file(route_key), self)
+                return self.get(route_key)
+            self._corridors.pop(route_key, None)
+            return None
+
+        corridor = self._corridors.get(route_key)
+        if corridor is not None and corridor.mtime == mtime:
+            return corridor
+
+        with self._lock:
+            corridor = self._corridors.get(route_key)
+            if corridor is None or corridor.mtime != mtime:
+                print(f"Mapping weather data for {route_key} into station store")
+                corridor = self._open(route_key, mtime)
+                if self.on_load is not None:
+                    self.on_load(corridor)
+                self._corridors[route_key] = corridor
+        return corridor
+
+    def _open(self, route_key, mtime):
+        with open(self.header_file(route_key)) as f:
+            header = json.load(f)
+
+        version = header.get('format_version')
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported weather cache format {version} for {route_key} (expected {FORMAT_VERSION})"
+            )
+
+        data = np.load(self.data_file(route_key), mmap_mode='r', allow_pickle=False)
+        stations = header['stations']
+        return CorridorData(
+            route_key,
+            [s['station_id'] for s in stations],
+            [s['city'] for s in stations],
+            [s['lat'] for s in stations],
+            [s['lng'] for s in stations],
+            np.array(header['dates'], dtype='datetime64[s]'),
+            [s['day_count'] for s in stations],
+            {name: data[i] for i, name in enumerate(header['variables'])},
+            mtime=mtime,
+            format_version=version
+        )
+
+    def save(self, corridor):
+        """Write a corridor in the memory-mappable format and drop any resident copy"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        route_key = corridor.route_key
+        names = list(corridor.variables.keys())
+        shape = (len(names), corridor.n_stations, corridor.n_days)
+        data = np.empty(shape, dtype=np.float32)
+        for i, name in enumerate(names):
+            data[i] = corridor.variables[name]
+
+        header = {
+            'format_version': FORMAT_VERSION,
+            'route_key': route_key,
+            'dtype': 'float32',
+            'shape': list(shape),
+            'variables': names,
+            'dates': [str(d) for d in corridor.dates],
+            'stations': [
+                {
+                    'station_id': corridor.station_ids[i],
+                    'city': corridor.cities[i],
+                    'lat': float(corridor.lats[i]),
+                    'lng': float(corridor.lngs[i]),
+                    'day_count': int(corridor.day_counts[i])
+                }
+                for i in range(corridor.n_stations)
+            ]
+        }
+
+        # Write the array first and the header last: the header's mtime marks a complete entry
+        data_tmp = self.data_file(route_key) + '.tmp'
+        with open(data_tmp, 'wb') as f:
+            np.save(f, data, allow_pickle=False)
+        os.replace(data_tmp, self.data_file(route_key))
+
+        header_tmp = self.header_file(route_key) + '.tmp'
+        with open(header_tmp, 'w') as f:
+            json.dump(header, f, indent=1)
+        os.replace(header_tmp, self.header_file(route_key))
+
+        self.invalidate(route_key)
+
+    def status(self, route_key):
+        """On-disk status of a corridor for cache reporting; None if not cached"""
+        path = self.header_file(route_key)
+        if not os.path.exists(path):
+            return None
+        corridor = self.get(route_key)
+        return {
+            'format_version': corridor.format_version,
+            'cache_date': os.path.getmtime(path),
+            'file_size': os.path.getsize(path) + os.path.getsize(self.data_file(route_key)),
+            'mapped_size': corridor.nbytes
+        }
+
+    def version(self, route_keys):
+        """Stamp of the given corridors on disk; changes whenever one is written or removed"""
+        stamps = []
+        for route_key in route_keys:
+            try:
+                stamps.append(os.stat(self.header_file(route_key)).st_mtime_ns)
+            except OSError:
+                stamps.append(0)
+        return f"{len(stamps) - stamps.count(0)}:{max(stamps, default=0)}"
+
+    def invalidate(self, route_key=None):
+        """Drop one corridor, or every corridor when route_key is None"""
+        with self._lock:
+            if route_key is None:
+                self._corridors.clear()
+            else:
+                self._corridors.pop(route_key, None)
+
+    def loaded(self):
+        """Summary of the corridors currently resident in memory"""
+        return {
+            key: {'stations': c.n_stations, 'days': c.n_days, 'bytes': c.nbytes}
+            for key, c in self._corridors.items()
+        }
+
+
+def convert_legacy_file(pickle_path, store):
+    """Convert one legacy ``*_historical.pkl`` (list of station dicts with DataFrames)"""
+    route_key = os.path.basename(pickle_path)[:-len('_historical.pkl')]
+    print(f"Converting {pickle_path} to weather cache format v{FORMAT_VERSION}")
+    with open(pickle_path, 'rb') as f:
+        stations = pickle.load(f)
+    corridor = CorridorData.from_stations(route_key, stations)
+    store.save(corridor)
+    return route_key
+
+
+def convert_pickle_cache(cache_dir):
+    """One-shot conversion of every legacy pickle in a cache directory"""
+    store = StationStore(cache_dir)
+    converted = []
+    for pickle_path in sorted(glob.glob(os.path.join(cache_dir, '*_historical.pkl'))):
+        converted.append(convert_legacy_file(pickle_path, store))
+    return converted
+
+
+if __name__ == '__main__':
+    import sys
+
+    cache_dir = sys.argv[1] if len(sys.argv) > 1 else 'weather_cache'
+    routes = convert_pickle_cache(cache_dir)
+    print(f"Converted {len(routes)} corridors: {', '.join(routes)}")
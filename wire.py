@@ -0,0 +1,211 @@
+import gzip
+import json
+import zlib
+
+import brotli
+
+# Format tag of compact route responses, requested with {"format": "compact"}
+COMPACT_FORMAT = 'columnar-v1'
+
+# Fixed-point scale of every numeric weather-point column: value = code / scale
+POINT_SCALES = {
+    'lat': 100000,          # ~1 m
+    'lng': 100000,
+    'ice_risk': 1000,
+    'temp': 10,
+    'feels_like': 10,
+    'humidity': 1,
+    'precipitation': 100,
+    'snowfall': 100,
+    'rain': 100,
+    'wind_speed': 10,
+    'visibility': 10
+}
+
+# Columns sent as differences from the previous point; consecutive samples are close together
+DELTA_COLUMNS = ('lat', 'lng', 'segment_index', 'eta')
+
+# String columns sent as indexes into a per-route table
+ENUM_COLUMNS = ('route_type', 'data_source', 'description')
+
+LOCATION_COLUMNS = ('lat', 'lng')
+WEATHER_COLUMNS = ('temp', 'feels_like', 'humidity', 'precipitation', 'snowfall', 'rain',
+                   'wind_speed', 'visibility')
+
+# Route-level floats are rounded to this many decimals in compact responses
+ROUTE_FLOAT_DECIMALS = 4
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+
+def wants_compact(data, args=None):
+    """True when a route request opts into the compact format, in its JSON body or query string"""
+    requested = (data or {}).get('format') or (args or {}).get('format')
+    return requested in ('compact', COMPACT_FORMAT)
+
+
+def _quantize(values, scale):
+    return [None if v is None or v != v else int(round(v * scale)) for v in values]
+
+
+def _delta(codes):
+    previous = 0
+    deltas = []
+    for code in codes:
+        deltas.append(code - previous)
+        previous = code
+    return deltas
+
+
+def _undelta(deltas):
+    total = 0
+    codes = []
+    for delta in deltas:
+        total += delta
+        codes.append(total)
+    return codes
+
+
+def encode_weather_points(points):
+    """Scored weather points as parallel, quantized columns"""
+    columns = {}
+    enums = {}
+
+    for name in LOCATION_COLUMNS:
+        columns[name] = _quantize([p['location'][name] for p in points], POINT_SCALES[name])
+    columns['segment_index'] = [p.get('segment_index', i) for i, p in enumerate(points)]
+    # Epoch-second ETAs, on routes scored along a departure timeline
+    if points and all('eta' in p for p in points):
+        columns['eta'] = [p['eta'] for p in points]
+    for name in DELTA_COLUMNS:
+        if name in columns:
+            columns[name] = _delta(columns[name])
+
+    columns['ice_risk'] = _quantize([p.get('ice_risk') for p in points], POINT_SCALES['ice_risk'])
+    for name in WEATHER_COLUMNS:
+        if any(name in p['weather'] for p in points):
+            columns[name] = _quantize([p['weather'].get(name) for p in points], POINT_SCALES[name])
+
+    for name in ENUM_COLUMNS:
+        values = [p['weather'].get(name) if name == 'description' else p.get(name) for p in points]
+        table = {}
+        columns[name] = [table.setdefault(value, len(table)) for value in values]
+        enums[name] = list(table)
+
+    return {
+        'n': len(points),
+        'scales': {name: scale for name, scale in POINT_SCALES.items() if name in columns},
+        'delta': [name for name in DELTA_COLUMNS if name in columns],
+        'enums': enums,
+        'columns': columns
+    }
+
+
+def decode_weather_points(encoded):
+    """Inverse of encode_weather_points, up to quantization"""
+    columns = dict(encoded['columns'])
+    for name in encoded['delta']:
+        columns[name] = _undelta(columns[name])
+    for name, scale in encoded['scales'].items():
+        columns[name] = [None if code is None else code / scale for code in columns[name]]
+    for name, table in encoded['enums'].items():
+        columns[name] = [table[code] for code in columns[name]]
+
+    points = []
+    for i in range(encoded['n']):
+        weather = {name: columns[name][i] for name in WEATHER_COLUMNS if name in columns}
+        weather['description'] = columns['description'][i]
+        points.append({
+            'location': {'lat': columns['lat'][i], 'lng': columns['lng'][i]},
+            'weather': weather,
+            'ice_risk': columns['ice_risk'][i],
+            'segment_index': columns['segment_index'][i],
+            'route_type': columns['route_type'][i],
+            'data_source': columns['data_source'][i]
+        })
+        if 'eta' in columns:
+            points[-1]['eta'] = columns['eta'][i]
+    return points
+
+
+def encode_route(route):
+    """Copy of a scored route with weather_points replaced by weather_columns"""
+    compact = {}
+    for key, value in route.items():
+        if key == 'weather_points':
+            compact['weather_columns'] = encode_weather_points(value)
+        elif isinstance(value, float):
+            compact[key] = round(value, ROUTE_FLOAT_DECIMALS)
+        else:
+            compact[key] = value
+    return compact
+
+
+def encode_routes_body(body):
+    """Compact form of a /api/routes response body"""
+    return dict(body, routes=[encode_route(route) for route in body['routes']], format=COMPACT_FORMAT)
+
+
+def dumps(payload, compact=False):
+    """JSON text, without whitespace for compact responses"""
+    if compact:
+        return json.dumps(payload, separators=(',', ':'))
+    return json.dumps(payload)
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None, from an Accept-Encoding header"""
+    offered = set()
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        offered.add(name.strip().lower())
+    if 'br' in offered:
+        return 'br'
+    if 'gzip' in offered:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    """(body, encoding) for a complete response body; small bodies are left alone"""
+    if encoding is None or len(data) < MIN_COMPRESS_BYTES:
+        return data, None
+    if encoding == 'br':
+        return brotli.compress(data, quality=5), encoding
+    return gzip.compress(data, compresslevel=6), encoding
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of text chunks, flushing after each so every event arrives on its own"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            yield compressor.process(chunk.encode()) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+        for chunk in chunks:
+            yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+async def acompress_stream(chunks, encoding):
+    """compress_stream for an async iterable of text chunks"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        async for chunk in chunks:
+            yield compressor.process(chunk.encode()) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        async for chunk in chunks:
+            yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()